@@ -14,9 +14,10 @@ from typing import Callable, Iterable, List, Optional, Union
 import itertools
 from paradoc.lex import is_nop_or_comment, is_trailer, lex_trailer, lex_trailers, lex_code, break_trailer, is_numeric_literal_token, name_trailer_dissections
 from paradoc.num import Char
-from paradoc.objects import Block, Hoard, BuiltIn, PdObject, Environment, PdEmptyStackException, PdExitException, PdBreakException, PdContinueException
+from paradoc.objects import Block, Hoard, BuiltIn, Grid, PdObject, Environment, PdEmptyStackException, PdExitException, PdBreakException, PdContinueException, OutputSink, CaptureSink
 import paradoc.objects as objects
-import paradoc.input_triggers as input_triggers
+import paradoc.base as base
+from paradoc.input_triggers import InputSource
 import paradoc.trailers as trailers
 from paradoc.builtins import initialize_builtins
 from paradoc.builtins.case import CasedBuiltIn
@@ -79,6 +80,11 @@ def make_each_loop_over(iterable: Iterable[PdObject],
                     env.pop_stack_ignoring_markers_and_triggers()))
     return inner
 
+def grid_input(source: InputSource) -> Optional[PdObject]:
+    lines = source.all_lines()
+    if lines is None: return None
+    return Grid.of(lines).view()
+
 # helping mypy out
 def to_int_for_forloop(n: PdObject) -> int:
     if isinstance(n, int):
@@ -157,45 +163,48 @@ class CodeBlock(Block):
             body_start += 1
             if is_nop_or_comment(trailer_token): continue
             if trailer_token == 'i' or trailer_token == '_input':
-                env.input_trigger = input_triggers.all
+                env.input_trigger = env.input_source.all
             elif trailer_token == 'l' or trailer_token == '_lines':
-                env.input_trigger = input_triggers.line
+                env.input_trigger = env.input_source.line
             elif trailer_token == 'w' or trailer_token == '_words':
-                env.input_trigger = input_triggers.word
+                env.input_trigger = env.input_source.word
             elif trailer_token == 'v' or trailer_token == '_values':
-                env.input_trigger = input_triggers.value
+                env.input_trigger = env.input_source.value
             elif trailer_token == 'r' or trailer_token == '_records':
-                env.input_trigger = input_triggers.record
+                env.input_trigger = env.input_source.record
             elif trailer_token == 'c' or trailer_token == '_chars':
-                env.input_trigger = input_triggers.char
+                env.input_trigger = env.input_source.char
 
             elif trailer_token == 'a' or trailer_token == '_linearray':
-                env.input_trigger = input_triggers.all_lines
+                env.input_trigger = env.input_source.all_lines
             elif trailer_token == 'y' or trailer_token == '_valuearray':
-                env.input_trigger = input_triggers.all_values
+                env.input_trigger = env.input_source.all_values
+            elif trailer_token == 'g' or trailer_token == '_grid':
+                source = env.input_source
+                env.input_trigger = lambda: grid_input(source)
 
             elif trailer_token == 'e' or trailer_token == '_each':
                 if env.input_trigger is None:
-                    env.input_trigger = input_triggers.line
+                    env.input_trigger = env.input_source.line
                 set_executor(make_each_loop_over(
                         env.capture_stack_as_iterable()))
             elif trailer_token == 'm':
                 # _each_newline, which is kinda like mapping over lines if by
                 # itself
                 if env.input_trigger is None:
-                    env.input_trigger = input_triggers.line
+                    env.input_trigger = env.input_source.line
                 env.put('Ñ', '\n')
                 set_executor(make_each_loop_over(
                         env.capture_stack_as_iterable()))
             elif trailer_token == 'f' or trailer_token == '_fasteach':
                 if env.input_trigger is None:
-                    env.input_trigger = input_triggers.line
+                    env.input_trigger = env.input_source.line
                 set_executor(make_each_loop_over(
                         env.capture_stack_as_iterable(),
-                        lambda s: print(s, end="")))
+                        env.write_output))
             elif trailer_token == 'p' or trailer_token == '_printeach':
                 if env.input_trigger is None:
-                    env.input_trigger = input_triggers.line
+                    env.input_trigger = env.input_source.line
                 set_executor(make_each_loop_over(
                         env.capture_stack_as_iterable(),
                         env.print_output_record))
@@ -282,7 +291,7 @@ class CodeBlock(Block):
                     elif is_numeric_literal_token(token):
                         r_token = token.replace('—', '-')
                         try:
-                            parsed_num: Union[int, float] = int(r_token)
+                            parsed_num: Union[int, float] = base.str_to_int(r_token)
                         except ValueError:
                             try:
                                 parsed_num = float(r_token)
@@ -400,9 +409,13 @@ class CodeBlock(Block):
 def basic_evaluator(env: Environment, code: str) -> None:
     CodeBlock(list(lex_code(code)))(env)
 
-def initialized_environment(sandboxed: bool, debug: bool) -> Environment:
+def initialized_environment(sandboxed: bool, debug: bool,
+        output: Optional[OutputSink] = None,
+        input_source: Optional[InputSource] = None) -> Environment:
     env = Environment(basic_evaluator,
-            stack_trigger = lambda: env.run_input_trigger())
+            stack_trigger = lambda: env.run_input_trigger(),
+            output = output,
+            input_source = input_source)
     initialize_builtins(env, sandboxed, debug)
     return env
 
@@ -416,10 +429,18 @@ def pd_simple_eval(code: str, use_cache: bool = True) -> List[PdObject]:
     env.evaluate(code, set_quine=True)
     return env._stack
 
-def main_with_code(code: str, sandboxed: bool, debug: bool) -> None:
-    env = initialized_environment(sandboxed, debug)
-    env.evaluate(code, set_quine=True)
-    print(env.pd_str(env._stack))
+def main_with_code(code: str, sandboxed: bool, debug: bool, prefetch: bool = False) -> None:
+    # Interactively, output as soon as it's ready; otherwise, save up
+    # output to write in big chunks.
+    output = OutputSink(buffer_size = 0 if sys.stdout.isatty() else 1 << 16)
+    env = initialized_environment(sandboxed, debug, output)
+    if prefetch: env.input_source.prefetch()
+    try:
+        env.evaluate(code, set_quine=True)
+        env.write_pd_str(env._stack)
+        env.write_output('\n')
+    finally:
+        output.flush()
 
 def paradoc_repl(sandboxed: bool, debug: bool) -> None:
     env = initialized_environment(sandboxed, debug)
@@ -431,8 +452,8 @@ def paradoc_repl(sandboxed: bool, debug: bool) -> None:
         try:
             code = input("prdc> ")
             env.evaluate(code, set_quine=True)
-            print(env.pd_str(env._stack))
-            print(objects.pd_repr(env._stack))
+            env.write_output(env.pd_str(env._stack) + '\n')
+            env.write_output(objects.pd_repr(env._stack) + '\n')
         except EOFError:
             break
         except PdExitException:
@@ -502,6 +523,8 @@ def main() -> None:
     parser.add_argument('--no-debug', default=True, action='store_false',
             dest='debug')
     parser.add_argument('--sandboxed', default=False, action='store_true')
+    parser.add_argument('--prefetch', default=False, action='store_true',
+            help='Read input ahead on a background thread')
     parser.add_argument('--decode', nargs='?', const='')
     parser.add_argument('--encode', nargs='?', const='')
     args = parser.parse_args()
@@ -524,7 +547,8 @@ def main() -> None:
                 ('Hoard', trailers.hoard_trailer_dict),
             ])
         elif args.e is not None:
-            main_with_code(args.e, sandboxed=args.sandboxed, debug=args.debug)
+            main_with_code(args.e, sandboxed=args.sandboxed, debug=args.debug,
+                    prefetch=args.prefetch)
         elif args.decode is not None:
             import paradoc.codepage
             if args.decode == '':
@@ -566,7 +590,8 @@ def main() -> None:
             if args.autogolf:
                 print(autogolf(source))
             else:
-                main_with_code(source, sandboxed=args.sandboxed, debug=args.debug)
+                main_with_code(source, sandboxed=args.sandboxed,
+                        debug=args.debug, prefetch=args.prefetch)
         elif args.autogolf:
             print(autogolf(sys.stdin.read()))
         else:
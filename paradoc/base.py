@@ -1,25 +1,200 @@
 # coding: utf-8
 # Pure base manipulation utilities.
-from typing import List, Iterable
+from typing import Dict, List, Iterable, Tuple
 import string
 
+# Converting between big ints and digits a digit at a time, or with str and
+# int, takes time quadratic in the number of digits, and str and int refuse
+# to convert more than a few thousand decimal digits on recent Pythons.
+# Instead, big ints are split in half by a power of the base recursively,
+# using the decimal module (whose multiplication is fast for huge numbers) to
+# write them in base 10 and a recursive division for other bases, and digits
+# are put together by recursively multiplying halves, so everything is about
+# as fast as multiplication, which is subquadratic.
+
+# Below this many bits (about 3000 decimal digits), just use the builtins.
+SMALL_BITS = 10000
+# Below this many digits, just use int.
+SMALL_DIGITS = 3000
+
+def int_divmod(a: int, b: int) -> Tuple[int, int]:
+    """divmod, but subquadratic for huge numbers (Burnikel and Ziegler's
+    recursive division)."""
+    if b == 0: raise ZeroDivisionError('integer division or modulo by zero')
+    if b < 0:
+        q, r = int_divmod(-a, -b)
+        return q, -r
+    if a < 0:
+        q, r = int_divmod(~a, b)
+        return ~q, b + ~r
+    if a.bit_length() - b.bit_length() < SMALL_BITS or b.bit_length() < SMALL_BITS:
+        return divmod(a, b)
+    # Long division of a by b where each "digit" of a is n bits, so each
+    # step divides a 2n-bit number by an n-bit one.
+    n = b.bit_length()
+    q_digits = []
+    r = 0
+    for a_digit in reversed(split_bits(a, n)):
+        q_digit, r = div2n1n((r << n) | a_digit, b, n)
+        q_digits.append(q_digit)
+    q_digits.reverse()
+    return join_bits(q_digits, n), r
+
+def div2n1n(a: int, b: int, n: int) -> Tuple[int, int]:
+    """divmod(a, b), where b has n bits and a < b << n."""
+    if a.bit_length() - n <= SMALL_BITS:
+        return divmod(a, b)
+    pad = n & 1
+    if pad:
+        a <<= 1
+        b <<= 1
+        n += 1
+    half = n >> 1
+    mask = (1 << half) - 1
+    b1, b2 = b >> half, b & mask
+    q1, r = div3n2n(a >> n, (a >> half) & mask, b, b1, b2, half)
+    q2, r = div3n2n(r, a & mask, b, b1, b2, half)
+    if pad: r >>= 1
+    return q1 << half | q2, r
+
+def div3n2n(a12: int, a3: int, b: int, b1: int, b2: int, n: int) -> Tuple[int, int]:
+    """divmod((a12 << n) | a3, b), where b = (b1 << n) | b2 has 2n bits."""
+    if a12 >> n == b1:
+        q, r = (1 << n) - 1, a12 - (b1 << n) + b1
+    else:
+        q, r = div2n1n(a12, b1, n)
+    r = (r << n | a3) - q * b2
+    while r < 0:
+        q -= 1
+        r += b
+    return q, r
+
+def split_bits(a: int, n: int) -> List[int]:
+    """The digits of nonnegative a in base 2**n, least significant first."""
+    ret = [0] * ((a.bit_length() + n - 1) // n)
+    def inner(x: int, lo: int, hi: int) -> None:
+        if lo + 1 == hi:
+            ret[lo] = x
+            return
+        mid = (lo + hi) >> 1
+        shift = (mid - lo) * n
+        upper = x >> shift
+        inner(x ^ (upper << shift), lo, mid)
+        inner(upper, mid, hi)
+    if ret: inner(a, 0, len(ret))
+    return ret
+
+def join_bits(digits: List[int], n: int) -> int:
+    """The inverse of split_bits."""
+    def inner(lo: int, hi: int) -> int:
+        if lo + 1 == hi: return digits[lo]
+        mid = (lo + hi) >> 1
+        return (inner(mid, hi) << ((mid - lo) * n)) + inner(lo, mid)
+    return inner(0, len(digits)) if digits else 0
+
+def int_str(num: int) -> str:
+    """str(num), but fast and without a length limit for huge numbers."""
+    if num.bit_length() < SMALL_BITS: return str(num)
+    import decimal
+    context = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX,
+            Emin=decimal.MIN_EMIN, traps=[decimal.Inexact])
+    powers: Dict[int, decimal.Decimal] = {}
+    def power(w: int) -> decimal.Decimal:
+        if w not in powers:
+            powers[w] = context.power(decimal.Decimal(2), w)
+        return powers[w]
+    def inner(n: int, w: int) -> decimal.Decimal:
+        if w <= SMALL_BITS: return decimal.Decimal(str(n))
+        half = w >> 1
+        hi = n >> half
+        lo = n ^ (hi << half)
+        return context.fma(inner(hi, w - half), power(half), inner(lo, half))
+    ret = str(inner(abs(num), num.bit_length()))
+    return '-' + ret if num < 0 else ret
+
+def str_to_int(s: str) -> int:
+    """int(s) for a decimal string, but fast and without a length limit for
+    huge numbers."""
+    if len(s) <= SMALL_DIGITS: return int(s)
+    t = s.strip()
+    sign = 1
+    if t[:1] in ('-', '+'):
+        if t[0] == '-': sign = -1
+        t = t[1:]
+    if not (t.isascii() and t.isdigit()):
+        return int(s)
+    powers: Dict[int, int] = {}
+    def inner(lo: int, hi: int) -> int:
+        if hi - lo <= SMALL_DIGITS: return int(t[lo:hi])
+        mid = (lo + hi) >> 1
+        if hi - mid not in powers: powers[hi - mid] = 10 ** (hi - mid)
+        return inner(lo, mid) * powers[hi - mid] + inner(mid, hi)
+    return sign * inner(0, len(t))
+
 def to_base_digits(base: int, num: int) -> List[int]:
     if num == 0: return [0]
 
     sign = 1
     if num < 0: num = -num; sign = -1
-    acc = []
-    while num > 0:
-        acc.append(num % base)
-        num //= base
-    return [sign * digit for digit in reversed(acc)]
+    if num.bit_length() < SMALL_BITS:
+        acc = []
+        while num > 0:
+            acc.append(num % base)
+            num //= base
+        acc.reverse()
+    elif base == 10:
+        acc = [int(c) for c in int_str(num)]
+    else:
+        acc = big_to_base_digits(base, num)
+    if sign == 1: return acc
+    return [-digit for digit in acc]
 
-def from_base_digits(base: int, digits: Iterable[int]) -> int:
-    acc = 0
-    for digit in digits:
-        acc = base * acc + digit
+def big_to_base_digits(base: int, num: int) -> List[int]:
+    # powers[i] is base ** (2 ** i), up to about sqrt(num)
+    powers = [base]
+    while powers[-1].bit_length() * 2 <= num.bit_length():
+        powers.append(powers[-1] * powers[-1])
+    acc: List[int] = []
+    def inner(n: int, i: int, pad: bool) -> None:
+        # n < base ** (2 ** (i + 1)); if pad, output exactly 2 ** (i + 1)
+        # digits, with leading zeros, instead of no leading zeros
+        if i < 0 or n.bit_length() < 64:
+            small: List[int] = []
+            while n > 0:
+                small.append(n % base)
+                n //= base
+            # i is -1 at the bottom, when n is a single digit
+            if pad: small.extend([0] * ((1 << (i + 1)) - len(small)))
+            acc.extend(reversed(small))
+            return
+        hi, lo = int_divmod(n, powers[i])
+        if hi or pad:
+            inner(hi, i - 1, pad)
+            inner(lo, i - 1, True)
+        else:
+            inner(lo, i - 1, False)
+    inner(num, len(powers) - 1, False)
     return acc
 
+def from_base_digits(base: int, digits: Iterable[int]) -> int:
+    ds = list(digits)
+    if len(ds) <= SMALL_DIGITS:
+        acc = 0
+        for digit in ds:
+            acc = base * acc + digit
+        return acc
+    powers: Dict[int, int] = {}
+    def inner(lo: int, hi: int) -> int:
+        if hi - lo <= SMALL_DIGITS:
+            acc = 0
+            for digit in ds[lo:hi]:
+                acc = base * acc + digit
+            return acc
+        mid = (lo + hi) >> 1
+        if hi - mid not in powers: powers[hi - mid] = base ** (hi - mid)
+        return inner(lo, mid) * powers[hi - mid] + inner(mid, hi)
+    return inner(0, len(ds))
+
 digits_lower = string.digits + string.ascii_lowercase
 digits_upper = string.digits + string.ascii_uppercase
 def to_base_digits_lower(base: int, num: int) -> str:
@@ -1,6 +1,6 @@
 # coding: utf-8
 from paradoc.objects import *
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, List, Optional, Pattern, Tuple
 import itertools
 import paradoc.num as num
 import paradoc.base as base
@@ -38,9 +38,11 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             cases: List[Case],
             docs: Optional[str] = None,
             stability: str = "unstable",
-            golf_aliases: Optional[List[str]] = None) -> CasedBuiltIn:
+            golf_aliases: Optional[List[str]] = None,
+            fold_op: Optional[FoldOp] = None) -> CasedBuiltIn:
         builtin = CasedBuiltIn(name, cases, aliases = [name] + extra_names,
-                docs=docs, stability=stability, golf_aliases=golf_aliases)
+                docs=docs, stability=stability, golf_aliases=golf_aliases,
+                fold_op=fold_op)
         env.put(name, builtin, fail_if_overwrite=True)
         for xname in extra_names: env.put(xname, builtin, fail_if_overwrite=True)
         return builtin
@@ -340,7 +342,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="stable")
     # }}}
     # Not {{{
-    basic_not_case = Case.value(lambda env, x: [int(not x)])
+    basic_not_case = Case.value(lambda env, x: [int(not x)], pure=True)
     basic_not = cput('Not', [], [basic_not_case],
             docs="""Logical NOT: 0 and empty lists/strings yield 1, everything else yields 0.
 
@@ -364,7 +366,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     strcat_list_case = Case.seq2_singleton(lambda env, a, b: [env.pd_str(a) + env.pd_str(b)])
     filter_case = Case.block_seq_range(lambda env, block, seq: [pd_filter(env, block, seq)])
     compose_case = Case.block2(lambda env, block1, block2: [CompositionBlock(block1, block2)])
-    cput('Plus', [], [add_case], docs="Add numbers.", stability="stable", golf_aliases=['+'])
+    cput('Plus', [], [add_case], docs="Add numbers.", stability="stable", golf_aliases=['+'],
+            fold_op=FoldOp(num.pd_add, operator.add, sum))
     cput('Cat', [], [cat_list_case], docs="Concatenate two lists (numbers coerce to single-element lists).", stability="stable", golf_aliases=['+'])
     cput('Strcat', [], [strcat_list_case], docs="Concatenate two strings (numbers coerce to strings).", stability="stable", golf_aliases=['+'])
     cput('Filter', [], [filter_case], docs="Filter a list by a block (numbers coerce to ranges).", stability="stable", golf_aliases=['+'])
@@ -373,7 +376,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             docs="""Addition on numbers. Concatenation on lists and strings
             (numbers coerce to single-element lists or to strings). Filter on
             block and list (numbers coerce to ranges). Compose on blocks.""",
-            stability="stable")
+            stability="stable",
+            fold_op=FoldOp(num.pd_add, operator.add, sum, operator.add, ''.join))
 
     cput('Cat_between', ['Cb'], [
         Case.list2_singleton(lambda env, a, b: [pd_to_list(a) + pd_to_list(b) + pd_to_list(a)]),
@@ -453,7 +457,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             ex: 3 {2*} 4* => 48
             {X} 4* => 0 1 2 3
             [2 3 5 7] {2X#} * => 4 8 32 128""",
-            stability="beta")
+            stability="beta",
+            fold_op=FoldOp(num.pd_mul, operator.mul, math.prod))
     # }}}
     # "Division" and "modulo" (for-each, splitting, etc.) {{{
     cput('Div_or_split_or_each', ['/'], [
@@ -560,9 +565,10 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="beta")
 
     cput('Int_sqrt', ['Si'], [
-        Case.number(lambda env, a: [num.intify(num.numerify(a) ** 0.5)]),
+        Case.number(lambda env, a: [discrete.int_sqrt(num.numerify(a))]),
     ],
-            docs="""Integer square root.""",
+            docs="""Integer square root. Exact on nonnegative integers, however
+            large.""",
             stability="alpha")
 
     cput('Find_index', ['@'], [
@@ -629,6 +635,20 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     ],
             docs="""Convert to new dictionary hoard.""",
             stability="unstable")
+    cput('Set_hoard', [], [
+        Case.seq(lambda env, seq: [Hoard.set_of(pd_iterable(seq))]),
+    ],
+            docs="""Convert to new hoard holding the set of elements as keys,
+            each with value 1. Membership tests, updateone and delete are
+            constant-time.""",
+            stability="unstable")
+    cput('Counter_hoard', [], [
+        Case.seq(lambda env, seq: [Hoard.counter_of(pd_iterable(seq))]),
+    ],
+            docs="""Convert to new hoard counting the elements: each distinct
+            element is a key, with the number of times it appears as its
+            value.""",
+            stability="unstable")
 
     cput('Index_translate', ['It'], [
         Case.seq2_singleton(lambda env, seq, table: [pd_index_translate(seq, table)]),
@@ -782,7 +802,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
         Case.any(lambda env, x: [int(isinstance(x, str))]),
     ], docs="Test if string", stability="alpha")
     cput('Is_array', [':a'], [
-        Case.any(lambda env, x: [int(isinstance(x, (list, range)))]),
+        Case.any(lambda env, x: [int(isinstance(x, (list, range, ListView)))]),
     ], docs="Test if array (or range)", stability="alpha")
     cput('Is_block', [':b'], [
         Case.any(lambda env, x: [int(isinstance(x, Block))]),
@@ -802,17 +822,22 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
         Case.block_seq_range(lambda env, f, s: [pd_sort(s, (env, f))]),
     ], docs="Sort or select from stack", stability="beta")
     cput('Order_statistic', ['¢'], [
-        Case.list_number(lambda env, x, i: [pd_to_sorted(x)[num.intify(i)]]),
-        Case.str_number(lambda env, s, i: [Char(sorted(s)[num.intify(i)])]),
-    ], docs="Order statistic (zero-indexed)", stability="alpha")
+        Case.list_number(lambda env, x, i: pd_select(pd_iterable(x), [i])),
+        Case.str_number(lambda env, s, i: [Char(pd_select(s, [i])[0])]),
+        Case.list2(lambda env, x, ixs: [pd_select(pd_iterable(x), pd_iterable(ixs))]),
+    ],
+            docs="""Order statistic (zero-indexed), found without sorting
+            the whole sequence. Given a list of indices instead, take all
+            those order statistics at once.""",
+            stability="alpha")
     cput('Is_sorted', ['$p'], [
-        Case.seq(lambda env, s: [int(all(pd_lte(a, b) for a, b in pd_zip_with_tail(s)))]),
+        Case.seq(lambda env, s: [int(pd_is_sorted(s))]),
     ], docs="Test if sorted", stability="beta")
     cput('Is_strictly_increasing', ['<p'], [
-        Case.seq(lambda env, s: [int(all(pd_less_than(a, b) for a, b in pd_zip_with_tail(s)))]),
+        Case.seq(lambda env, s: [int(pd_is_sorted(s, strict=True))]),
     ], docs="Test if strictly increasing", stability="beta")
     cput('Is_strictly_decreasing', ['>p'], [
-        Case.seq(lambda env, s: [int(all(pd_less_than(b, a) for a, b in pd_zip_with_tail(s)))]),
+        Case.seq(lambda env, s: [int(pd_is_sorted(s, strict=True, reverse=True))]),
     ], docs="Test if strictly decreasing", stability="beta")
     # }}}
     # Range/enumerate/flatten; Comma, J {{{
@@ -922,7 +947,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             pd_if_then_empty_list(env, cond, block, negate=True)),
     ],
             docs="""Binary OR on numbers. Union on sequences. One-branch unless
-            on blocks.""", stability="beta")
+            on blocks.""", stability="beta",
+            fold_op=FoldOp(num.pd_or, operator.or_))
     cput('Bin_and_or_intersection_or_if', ['&'], [
         Case.number2(lambda env, a, b: [num.pd_and(a, b)]),
         Case.seq2_range(lambda env, a, b: [pd_seq_intersection(a, b)]),
@@ -930,7 +956,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             pd_if_then_empty_list(env, cond, block)),
     ],
             docs="""Binary AND on numbers. Intersection on sequences.
-            One-branch if on blocks.""", stability="beta")
+            One-branch if on blocks.""", stability="beta",
+            fold_op=FoldOp(num.pd_and, operator.and_))
     cput('Exclusive_or_or_symmetric_difference_or_find_last', ['^'], [
         Case.number2(lambda env, a, b: [num.pd_xor(a, b)]),
         Case.seq2_range(lambda env, a, b: [pd_seq_symmetric_difference(a, b)]),
@@ -940,7 +967,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     ],
             docs="""Binary XOR on numbers. Symmetric difference on sequences.
             Find last on block and sequence.
-            """, stability="beta")
+            """, stability="beta",
+            fold_op=FoldOp(num.pd_xor, operator.xor))
     cput('Boolean_and', ['&p'], [
         Case.value2(lambda env, a, b: [b if a else a]),
     ],
@@ -1137,13 +1165,15 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
         Case.value2_block(lambda env, a, b, f: [pd_min(a, b, (env, f))]),
     ],
             docs="""Minimum of two values, optionally by a block""",
-            stability="beta")
+            stability="beta",
+            fold_op=FoldOp(pd_min, min, min))
     cput('Max', ['>m', 'Ã'], [
         Case.value2(lambda env, a, b: [pd_max(a, b)]),
         Case.value2_block(lambda env, a, b, f: [pd_max(a, b, (env, f))]),
     ],
             docs="""Maximum of two values, optionally by a block""",
-            stability="beta")
+            stability="beta",
+            fold_op=FoldOp(pd_max, max, max))
     cput('Median_of_three', ['=m'], [
         Case.value3(lambda env, a, b, c: [pd_median_of_three(a, b, c)]),
         Case.value3_block(lambda env, a, b, c, f: [pd_median_of_three(a, b, c, (env, f))]),
@@ -1167,10 +1197,28 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             reducing by maximum of two values.""",
             stability="beta")
     cput('Array_median', ['=r'], [
-        # TODO: True median should try to take the average of two elements
-        Case.list_(lambda env, x: [pd_to_sorted(x)[len(x)//2]]),
-        Case.str_(lambda env, s: [Char(sorted(s)[len(s)//2])]),
-    ], docs="Median of array", stability="alpha")
+        Case.list_(lambda env, x: [pd_median(pd_iterable(x))]),
+        Case.str_(lambda env, s: [pd_to_char(pd_median(s))]),
+    ],
+            docs="""Median of array: the element in the middle, or the later
+            of the two elements in the middle. See {{ 'Average_median'|b }}
+            for the mean of the two.""",
+            stability="alpha")
+    cput('Average_median', [], [
+        Case.list_(lambda env, x: [pd_median(pd_iterable(x), average=True)]),
+    ],
+            docs="""Median of array of numbers, averaging the two elements in
+            the middle if there are two.""",
+            stability="alpha")
+    cput('Quantiles', [], [
+        Case.list_number(lambda env, x, q: pd_quantiles(pd_iterable(x), [q]), commutative=False),
+        Case.list2(lambda env, x, qs: [pd_quantiles(pd_iterable(x), pd_iterable(qs))]),
+    ],
+            docs="""Quantile of array, given as a fraction between 0 and 1,
+            interpolating linearly between elements if it falls between two
+            of them. Given a list of fractions instead, take all those
+            quantiles at once.""",
+            stability="alpha")
     cput('Compare', ['Co', '˜'], [
         Case.number2(lambda env, a, b: [num.pd_num_cmp(a, b)]),
         Case.str2(lambda env, a, b: [num.any_cmp(a, b)]),
@@ -1254,15 +1302,15 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="beta",
             golf_aliases=['>s'])
     nonempty_left_slices_case  = Case.seq_deref(
-            lambda env, seq: [[seq[:n+1] for n in range(len(seq))]])
+            lambda env, seq: [[pd_slice_view(seq, None, n+1) for n in range(len(seq))]])
     nonempty_right_slices_case = Case.seq_deref(
-            lambda env, seq: [[seq[n:] for n in range(len(seq) - 1, -1, -1)]])
+            lambda env, seq: [[pd_slice_view(seq, n, None) for n in range(len(seq) - 1, -1, -1)]])
     from_empty_left_slices_case  = Case.seq_deref(
-            lambda env, seq: [[seq[:n] for n in range(len(seq) + 1)]])
+            lambda env, seq: [[pd_slice_view(seq, None, n) for n in range(len(seq) + 1)]])
     from_empty_right_slices_case = Case.seq_deref(
-            lambda env, seq: [[seq[n:] for n in range(len(seq), -1, -1)]])
+            lambda env, seq: [[pd_slice_view(seq, n, None) for n in range(len(seq), -1, -1)]])
     def nonempty_slices_func(env: Environment, seq: PdImmutableSeq) -> List[PdObject]:
-        return [[seq[lo:hi]
+        return [[pd_slice_view(seq, lo, hi)
                 for lo in range(len(seq))
                 for hi in range(lo + 1, len(seq) + 1)]]
     nonempty_slices_case = Case.seq_deref(nonempty_slices_func)
@@ -1365,22 +1413,52 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             argument (numbers coerce to single-element lists; if at least one
             argument is a string, both coerce to strings).""",
             stability="unstable")
-    def has_infix(env: Environment, a: Union[list, range, Hoard], b: Union[list, range, Hoard]) -> List[PdObject]:
-        a = pd_to_list(a)
-        b = pd_to_list(b)
-        return [int(any(a[i:i+len(b)] == b for i in range(len(a) - len(b) + 1)))]
     cput('Has_infix', ['=h'], [
-        Case.list2_singleton(has_infix),
+        Case.list2_singleton(lambda env, a, b: [int(pd_find_substring_index(env, b, a) != -1)]),
         Case.seq2_singleton(lambda env, a, b: [int(env.pd_str(b) in env.pd_str(a))]),
     ],
             docs="""Test if the first argument has a substring equal to the
             second argument (numbers coerce to single-element lists; if at
             least one argument is a string, both coerce to strings).""",
             stability="unstable")
+    cput('Count_infix', [], [
+        Case.list2_singleton(lambda env, a, b: [pd_count_subseq(a, b)]),
+        Case.seq2_singleton(lambda env, a, b: [env.pd_str(a).count(env.pd_str(b))]),
+    ],
+            docs="""Count the non-overlapping substrings of the first argument
+            equal to the second argument (numbers coerce to single-element
+            lists; if at least one argument is a string, both coerce to
+            strings).""",
+            stability="unstable")
+    cput('Find_all_patterns', [], [
+        Case.seq2(lambda env, seq, pats: [pd_multi_find_all(seq, pats)]),
+    ],
+            docs="""Given a sequence and a list of patterns, find every
+            occurrence of every pattern (overlapping ones too) in the
+            sequence, as a list of [index, pattern index] pairs in order.
+            Numbers and characters in the list are patterns of one element.
+            Takes time linear in the length of the sequence and patterns plus
+            the number of matches, however many patterns there are.""",
+            stability="alpha")
+    cput('Find_first_pattern', [], [
+        Case.seq2(lambda env, seq, pats: [pd_multi_find_first(seq, pats)]),
+    ],
+            docs="""Given a sequence and a list of patterns, find the
+            earliest occurrence of any pattern in the sequence, as an [index,
+            pattern index] pair (if two start together, the earlier pattern),
+            or an empty list if there is none.""",
+            stability="alpha")
+    cput('Count_patterns', [], [
+        Case.seq2(lambda env, seq, pats: [pd_multi_count(seq, pats)]),
+    ],
+            docs="""Given a sequence and a list of patterns, count the
+            non-overlapping occurrences of each pattern in the sequence, in
+            one pass.""",
+            stability="alpha")
     # }}}
     # Incr/Decr/First/Last/Uncons/Unsnoc/Parens: «»‹›() {{{
     def case_add_const(i: int) -> Case:
-        return Case.number(lambda env, a: [num.pd_add_const(a, i)])
+        return Case.number(lambda env, a: [num.pd_add_const(a, i)], pure=True)
 
     decr_case  = case_add_const(-1)
     incr_case  = case_add_const(1)
@@ -1442,9 +1520,9 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     cput('First_and_last', [], [first_and_last_case], docs="First and last of sequence",
             stability="alpha")
 
-    floor_case = Case.number(lambda env, a: [num.pd_floor(a)])
-    ceil_case  = Case.number(lambda env, a: [num.pd_ceil(a)])
-    round_case = Case.number(lambda env, a: [num.pd_round(a)])
+    floor_case = Case.number(lambda env, a: [num.pd_floor(a)], pure=True)
+    ceil_case  = Case.number(lambda env, a: [num.pd_ceil(a)], pure=True)
+    round_case = Case.number(lambda env, a: [num.pd_round(a)], pure=True)
 
     cput('Floor',   ['<i'], [floor_case], docs="Round down to the nearest integer.", stability="beta", golf_aliases=['‹'])
     cput('Ceiling', ['>i'], [ceil_case ], docs="Round up to the nearest integer.",   stability="beta", golf_aliases=['›'])
@@ -1504,7 +1582,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="alpha")
     # }}}
     # M for Minus (negate) and Mold {{{
-    negate_case = Case.number(lambda env, a: [num.pd_mul_div_const(a, -1, 1)])
+    negate_case = Case.number(lambda env, a: [num.pd_mul_div_const(a, -1, 1)], pure=True)
     mold_case = Case.value_seq(lambda env, x, y: [pd_mold(x, y)])
     memoize_case = Case.block(lambda env, b: [MemoizedBlock(b)])
     cput('Negate', [], [negate_case],
@@ -1525,7 +1603,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="alpha")
     # }}}
     # U for Signum, Uniquify, Until {{{
-    signum_case = Case.number(lambda env, a: [num.pd_signum(a)])
+    signum_case = Case.number(lambda env, a: [num.pd_signum(a)], pure=True)
     uniquify_case = Case.seq(lambda env, a: [pd_seq_uniquify(a)])
     until_case = Case.block2(lambda env, cond, body:
             pd_while_then_empty_list(env, cond, body, negate=True))
@@ -1821,7 +1899,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     cput('Gcd', [], [
         Case.number2(lambda env, a, b: [num.pd_gcd(a, b)]),
     ],
-            stability="beta")
+            stability="beta",
+            fold_op=FoldOp(num.pd_gcd, num.int_gcd))
     cput('Group_maybe_by', ['G'], [
         Case.seq(lambda env, seq: [pd_group(seq)]),
         Case.number2(lambda env, a, b: [num.pd_gcd(a, b)]),
@@ -1863,20 +1942,6 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     odd_case  = Case.number(lambda env, n: [int(num.realify(n) % 2 == 1)])
     cput('Even', ['Ev'], [even_case], stability="alpha")
     cput('Odd',  ['Od'], [odd_case],  stability="alpha")
-    def all_fold_f(es: Optional[List[PdObject]]) -> Optional[bool]:
-        if es is None:
-            return True
-        else:
-            for e in es:
-                if not e: return False
-            return None
-    def any_fold_f(es: Optional[List[PdObject]]) -> Optional[bool]:
-        if es is None:
-            return False
-        else:
-            for e in es:
-                if e: return True
-            return None
     def make_all_and_exists_fold_f() -> Callable[[Optional[List[PdObject]]], Optional[bool]]:
         exists = False
         def f(es: Optional[List[PdObject]]) -> Optional[bool]:
@@ -1922,11 +1987,15 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
         Case.seq(lambda env, a: [int(all(pd_iterable(a)))]),
         Case.block_seq_range(lambda env, block, seq:
             [int(pd_map_fold_into(env, block, seq, all_fold_f))]),
+        Case.block_lazy(lambda env, block, seq:
+            [int(pd_map_fold_into(env, block, seq, all_fold_f))]),
     ]
     any_cases = [
         Case.seq(lambda env, a: [int(any(pd_iterable(a)))]),
         Case.block_seq_range(lambda env, block, seq:
             [int(pd_map_fold_into(env, block, seq, any_fold_f))]),
+        Case.block_lazy(lambda env, block, seq:
+            [int(pd_map_fold_into(env, block, seq, any_fold_f))]),
     ]
     all_and_exists_cases = [
         Case.seq(lambda env, a: [int(all_and_exists(pd_iterable(a)))]),
@@ -1937,11 +2006,15 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
         Case.seq(lambda env, a: [int(not all(pd_iterable(a)))]),
         Case.block_seq_range(lambda env, block, seq:
             [int(not pd_map_fold_into(env, block, seq, all_fold_f))]),
+        Case.block_lazy(lambda env, block, seq:
+            [int(not pd_map_fold_into(env, block, seq, all_fold_f))]),
     ]
     not_any_cases = [
         Case.seq(lambda env, a: [int(not any(pd_iterable(a)))]),
         Case.block_seq_range(lambda env, block, seq:
             [int(not pd_map_fold_into(env, block, seq, any_fold_f))]),
+        Case.block_lazy(lambda env, block, seq:
+            [int(not pd_map_fold_into(env, block, seq, any_fold_f))]),
     ]
     identical_cases = [
         Case.seq(lambda env, a: [int(pd_seq_is_identical(a))]),
@@ -1987,10 +2060,12 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
         a = env.pop()
         if isinstance(a, Block):
             a(env)
-        elif isinstance(a, (str, list, range, Hoard)):
+        elif isinstance(a, (str, list, range, ListView, Hoard)):
             env.push(*pd_iterable(a))
         elif isinstance(a, int):
             env.push(~a)
+        elif isinstance(a, LazySeq):
+            raise lazy_unsupported('Expanding')
         else:
             raise NotImplementedError
 
@@ -2004,7 +2079,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
 
     @put('Quine_output', 'Qo', docs="Output the value of Qn, which will usually be the current program", stability="alpha")
     def quine_output(env: Environment) -> None:
-        print(env.pd_str(env.get('Qn')), end="")
+        env.write_output(env.pd_str(env.get('Qn')))
 
     @put('Quine_print', 'Qp', docs="Print the value of Qn, which will usually be the current program", stability="alpha")
     def quine_print(env: Environment) -> None:
@@ -2026,8 +2101,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             docs="""Output to standard output.""",
             stability="beta")
     def pd_output(env: Environment) -> None:
-        a = env.pop()
-        print(env.pd_str(a), end="")
+        env.write_pd_str(env.pop())
 
     @put('Print', 'P',
             docs="""Output to standard output, followed by an output record
@@ -2044,7 +2118,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="unstable")
     def pd_print_lines(env: Environment) -> None:
         a = env.pop()
-        if not isinstance(a, (str, list, range)):
+        if not isinstance(a, (str, list, range, ListView)):
             raise TypeError('Cannot Print_lines non-sequence')
         for e in pd_iterable(a):
             env.print_output_record(env.pd_str(e))
@@ -2063,11 +2137,11 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     @put('Space_output', ' o',
             docs="Output a space.", stability="beta")
     def pd_space_output(env: Environment) -> None:
-        print(' ', end="")
+        env.write_output(' ')
     @put('Newline_output', '\no', '\\no',
             docs="Output a newline.", stability="beta")
     def pd_newline_output(env: Environment) -> None:
-        print()
+        env.write_output('\n')
     @put('Newline_print', '\np', '\\np',
             docs="Output a newline, followed by an output record separator.",
             stability="beta")
@@ -2117,6 +2191,55 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
                     outfile.write(env.pd_str(a))
             else:
                 raise Exception("Cannot append non-string filename!")
+        @put('Record_log_hoard',
+                docs="""Open a file with the given name (creating it if
+                necessary) as a hoard of its lines, each parsed as a number if
+                possible. The file is not read into memory. Appending to the
+                hoard appends lines to the file; existing lines cannot be
+                changed.""",
+                stability="alpha")
+        def record_log_hoard(env: Environment) -> None:
+            filename = env.pop()
+            if isinstance(filename, str):
+                env.push(Hoard(RecordLog(filename)))
+            else:
+                raise Exception("Cannot open non-string filename!")
+        @put('Mapped_array_hoard',
+                docs="""Open a file with the given name as a fixed-length
+                hoard of 64-bit ints, memory-mapped rather than read into
+                memory. If a length is given after the name, the file is
+                created or resized (padding with zeroes) to that many ints.""",
+                stability="alpha")
+        def mapped_array_hoard(env: Environment) -> None:
+            length: Optional[int] = None
+            a = env.pop()
+            if isinstance(a, (Char, int)):
+                length = num.intify(a)
+                a = env.pop()
+            if isinstance(a, str):
+                env.push(Hoard(MappedArray(a, length)))
+            else:
+                raise Exception("Cannot open non-string filename!")
+        @put('Flush_hoard',
+                docs="""Write any pending changes to a file-backed hoard out
+                to its file.""",
+                stability="alpha")
+        def flush_hoard(env: Environment) -> None:
+            h = env.pop()
+            if isinstance(h, Hoard):
+                h.flush()
+            else:
+                raise TypeError("Cannot flush non-hoard")
+        @put('Close_hoard',
+                docs="""Flush and close the file behind a file-backed hoard,
+                detaching and emptying the hoard.""",
+                stability="alpha")
+        def close_hoard(env: Environment) -> None:
+            h = env.pop()
+            if isinstance(h, Hoard):
+                h.close()
+            else:
+                raise TypeError("Cannot close non-hoard")
     # }}}
     # Break, Continue, Exit {{{
     @put('Exit', 'E',
@@ -2152,7 +2275,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     def pd_constant_fraction_cases(p: int, q: int) -> List[Case]:
         # Cannot sensibly handle improper fractions p/q > 1 if q > 1.
         return [
-            Case.number(lambda env, a: [num.pd_mul_div_const(a, p, q)]),
+            Case.number(lambda env, a: [num.pd_mul_div_const(a, p, q)], pure=True),
             Case.seq(lambda env, a: [pd_slice(a, None, len(a)*p//q) if p <= q else pd_mul_seq(a, p)]),
             Case.block(lambda env, b:
                 pd_run_with_probability_then_empty_list(env, b, p/q)
@@ -2170,7 +2293,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     ], stability="unstable")
 
     cput('Square', ['²'], [
-        Case.number(lambda env, n: [num.pd_power_const(n, 2)]),
+        Case.number(lambda env, n: [num.pd_power_const(n, 2)], pure=True),
         Case.seq(lambda env, s: [pd_cartesian_product_seq_matrix(s, s)]),
         Case.block_seq_range(lambda env, block, seq: [pd_map_cartesian_product(env, block, seq, seq, flat=False)]),
     ],
@@ -2178,7 +2301,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             sequence with itself, or map a block across that.""",
             stability="beta")
     cput('Cube', ['³'], [
-        Case.number(lambda env, n: [num.pd_power_const(n, 3)]),
+        Case.number(lambda env, n: [num.pd_power_const(n, 3)], pure=True),
         Case.seq(lambda env, s: [pd_cartesian_product_seq_matrix_3(s, s, s)]),
     ],
             docs="""Cube a number, or compute the Cartesian product of three
@@ -2186,8 +2309,8 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="beta")
     # }}}
     # Len, abs, loop {{{
-    abs_case = Case.number(lambda env, n: [num.pd_abs(n)])
-    len_case = Case.seq(lambda env, seq: [len(seq)])
+    abs_case = Case.number(lambda env, n: [num.pd_abs(n)], pure=True)
+    len_case = Case.seq(lambda env, seq: [len(seq)], pure=True)
     loop_case = Case.block(lambda env, block: [pd_forever_then_empty_list(env, block)])
     cput('Len', [], [len_case],
             docs="""Length of a sequence.""",
@@ -2228,11 +2351,11 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     cput('Log_two', ['Lg'], [Case.value_rc2v(math.log2 , lambda t: cmath.log(t) / cmath.log(2))], stability="alpha")
     # }}}
     # Character conversion and predicates (letter-case etc) {{{
-    cput('Lowercase', ['Lc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.lower(), x)])], docs="Converts all characters to lowercase. Deeply vectorizes.", stability="beta")
-    cput('Uppercase', ['Uc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.upper(), x)])], docs="Converts all characters to uppercase. Deeply vectorizes.", stability="beta")
-    cput('Exchange_case', ['Xc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.swapcase(), x)])], docs="Swaps the case of all characters. Deeply vectorizes.", stability="alpha")
+    cput('Lowercase', ['Lc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.lower(), x)], pure=True)], docs="Converts all characters to lowercase. Deeply vectorizes.", stability="beta")
+    cput('Uppercase', ['Uc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.upper(), x)], pure=True)], docs="Converts all characters to uppercase. Deeply vectorizes.", stability="beta")
+    cput('Exchange_case', ['Xc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.swapcase(), x)], pure=True)], docs="Swaps the case of all characters. Deeply vectorizes.", stability="alpha")
     # TODO: this doesn't work on, say, lists of chars
-    cput('Title_case', ['Tc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.title(), x)])], docs="Title-cases all strings?", stability="alpha")
+    cput('Title_case', ['Tc'], [Case.value(lambda env, x: [pd_deepmap_s2s(lambda e: e.title(), x)], pure=True)], docs="Title-cases all strings?", stability="alpha")
     cput('Matching_character', ['Mc'], [
         Case.value(lambda env, x: [pd_deepmap_s2s(
             lambda e: num.matching_dict.get(e, e), x, whole_str_ok=False)])
@@ -2241,11 +2364,11 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             ()[]{}<>, or returns the character itself. Deeply vectorizes.""",
             stability="alpha")
 
-    cput('Is_alpha', ['Ap'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isalpha()), x)])], docs="Tests if characters are letters. Deeply vectorizes.", stability="beta")
-    cput('Is_digit', ['Dp'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isdigit()), x)])], docs="Tests if characters are digits. Deeply vectorizes.", stability="alpha")
-    cput('Is_lower', ['Lp'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.islower()), x)])], docs="Tests if characters are lowercase. Deeply vectorizes.", stability="beta")
-    cput('Is_upper', ['Up'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isupper()), x)])], docs="Tests if characters are uppercase. Deeply vectorizes.", stability="beta")
-    cput('Is_space', ['Wp'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isspace()), x)])], docs="Tests if characters are whitespace. Deeply vectorizes.", stability="alpha")
+    cput('Is_alpha', ['Ap'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isalpha()), x)], pure=True)], docs="Tests if characters are letters. Deeply vectorizes.", stability="beta")
+    cput('Is_digit', ['Dp'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isdigit()), x)], pure=True)], docs="Tests if characters are digits. Deeply vectorizes.", stability="alpha")
+    cput('Is_lower', ['Lp'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.islower()), x)], pure=True)], docs="Tests if characters are lowercase. Deeply vectorizes.", stability="beta")
+    cput('Is_upper', ['Up'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isupper()), x)], pure=True)], docs="Tests if characters are uppercase. Deeply vectorizes.", stability="beta")
+    cput('Is_space', ['Wp'], [Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: int(e.isspace()), x)], pure=True)], docs="Tests if characters are whitespace. Deeply vectorizes.", stability="alpha")
     cput('Value_of_character', ['Vc'], [
         Case.value(lambda env, x: [pd_deepmap_s2v(lambda e: num.value_dict.get(e, 0), x)])
     ],
@@ -2259,7 +2382,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             docs="""Finds the amount by which a character affects "nestedness":
             ([{< give +1, >}]) give -1, everything else gives 0. Deeply vectorizes.""",
             stability="alpha")
-    cput('Int_of_alpha', ['Ia'], [Case.value(lambda env, x: [pd_deepmap_s2v(num.int_of_alpha, x)])],
+    cput('Int_of_alpha', ['Ia'], [Case.value(lambda env, x: [pd_deepmap_s2v(num.int_of_alpha, x)], pure=True)],
             docs="""Convert a letter to an integer starting with A = 1;
             non-letters (or letters outside the Latin alphabet) give 0. Deeply
             vectorizes.""",
@@ -2396,8 +2519,11 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             stability="alpha")
     cput('Key_map', ['Km'], [
         Case.list_list_block(lambda env, arr, ks, func: [pd_array_keys_map(env, arr, ks, func)]),
+        Case.list_number_block(lambda env, arr, k, func: [pd_array_keys_map(env, arr, [k], func)]),
     ],
-            docs="""Map over keys of an array.""",
+            docs="""Map over keys of an array. Keys of a one-dimensional array
+            can be bare numbers, and a single one can stand in for the list of
+            keys.""",
             stability="alpha")
     cput('Key_get', ['Kg'], [
         Case.seq_seq_singleton(lambda env, arr, k: [pd_array_key_get(arr, k)]),
@@ -2514,6 +2640,187 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             for the original object itself.""",
             stability="unstable")
     # }}}
+    # Grids {{{
+    cput('Grid', [], [
+        Case.list_(lambda env, rows: [Grid.of(rows).view()]),
+    ],
+            docs="""Make a grid out of a list of equally long rows (strings
+            or lists). A grid is a list of its rows, but its cells can also be
+            addressed by a single flat index, as the other Grid_ functions
+            do. The g global trailer reads all input lines into a grid.""",
+            stability="alpha")
+    cput('Grid_get', [], [
+        Case.list_value(lambda env, g, coord: [Grid.of(g).cells[Grid.of(g).flat_index(coord)]]),
+    ],
+            docs="""Get the cell of a grid at a flat index or a [row column]
+            pair. Unlike indexing, out-of-range coordinates are an error
+            instead of wrapping around.""",
+            stability="alpha")
+    cput('Grid_coordinates', [], [
+        Case.list_number(lambda env, g, i: [Grid.of(g).coordinates(num.intify(i))],
+            commutative=False),
+    ],
+            docs="""Convert a flat index of a grid to a [row column]
+            pair.""",
+            stability="alpha")
+    cput('Grid_orthogonal_neighbors', [], [
+        Case.list_value(lambda env, g, coord: [Grid.of(g).neighbors(coord, ORTHOGONAL_OFFSETS)]),
+    ],
+            docs="""Flat indices of the up to four cells of a grid
+            orthogonally adjacent to the one at a flat index or [row column]
+            pair.""",
+            stability="alpha")
+    cput('Grid_king_neighbors', [], [
+        Case.list_value(lambda env, g, coord: [Grid.of(g).neighbors(coord, KING_OFFSETS)]),
+    ],
+            docs="""Flat indices of the up to eight cells of a grid
+            orthogonally or diagonally adjacent to the one at a flat index or
+            [row column] pair.""",
+            stability="alpha")
+    cput('Grid_find', [], [
+        Case.block_seq_range(lambda env, block, g: [pd_grid_find(env, Grid.of(g), block)]),
+        Case.list_value(lambda env, g, target: [pd_grid_find(env, Grid.of(g), target)]),
+    ],
+            docs="""Flat indices of all cells of a grid equal to a value or
+            satisfying a block.""",
+            stability="alpha")
+    cput('Grid_column', [], [
+        Case.list_number(lambda env, g, j: [Grid.of(g).transpose()[num.intify(j)]],
+            commutative=False),
+    ],
+            docs="""A column of a grid, without copying.""",
+            stability="alpha")
+    cput('Grid_transpose', [], [
+        Case.list_(lambda env, g: [Grid.of(g).transpose().view()]),
+    ],
+            docs="""Transpose a grid, without copying.""",
+            stability="alpha")
+    # }}}
+    # Graph search {{{
+    def goal_distance(dist: Optional[Union[int, float]]) -> List[PdObject]:
+        return [-1 if dist is None else dist]
+
+    cput('Bfs_distances', [], [
+        Case.block_value(lambda env, block, start: [Hoard.dictionary(
+            pd_bfs(env, start, block)[0])]),
+    ],
+            docs="""Breadth-first search from a node or a list of nodes,
+            where a block takes a node and leaves a list of its neighbors.
+            Pushes a hoard mapping each node reached to its distance from the
+            start. A start node that's a list has to be wrapped in a list.""",
+            stability="alpha")
+    cput('Bfs_parents', [], [
+        Case.block_value(lambda env, block, start: [Hoard.dictionary(
+            (node, parent)
+            for node, parent in pd_bfs(env, start, block)[1].values()
+            if parent is not None)]),
+    ],
+            docs="""Breadth-first search as {{ 'Bfs_distances'|b }}, but
+            pushes a hoard mapping each node reached, other than the starts,
+            to the node it was first reached from.""",
+            stability="alpha")
+    cput('Bfs_reachable', [], [
+        Case.block_value(lambda env, block, start: [[
+            node for node, _ in pd_bfs(env, start, block)[0]]]),
+    ],
+            docs="""Breadth-first search as {{ 'Bfs_distances'|b }}, but
+            pushes a list of all nodes reached, nearest first.""",
+            stability="alpha")
+    cput('Bfs_goal', [], [
+        Case.value_block2(lambda env, start, block, goal: goal_distance(
+            pd_bfs(env, start, block, goal)[2])),
+    ],
+            docs="""Given a start node or list of nodes, a neighbor block as
+            for {{ 'Bfs_distances'|b }}, and a goal predicate, breadth-first
+            search until a node satisfying the goal and push its distance, or
+            -1 if none is reachable.""",
+            stability="alpha")
+    cput('Dfs_reachable', [], [
+        Case.block_value(lambda env, block, start: [
+            pd_dfs_order(env, start, block)]),
+    ],
+            docs="""Depth-first search from a node or a list of nodes with a
+            neighbor block as for {{ 'Bfs_distances'|b }}. Pushes a list of
+            all nodes reached, in preorder.""",
+            stability="alpha")
+    cput('Dijkstra_distances', [], [
+        Case.block_value(lambda env, block, start: [Hoard.dictionary(
+            pd_dijkstra(env, start, block)[0])]),
+    ],
+            docs="""Shortest paths from a node or a list of nodes, where a
+            block takes a node and leaves a list of [neighbor weight] pairs.
+            Weights must be nonnegative. Pushes a hoard mapping each node
+            reached to its distance from the start.""",
+            stability="alpha")
+    cput('Dijkstra_goal', [], [
+        Case.value_block2(lambda env, start, block, goal: goal_distance(
+            pd_dijkstra(env, start, block, goal)[1])),
+    ],
+            docs="""Given a start node or list of nodes, a weighted neighbor
+            block as for {{ 'Dijkstra_distances'|b }}, and a goal predicate,
+            push the distance to the nearest node satisfying the goal, or -1
+            if none is reachable.""",
+            stability="alpha")
+    # }}}
+    # Lazy sequences {{{
+    cput('Lazy', [], [
+        Case.lazy(lambda env, seq: [seq]),
+        Case.number(lambda env, n: [LazySeq(range(num.intify(n)))]),
+    ],
+            docs="""Make a sequence lazy, so that mapping or filtering it with
+            trailers, or with {{ 'Lazy_map'|b }} and friends, only runs the
+            block on elements as they're needed. Numbers coerce to ranges.
+            Lazy sequences remember the elements they've computed and are
+            only computed in full when printed or {{ 'Force'|b }}d.""",
+            stability="alpha")
+    cput('Lazy_count_from', ['Naturals_from'], [
+        Case.number(lambda env, n: [LazySeq(itertools.count(num.numerify(n)))]),
+    ],
+            docs="""The infinite lazy sequence of numbers counting up from
+            this number.""",
+            stability="alpha")
+    cput('Lazy_iterate', ['Unfold'], [
+        Case.block_value(lambda env, block, x: [pd_lazy_iterate(env, block, x)]),
+    ],
+            docs="""The infinite lazy sequence of a value, the result of
+            running a block on it, the result of running the block on that,
+            and so on.""",
+            stability="alpha")
+    cput('Lazy_map', [], [
+        Case.block_lazy(lambda env, block, seq: [pd_lazy_map(env, block, seq)]),
+    ],
+            docs="""Lazily map a block over a sequence.""",
+            stability="alpha")
+    cput('Lazy_filter', [], [
+        Case.block_lazy(lambda env, block, seq: [pd_lazy_filter(env, block, seq)]),
+    ],
+            docs="""Lazily filter a sequence by a block.""",
+            stability="alpha")
+    cput('Lazy_zip', [], [
+        Case.lazy2(lambda env, a, b: [pd_lazy_zip(a, b)]),
+    ],
+            docs="""Lazily zip two sequences into pairs, stopping when either
+            does.""",
+            stability="alpha")
+    cput('Lazy_take', ['Take'], [
+        Case.lazy_number(lambda env, seq, n: [seq.take(num.intify(n))]),
+    ],
+            docs="""The list of the first n elements of a lazy sequence (or
+            all of them if there are fewer), computing only those.""",
+            stability="alpha")
+    cput('Lazy_get', [], [
+        Case.lazy_number(lambda env, seq, n: [seq[num.intify(n)]]),
+    ],
+            docs="""Index into a lazy sequence, computing elements only up to
+            that index. Negative indices force the whole sequence.""",
+            stability="alpha")
+    cput('Force', [], [
+        Case.lazy(lambda env, seq: [list(seq.force())]),
+    ],
+            docs="""Compute all elements of a lazy sequence into a list.
+            Never finishes on an infinite one.""",
+            stability="alpha")
+    # }}}
     # Number theory (primes etc) {{{
     cput('Is_prime', ['Pp', '¶'], [
         Case.value_r2v(discrete.is_prime_as_int),
@@ -2550,6 +2857,36 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     ],
             docs="""Jacobi symbol of two numbers""",
             stability="unstable")
+    cput('Int_root', ['Ir'], [
+        Case.number2(lambda env, a, k: [discrete.int_nth_root(num.intify(a), num.intify(k))]),
+    ],
+            docs="""Integer nth root: the floor of the root, given the number
+            and then n, computed exactly. Odd roots of negative numbers round
+            towards zero.""",
+            stability="alpha")
+    cput('Power_mod', ['Pm'], [
+        Case.number3(lambda env, a, b, m: [discrete.pow_mod(num.intify(a), num.intify(b), num.intify(m))]),
+    ],
+            docs="""Modular exponentiation: given a, b, and m, a to the power
+            of b modulo m, without computing the full power. A negative b
+            uses the modular inverse of a.""",
+            stability="alpha")
+    cput('Inverse_mod', ['Im'], [
+        Case.number2(lambda env, a, m: [discrete.inverse_mod(num.intify(a), num.intify(m))]),
+    ],
+            docs="""Modular inverse: given a and m, the x in [0, m) with ax =
+            1 modulo m. Errors if there is none.""",
+            stability="alpha")
+    cput('Chinese_remainder', ['Cr'], [
+        Case.list2(lambda env, rs, ms: [discrete.chinese_remainder(
+            list(pd_flatten_to_int_generator(rs)),
+            list(pd_flatten_to_int_generator(ms)))[0]]),
+    ],
+            docs="""Chinese remainder theorem: given a list of residues and a
+            list of moduli, the smallest nonnegative number congruent to each
+            residue modulo the corresponding modulus. The moduli need not be
+            coprime; errors if the congruences are inconsistent.""",
+            stability="alpha")
     # }}}
     # Time {{{
     cput('Now_time', ['Nt'], [Case.void(lambda env: [time.time()])], stability="alpha")
@@ -2603,8 +2940,22 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             raise AssertionError("Can't seed random with non-numeric non-string value " + repr(e))
     # }}}
     # Regular expressions {{{
+    def pd_regex(env: Environment, regex: PdObject) -> Pattern:
+        return env.compile_regex(env.pd_str(regex))
+    # Compile the regex once, then run it over every element.
+    def regex_map(env: Environment, seq: Union[list, range, ListView, Hoard], regex: PdObject,
+            func: Callable[[Pattern, str], PdObject]) -> List[PdObject]:
+        pattern = pd_regex(env, regex)
+        return [[func(pattern, env.pd_str(e)) for e in pd_iterable(seq)]]
+    def regex_sub_map(env: Environment, seq: Union[list, range, ListView, Hoard], regex: PdObject, repl: PdObject) -> List[PdObject]:
+        repl_str = env.pd_str(repl)
+        return regex_map(env, seq, regex, lambda r, s: r.sub(repl_str, s))
+    def regex_split(r: Pattern, s: str) -> List[PdObject]:
+        # like match_to_pd, leave out groups that didn't participate
+        return [piece for piece in r.split(s) if piece is not None]
+
     cput('Regex_search', ['Xs'], [
-        Case.value2(lambda env, s, regex: [match_to_pd(re.search(env.pd_str(regex), env.pd_str(s)))]),
+        Case.value2(lambda env, s, regex: [match_to_pd(pd_regex(env, regex).search(env.pd_str(s)))]),
     ],
             docs="""Take a string and a regex, and perform a regex search
             through the string. Returns a list consisting of the string matched
@@ -2613,7 +2964,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             whether a match is found).""",
             stability="unstable")
     cput('Regex_match', ['Xm'], [
-        Case.value2(lambda env, s, regex: [match_to_pd(re.fullmatch(env.pd_str(regex), env.pd_str(s)))]),
+        Case.value2(lambda env, s, regex: [match_to_pd(pd_regex(env, regex).fullmatch(env.pd_str(s)))]),
     ],
             docs="""Take a string and a regex, and attempt to match the regex
             exactly against the entire string.  Returns a list consisting of
@@ -2622,13 +2973,61 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
             the result is whether a match is found).""",
             stability="unstable")
     cput('Regex_array', ['Xa'], [
-        Case.value2(lambda env, s, regex: [[match_to_pd(m) for m in re.finditer(env.pd_str(regex), env.pd_str(s))]]),
+        Case.value2(lambda env, s, regex: [[match_to_pd(m) for m in pd_regex(env, regex).finditer(env.pd_str(s))]]),
     ],
             docs="""Take a string and a regex, and find all matches (this is
             Python's re.finditer, and its caveats apply.) Returns a list with
             one list for each match; each list consists of the string matched
             by the regex followed by all of the regex's groups.""",
             stability="unstable")
+    cput('Regex_sub', [], [
+        Case.value3(lambda env, s, regex, repl: [pd_regex(env, regex).sub(env.pd_str(repl), env.pd_str(s))]),
+    ],
+            docs="""Take a string, a regex, and a replacement, and replace
+            every match of the regex in the string (this is Python's re.sub,
+            so the replacement can refer to groups like \\1).""",
+            stability="unstable")
+    cput('Regex_split', [], [
+        Case.value2(lambda env, s, regex: [regex_split(pd_regex(env, regex), env.pd_str(s))]),
+    ],
+            docs="""Take a string and a regex, and split the string around
+            matches of the regex (this is Python's re.split, so the regex's
+            groups are included between the pieces).""",
+            stability="unstable")
+
+    cput('Regex_search_map', [], [
+        Case.list_value(lambda env, seq, regex: regex_map(env, seq, regex,
+            lambda r, s: match_to_pd(r.search(s)))),
+    ],
+            docs="""Take a list and a regex, and perform a regex search
+            through each element, as Regex_search.""",
+            stability="unstable")
+    cput('Regex_match_map', [], [
+        Case.list_value(lambda env, seq, regex: regex_map(env, seq, regex,
+            lambda r, s: match_to_pd(r.fullmatch(s)))),
+    ],
+            docs="""Take a list and a regex, and match the regex against
+            each element, as Regex_match.""",
+            stability="unstable")
+    cput('Regex_array_map', [], [
+        Case.list_value(lambda env, seq, regex: regex_map(env, seq, regex,
+            lambda r, s: [match_to_pd(m) for m in r.finditer(s)])),
+    ],
+            docs="""Take a list and a regex, and find all matches in each
+            element, as Regex_array.""",
+            stability="unstable")
+    cput('Regex_sub_map', [], [
+        Case.list_value2(regex_sub_map),
+    ],
+            docs="""Take a list, a regex, and a replacement, and replace
+            every match of the regex in each element, as Regex_sub.""",
+            stability="unstable")
+    cput('Regex_split_map', [], [
+        Case.list_value(lambda env, seq, regex: regex_map(env, seq, regex, regex_split)),
+    ],
+            docs="""Take a list and a regex, and split each element around
+            matches of the regex, as Regex_split.""",
+            stability="unstable")
     # }}}
     # Stack functions {{{
     @put('Pop_stack', ';s',
@@ -2659,7 +3058,7 @@ def initialize_builtins(env: Environment, sandboxed: bool, debug: bool) -> None:
     @put('Output_stack', 'Os',
             stability="beta")
     def output_stack(env: Environment) -> None:
-        print(env.pd_str(env.pop_until_stack_marker()), end="")
+        env.write_pd_str(env.pop_until_stack_marker())
     @put('Print_stack', 'Ps',
             stability="beta")
     def print_stack(env: Environment) -> None:
@@ -1,7 +1,8 @@
 from paradoc.objects import (
-        PdObject, Environment, PdSeq, PdValue, PdNum, Char, Block,
+        PdObject, Environment, PdSeq, PdValue, PdNum, Char, Block, FoldOp,
         pd_deepmap_n2v, pd_deepmap_r2v, pd_deepmap_rc2v,
-        Hoard, PdImmutableSeq, PdEmptyStackException,
+        Hoard, ListView, LazySeq, PdImmutableSeq, PdEmptyStackException,
+        pd_to_lazy, lazy_unsupported,
         )
 from typing import Any, Callable, List, Optional, Tuple, Type, Union
 
@@ -29,58 +30,64 @@ just_int       = ArgType.just_type(int)
 just_char      = ArgType.just_type(Char)
 just_number    = ArgType.just_type(Char, int, float, complex)
 just_str       = ArgType.just_type(str)
-just_list      = ArgType.just_type(list, range, Hoard)
-just_seq       = ArgType.just_type(str, list, range, Hoard)
+just_list      = ArgType.just_type(list, range, ListView, Hoard)
+just_seq       = ArgType.just_type(str, list, range, ListView, Hoard)
 just_block     = ArgType.just_type(Block)
 just_hoard     = ArgType.just_type(Hoard)
-just_immutable = ArgType.just_type(Char, int, float, complex, str, list, range)
-just_value     = ArgType.just_type(Char, int, float, complex, str, list, range, Hoard)
-just_any       = ArgType.just_type(Char, int, float, complex, str, list, range, Hoard, Block)
+just_immutable = ArgType.just_type(Char, int, float, complex, str, list, range, ListView)
+just_value     = ArgType.just_type(Char, int, float, complex, str, list, range, ListView, Hoard)
+just_any       = ArgType.just_type(Char, int, float, complex, str, list, range, ListView, Hoard, LazySeq, Block)
+
+# Accepts a lazy sequence, making other sequences lazy
+lazy_seq = ArgType([
+        ((LazySeq,),                          lambda x: x),
+        ((str, list, range, ListView, Hoard), pd_to_lazy),
+        ])
 
 # Accepts a list, coercing Chars or numbers to single-element lists
 list_singleton = ArgType([
-        ((Char, int, float, complex), lambda x: [x]),
-        ((list, range, Hoard),        lambda x: x),
+        ((Char, int, float, complex),     lambda x: [x]),
+        ((list, range, ListView, Hoard), lambda x: x),
         ])
 
 # Accepts a seq, dereferencing hoards
 seq_deref = ArgType([
-        ((str, list, range), lambda x: x),
-        ((Hoard,),           lambda x: x.to_list()),
+        ((str, list, range, ListView), lambda x: x),
+        ((Hoard,),                     lambda x: x.to_list()),
         ])
 
 # Accepts a sequence, coercing Chars or numbers to single-element strings or
 # lists
 seq_singleton = ArgType([
-        ((Char,),                   lambda x: x.chr),
-        ((int, float, complex),     lambda x: [x]),
-        ((str, list, range, Hoard), lambda x: x),
+        ((Char,),                             lambda x: x.chr),
+        ((int, float, complex),               lambda x: [x]),
+        ((str, list, range, ListView, Hoard), lambda x: x),
         ])
 # Accepts a sequence, coercing Chars or numbers to ranges
 seq_range = ArgType([
-        ((Char,),                   lambda x: range(x.ord)),
-        ((int,),                    lambda x: range(x)),
-        ((float,),                  lambda x: range(int(x))),
-        ((complex,),                lambda x: range(int(x.real))),
-        ((str, list, range, Hoard), lambda x: x),
+        ((Char,),                             lambda x: range(x.ord)),
+        ((int,),                              lambda x: range(x)),
+        ((float,),                            lambda x: range(int(x))),
+        ((complex,),                          lambda x: range(int(x.real))),
+        ((str, list, range, ListView, Hoard), lambda x: x),
         ])
 seq_range_deref = ArgType([
-        ((Char,),            lambda x: range(x.ord)),
-        ((int,),             lambda x: range(x)),
-        ((float,),           lambda x: range(int(x))),
-        ((complex,),         lambda x: range(int(x.real))),
-        ((str, list, range), lambda x: x),
-        ((Hoard,),           lambda x: x.to_list()),
+        ((Char,),                      lambda x: range(x.ord)),
+        ((int,),                       lambda x: range(x)),
+        ((float,),                     lambda x: range(int(x))),
+        ((complex,),                   lambda x: range(int(x.real))),
+        ((str, list, range, ListView), lambda x: x),
+        ((Hoard,),                     lambda x: x.to_list()),
         ])
 
 # Accepts a list, coercing strings to lists of integers and Chars or numbers to ranges
 list_int_range = ArgType([
-        ((Char,),       lambda x: range(x.ord)),
-        ((int,),        lambda x: range(x)),
-        ((float,),      lambda x: range(int(x))),
-        ((complex,),    lambda x: range(int(x.real))),
-        ((str,),        lambda x: [ord(c) for c in x]),
-        ((list, range), lambda x: x),
+        ((Char,),                 lambda x: range(x.ord)),
+        ((int,),                  lambda x: range(x)),
+        ((float,),                lambda x: range(int(x))),
+        ((complex,),              lambda x: range(int(x.real))),
+        ((str,),                  lambda x: [ord(c) for c in x]),
+        ((list, range, ListView), lambda x: x),
         ])
 
 # Accepts an int, coercing Chars, floats, and strings to integers
@@ -95,19 +102,19 @@ int_coerce = ArgType([
 # Accepts an int, coercing Chars and floats to integers and taking the
 # lengths of sequences
 int_len = ArgType([
-        ((Char,),          lambda x: x.ord),
-        ((int,),           lambda x: x),
-        ((float,),         lambda x: int(x)),
-        ((complex,),       lambda x: int(abs(x))),
-        ((str,list,range), lambda x: len(x)),
+        ((Char,),                   lambda x: x.ord),
+        ((int,),                    lambda x: x),
+        ((float,),                  lambda x: int(x)),
+        ((complex,),                lambda x: int(abs(x))),
+        ((str,list,range,ListView), lambda x: len(x)),
         ])
 
 # Accepts an int or a float, coercing Chars to integers and taking the lengths
 # of sequences
 number_len = ArgType([
-        ((Char,),             lambda x: x.ord),
-        ((int,float,complex), lambda x: x),
-        ((str,list,range),    lambda x: len(x)),
+        ((Char,),                   lambda x: x.ord),
+        ((int,float,complex),       lambda x: x),
+        ((str,list,range,ListView), lambda x: len(x)),
         ])
 
 # A case in a function definition, which specifies a list of types of
@@ -125,28 +132,37 @@ class Case:
             arity: int,
             arg_types: List[ArgType],
             func: Callable[..., List[PdObject]],
-            commutative: bool = False) -> None:
+            commutative: bool = False,
+            pure: bool = False) -> None:
         self.arity = arity
         self.arg_types = arg_types
         self.func = func
         self.commutative = commutative
+        # A pure case does nothing but compute its results from its
+        # arguments: it doesn't touch the stack or variables or run blocks,
+        # so it's safe to call directly, outside any sandbox.
+        self.pure = pure
 
-    def maybe_run_noncommutatively(self, env: Environment, args: List[PdObject]) -> Optional[List[PdObject]]:
+    def process_noncommutatively(self, args: List[PdObject]) -> Optional[List[PdObject]]:
         assert self.arity == len(args)
         processed_args = []
         for arg, arg_type in zip(args, self.arg_types):
             p_arg = arg_type.maybe_process(arg)
             if p_arg is None: return None
             processed_args.append(p_arg)
-        res = self.func(env, *processed_args)
-        return res
+        return processed_args
 
-    def maybe_run(self, env: Environment, args: List[PdObject]) -> Optional[List[PdObject]]:
-        res = self.maybe_run_noncommutatively(env, args)
-        if res is None and self.commutative:
-            res = self.maybe_run_noncommutatively(env,
+    def process(self, args: List[PdObject]) -> Optional[List[PdObject]]:
+        processed_args = self.process_noncommutatively(args)
+        if processed_args is None and self.commutative:
+            processed_args = self.process_noncommutatively(
                     [args[1], args[0]] + args[2:])
-        return res
+        return processed_args
+
+    def maybe_run(self, env: Environment, args: List[PdObject]) -> Optional[List[PdObject]]:
+        processed_args = self.process(args)
+        if processed_args is None: return None
+        return self.func(env, *processed_args)
 
     @staticmethod
     def void(func: Callable[[Environment], List[PdObject]]) -> 'Case':
@@ -164,11 +180,11 @@ class Case:
     def str_(func: Callable[[Environment, str], List[PdObject]]) -> 'Case':
         return Case(1, [just_str], func)
     @staticmethod
-    def list_(func: Callable[[Environment, Union[list, range, Hoard]], List[PdObject]]) -> 'Case':
+    def list_(func: Callable[[Environment, Union[list, range, ListView, Hoard]], List[PdObject]]) -> 'Case':
         return Case(1, [just_list], func)
     @staticmethod
-    def seq(func: Callable[[Environment, PdSeq], List[PdObject]]) -> 'Case':
-        return Case(1, [just_seq], func)
+    def seq(func: Callable[[Environment, PdSeq], List[PdObject]], pure: bool = False) -> 'Case':
+        return Case(1, [just_seq], func, pure=pure)
     @staticmethod
     def seq_deref(func: Callable[[Environment, PdImmutableSeq], List[PdObject]]) -> 'Case':
         return Case(1, [seq_deref], func)
@@ -179,22 +195,22 @@ class Case:
     def seq_range_deref(func: Callable[[Environment, PdImmutableSeq], List[PdObject]]) -> 'Case':
         return Case(1, [seq_range_deref], func)
     @staticmethod
-    def number(func: Callable[[Environment, Union[int, float, complex]], List[PdObject]]) -> 'Case':
-        return Case(1, [just_number], func)
+    def number(func: Callable[[Environment, Union[int, float, complex]], List[PdObject]], pure: bool = False) -> 'Case':
+        return Case(1, [just_number], func, pure=pure)
     @staticmethod
-    def value(func: Callable[[Environment, PdValue], List[PdObject]]) -> 'Case':
-        return Case(1, [just_value], func)
+    def value(func: Callable[[Environment, PdValue], List[PdObject]], pure: bool = False) -> 'Case':
+        return Case(1, [just_value], func, pure=pure)
     @staticmethod
     def value_n2v(func: Callable[[Union[int, float, complex]], PdValue]) -> 'Case':
-        return Case(1, [just_value], lambda env, a: [pd_deepmap_n2v(func, a)])
+        return Case(1, [just_value], lambda env, a: [pd_deepmap_n2v(func, a)], pure=True)
     @staticmethod
     def value_r2v(func: Callable[[Union[int, float]], PdValue]) -> 'Case':
-        return Case(1, [just_value], lambda env, a: [pd_deepmap_r2v(func, a)])
+        return Case(1, [just_value], lambda env, a: [pd_deepmap_r2v(func, a)], pure=True)
     @staticmethod
     def value_rc2v(
             rfunc: Callable[[Union[int, float]], PdValue],
             cfunc: Callable[[complex], PdValue]) -> 'Case':
-        return Case(1, [just_value], lambda env, a: [pd_deepmap_rc2v(rfunc, cfunc, a)])
+        return Case(1, [just_value], lambda env, a: [pd_deepmap_rc2v(rfunc, cfunc, a)], pure=True)
     @staticmethod
     def block(func: Callable[[Environment, Block], List[PdObject]]) -> 'Case':
         return Case(1, [just_block], func)
@@ -202,6 +218,10 @@ class Case:
     def list_int_range(func: Callable[[Environment, Union[list, range]], List[PdObject]]) -> 'Case':
         return Case(1, [list_int_range], func)
 
+    @staticmethod
+    def lazy(func: Callable[[Environment, LazySeq], List[PdObject]]) -> 'Case':
+        return Case(1, [lazy_seq], func)
+
     @staticmethod
     def any2(func: Callable[[Environment, PdObject, PdObject], List[PdObject]]) -> 'Case':
         return Case(2, [just_any, just_any], func)
@@ -218,20 +238,20 @@ class Case:
     def str2(func: Callable[[Environment, str, str], List[PdObject]]) -> 'Case':
         return Case(2, [just_str, just_str], func)
     @staticmethod
-    def list2(func: Callable[[Environment, Union[list, range, Hoard], Union[list, range, Hoard]], List[PdObject]]) -> 'Case':
+    def list2(func: Callable[[Environment, Union[list, range, ListView, Hoard], Union[list, range, ListView, Hoard]], List[PdObject]]) -> 'Case':
         return Case(2, [just_list, just_list], func)
     @staticmethod
-    def list_list_singleton(func: Callable[[Environment, Union[list, range, Hoard], Union[list, range, Hoard]], List[PdObject]]) -> 'Case':
+    def list_list_singleton(func: Callable[[Environment, Union[list, range, ListView, Hoard], Union[list, range, ListView, Hoard]], List[PdObject]]) -> 'Case':
         return Case(2, [just_list, list_singleton], func)
     @staticmethod
-    def list2_singleton(func: Callable[[Environment, Union[list, range, Hoard], Union[list, range, Hoard]], List[PdObject]]) -> 'Case':
+    def list2_singleton(func: Callable[[Environment, Union[list, range, ListView, Hoard], Union[list, range, ListView, Hoard]], List[PdObject]]) -> 'Case':
         return Case(2, [list_singleton, list_singleton], func)
     @staticmethod
-    def list_number(func: Callable[[Environment, Union[list, range, Hoard], PdNum], List[PdObject]], commutative: bool = True) -> 'Case':
+    def list_number(func: Callable[[Environment, Union[list, range, ListView, Hoard], PdNum], List[PdObject]], commutative: bool = True) -> 'Case':
         return Case(2, [just_list, just_number], func,
                 commutative=commutative)
     @staticmethod
-    def list_range_number(func: Callable[[Environment, Union[list, range, Hoard], PdNum], List[PdObject]], commutative: bool = True) -> 'Case':
+    def list_range_number(func: Callable[[Environment, Union[list, range, ListView, Hoard], PdNum], List[PdObject]], commutative: bool = True) -> 'Case':
         return Case(2, [list_int_range, just_number], func,
                 commutative=commutative)
     @staticmethod
@@ -269,6 +289,9 @@ class Case:
     def value_number(func: Callable[[Environment, PdValue, PdNum], List[PdObject]], commutative: bool = True) -> 'Case':
         return Case(2, [just_value, just_number], func, commutative=commutative)
     @staticmethod
+    def list_value(func: Callable[[Environment, Union[list, range, ListView, Hoard], PdValue], List[PdObject]]) -> 'Case':
+        return Case(2, [just_list, just_value], func)
+    @staticmethod
     def value2(func: Callable[[Environment, PdValue, PdValue], List[PdObject]]) -> 'Case':
         return Case(2, [just_value, just_value], func)
     @staticmethod
@@ -284,6 +307,15 @@ class Case:
     def block_value(func: Callable[[Environment, Block, PdValue], List[PdObject]], commutative: bool = True) -> 'Case':
         return Case(2, [just_block, just_value], func, commutative=commutative)
     @staticmethod
+    def block_lazy(func: Callable[[Environment, Block, LazySeq], List[PdObject]]) -> 'Case':
+        return Case(2, [just_block, lazy_seq], func, commutative=True)
+    @staticmethod
+    def lazy2(func: Callable[[Environment, LazySeq, LazySeq], List[PdObject]]) -> 'Case':
+        return Case(2, [lazy_seq, lazy_seq], func)
+    @staticmethod
+    def lazy_number(func: Callable[[Environment, LazySeq, PdNum], List[PdObject]]) -> 'Case':
+        return Case(2, [lazy_seq, just_number], func)
+    @staticmethod
     def block2(func: Callable[[Environment, Block, Block], List[PdObject]]) -> 'Case':
         return Case(2, [just_block, just_block], func)
 
@@ -291,21 +323,33 @@ class Case:
     def any3(func: Callable[[Environment, PdObject, PdObject, PdObject], List[PdObject]]) -> 'Case':
         return Case(3, [just_any, just_any, just_any], func)
     @staticmethod
+    def number3(func: Callable[[Environment, PdNum, PdNum, PdNum], List[PdObject]]) -> 'Case':
+        return Case(3, [just_number, just_number, just_number], func)
+    @staticmethod
     def value3(func: Callable[[Environment, PdValue, PdValue, PdValue], List[PdObject]]) -> 'Case':
         return Case(3, [just_value, just_value, just_value], func)
     @staticmethod
+    def value_block2(func: Callable[[Environment, PdValue, Block, Block], List[PdObject]]) -> 'Case':
+        return Case(3, [just_value, just_block, just_block], func)
+    @staticmethod
+    def list_value2(func: Callable[[Environment, Union[list, range, ListView, Hoard], PdValue, PdValue], List[PdObject]]) -> 'Case':
+        return Case(3, [just_list, just_value, just_value], func)
+    @staticmethod
     def seq3_singleton(func: Callable[[Environment, PdSeq, PdSeq, PdSeq], List[PdObject]]) -> 'Case':
         return Case(3, [seq_singleton, seq_singleton, seq_singleton], func)
     @staticmethod
     def any_any_number(func: Callable[[Environment, PdObject, PdObject, PdNum], List[PdObject]], commutative: bool = True) -> 'Case':
         return Case(3, [just_any, just_any, just_number], func, commutative=commutative)
     @staticmethod
-    def list_list_singleton_value(func: Callable[[Environment, Union[list, range, Hoard], Union[list, range, Hoard], PdValue], List[PdObject]]) -> 'Case':
+    def list_list_singleton_value(func: Callable[[Environment, Union[list, range, ListView, Hoard], Union[list, range, ListView, Hoard], PdValue], List[PdObject]]) -> 'Case':
         return Case(3, [just_list, list_singleton, just_value], func)
     @staticmethod
-    def list_list_block(func: Callable[[Environment, Union[list, range, Hoard], Union[list, range, Hoard], Block], List[PdObject]]) -> 'Case':
+    def list_list_block(func: Callable[[Environment, Union[list, range, ListView, Hoard], Union[list, range, ListView, Hoard], Block], List[PdObject]]) -> 'Case':
         return Case(3, [just_list, just_list, just_block], func)
     @staticmethod
+    def list_number_block(func: Callable[[Environment, Union[list, range, ListView, Hoard], PdNum, Block], List[PdObject]]) -> 'Case':
+        return Case(3, [just_list, just_number, just_block], func)
+    @staticmethod
     def seq2_range_block(func: Callable[[Environment, PdSeq, PdSeq, Block], List[PdObject]], commutative: bool = True) -> 'Case':
         return Case(3, [seq_range, seq_range, just_block], func, commutative=commutative)
     @staticmethod
@@ -326,7 +370,8 @@ class CasedBuiltIn(Block):
             aliases: Optional[List[str]] = None,
             docs: Optional[str] = None,
             stability: str = "unknown",
-            golf_aliases: Optional[List[str]] = None) -> None:
+            golf_aliases: Optional[List[str]] = None,
+            fold_op: Optional[FoldOp] = None) -> None:
 
         for c1, c2 in zip(cases, cases[1:]):
             assert c1.arity <= c2.arity
@@ -337,6 +382,7 @@ class CasedBuiltIn(Block):
         self.cases = cases
         self.docs = docs
         self.stability = stability
+        self.fold_op = fold_op
 
     def __call__(self, env: 'Environment') -> None:
         collected_args: List[PdObject] = []
@@ -351,7 +397,18 @@ class CasedBuiltIn(Block):
             if res is not None:
                 env.push(*res)
                 return
+        if any(isinstance(arg, LazySeq) for arg in collected_args):
+            raise lazy_unsupported('Built-in ' + self.name)
         raise NotImplementedError('No cases match for built-in ' + self.name + ' with args ' + repr(collected_args))
+    def direct_call(self, env: Environment, args: List[PdObject]) -> Optional[List[PdObject]]:
+        # Only if the case that would run takes exactly these arguments and
+        # is pure; a case of any other arity might pop something else.
+        for case in self.cases:
+            if case.arity != len(args): return None
+            processed_args = case.process(args)
+            if processed_args is not None:
+                return case.func(env, *processed_args) if case.pure else None
+        return None
     def code_repr(self) -> str:
         return self.name
     def __repr__(self) -> str:
@@ -1,6 +1,6 @@
 # coding: utf-8
 # vim:set ts=4 sw=4 et:
-from typing import Union, List, Tuple, overload
+from typing import Optional, Union, List, Tuple, overload
 import math
 # Discrete math: combinatorial and number-theoretic functions. Really just
 # lazy imports in case you want to grab paradoc and not install sympy; I
@@ -69,6 +69,86 @@ def jacobi_symbol(m: Union[int, float], n: Union[int, float]) -> int:
         raise Exception("Install sympy to use number-theoretic functions!")
     return rn.jacobi_symbol(cint(m), cint(n))
 
+# Exact integer kernels. These don't need sympy, and unlike going through
+# floats they stay exact (and don't overflow) on huge ints.
+
+def int_nth_root(n: int, k: int) -> int:
+    """The floor of the kth root of n, by Newton's method from an initial
+    guess above the root, so the iterates decrease monotonically. Negative n
+    is allowed for odd k, rounding towards zero."""
+    if k <= 0: raise ValueError('Root must be positive, not ' + str(k))
+    if n < 0:
+        if k % 2 == 0:
+            raise ValueError('Even root of negative number ' + str(n))
+        return -int_nth_root(-n, k)
+    if k == 1 or n < 2: return n
+    if k == 2: return math.isqrt(n)
+    # 2^ceil(bits/k) >= n^(1/k)
+    x = 1 << -(-n.bit_length() // k)
+    while True:
+        y = ((k - 1) * x + n // x ** (k - 1)) // k
+        if y >= x: return x
+        x = y
+
+def exact_nth_root(n: int, k: int) -> Optional[int]:
+    """The kth root of n if it's an integer, else None."""
+    if n < 0 and k % 2 == 0: return None
+    r = int_nth_root(n, k)
+    return r if r ** k == n else None
+
+def int_sqrt(n: Union[int, float, complex]) -> int:
+    if isinstance(n, int) and n >= 0: return math.isqrt(n)
+    return cint(n ** 0.5)
+
+def root(n: Union[int, float, complex], k: int) -> Union[int, float, complex]:
+    """The kth root of n, which is an int if n is a nonnegative int with an
+    integer kth root and a float (or complex) as usual otherwise. Negative
+    numbers always get the principal complex root, exact or not; use
+    int_nth_root for real odd roots."""
+    if isinstance(n, int) and n >= 0 and k > 0:
+        r = exact_nth_root(n, k)
+        if r is not None: return r
+        try:
+            return n ** (1/k)
+        except OverflowError:
+            # n is too large for a float, but its root might not be; the
+            # floor is off by less than 1 part in a float's precision.
+            return float(int_nth_root(n, k))
+    return n ** (1/k)
+
+def pow_mod(a: int, b: int, m: int) -> int:
+    """a to the bth power modulo m. A negative b takes powers of the modular
+    inverse of a."""
+    return pow(a, b, m)
+
+def inverse_mod(a: int, m: int) -> int:
+    try:
+        return pow(a, -1, m)
+    except ValueError:
+        raise ValueError('{} is not invertible modulo {}'.format(a, m))
+
+def chinese_remainder(residues: List[int], moduli: List[int]) -> Tuple[int, int]:
+    """The smallest nonnegative x and the modulus it's unique under (the lcm
+    of the moduli) such that x is congruent to each residue modulo the
+    corresponding modulus. Moduli needn't be coprime, but then the residues
+    must agree where they overlap."""
+    if len(residues) != len(moduli):
+        raise ValueError('Chinese remainder of {} residues but {} moduli'.format(
+            len(residues), len(moduli)))
+    x, m = 0, 1
+    for r, n in zip(residues, moduli):
+        n = abs(n)
+        if n == 0: raise ValueError('Chinese remainder modulo 0')
+        g = math.gcd(m, n)
+        if (r - x) % g:
+            raise ValueError('Inconsistent congruences: no solution')
+        # x + m * t = r (mod n), so t = (r - x) / g * (m / g)^-1 (mod n / g)
+        t = (r - x) // g * pow(m // g, -1, n // g) % (n // g)
+        x += m * t
+        m *= n // g
+        x %= m
+    return (x, m)
+
 @overload
 def factorial(n: int) -> int: ...
 @overload
@@ -81,9 +161,8 @@ def factorial(n: Union[int, float, complex]) -> Union[int, float, complex]:
         import sympy.functions.combinatorial.factorials as fs
     except ModuleNotFoundError:
         if isinstance(n, int):
-            p = 1
-            for i in range(1, n + 1): p *= i
-            return p
+            # the empty product for negative n, as when this was a loop
+            return math.factorial(n) if n >= 0 else 1
         elif isinstance(n, float):
             return math.gamma(n + 1)
         else:
@@ -319,7 +319,8 @@ You can also explicitly read input with `V`.
 Paradoc has flexible mutable data structures, which are called **hoards**
 mostly because `H` was the single unallocated letter when we got to the
 concept. Hoards start out as empty lists, but depending on how you use them,
-they will automagically become deques or dictionaries. The primary interface
+they will automagically become deques or dictionaries (or sets or counters,
+which are dictionaries with unit or integer values). The primary interface
 for mutation is through hoard trailers.
 """
 
@@ -1,6 +1,16 @@
 # vim:set ts=4 sw=4 et:
-from typing import IO, List, Optional, Tuple, Union
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple, Union
+import codecs
+import io
+import mmap
+import os
+import queue
+import re
+import stat
 import sys
+import threading
+import warnings
+from paradoc.base import str_to_int
 
 # I'm closing the file after finishing reading from it so that I can read all
 # from stdin exactly once, even if it's empty, while avoiding keeping track
@@ -12,103 +22,433 @@ import sys
 #
 # into a decorator, but there aren't optional arguments yet, so rip.
 
-def char(file: IO[str] = sys.stdin) -> Optional[str]:
-    try:
-        res = file.read(1)
-        if not res:
-            file.close()
+# Reading a character at a time is slow, so all reading goes through an
+# InputBuffer per file, which reads up to a line (or a big chunk of one) at a
+# time and scans it for words and lines with str.split and str.find; reading
+# everything left, for the all-lines and all-values triggers, is done at once.
+# Since it reads ahead, everything reading from a file has to go through its
+# buffer.
+
+WORD = re.compile(r'\s*\S+\s')
+
+class Prefetcher:
+    """Reads a file a line (or a big chunk of one) at a time on a background
+    thread, up to maxsize lines ahead of whoever's getting them, so a program
+    can compute while waiting for a slow pipe. Only the thread reads from the
+    file until it reaches the end, after which get returns '' forever.
+    """
+    def __init__(self, file: IO[str], chunk_size: int, maxsize: int) -> None:
+        self.queue: queue.Queue = queue.Queue(maxsize)
+        self.done = False
+        self.thread = threading.Thread(target=self.run,
+                args=(file, chunk_size), daemon=True)
+        self.thread.start()
+
+    def run(self, file: IO[str], chunk_size: int) -> None:
+        try:
+            while True:
+                chunk = file.readline(chunk_size)
+                self.queue.put(chunk)
+                if not chunk: return
+        except ValueError:
+            # someone else closed the file
+            self.queue.put('')
+        except BaseException as e:
+            # let whoever gets this chunk deal with it
+            self.queue.put(e)
+
+    def get(self) -> str:
+        if self.done: return ''
+        chunk = self.queue.get()
+        if isinstance(chunk, BaseException):
+            self.done = True
+            raise chunk
+        if not chunk: self.done = True
+        return chunk
+
+class InputBuffer:
+    """Characters read from a file but not consumed yet are buf[pos:].
+    Consumers see the same results as if they had read the file directly a
+    character or a line at a time: the read that finds the end of the file
+    returns None and closes the file, and reads after that find it closed.
+    """
+    def __init__(self, file: IO[str], chunk_size: int = 1 << 16) -> None:
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        # A file someone else closed (or that we closed with a previous
+        # buffer) is already at the end.
+        self.closed = file.closed
+        # words split off buf[pos:] but not taken yet, in reverse
+        self.words: List[str] = []
+        self.words_taken = 0
+        self.words_total = 0
+        self.words_end = 0
+        # whether anything's been read through the file yet
+        self.started = False
+        self.prefetcher: Optional[Prefetcher] = None
+
+    def prefetch(self, maxsize: int) -> None:
+        if self.prefetcher is None and not self.closed:
+            self.started = True
+            self.prefetcher = Prefetcher(self.file, self.chunk_size, maxsize)
+
+    def read_chunk(self) -> str:
+        if self.prefetcher is not None: return self.prefetcher.get()
+        # Reading up to a line at a time means we never wait for more input
+        # than the next line, which matters for interactive input or slow
+        # pipes, and respects the file's newline translation.
+        self.started = True
+        return self.file.readline(self.chunk_size)
+
+    def fill(self) -> bool:
+        """Read another chunk, dropping what's been consumed. Return False at
+        the end of the file."""
+        self.sync()
+        try:
+            chunk = self.read_chunk()
+        except ValueError:
+            # someone else closed the file
+            chunk = ''
+        if not chunk: return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def close(self) -> None:
+        global last_buffer
+        self.sync()
+        self.closed = True
+        self.buf = ''
+        self.pos = 0
+        self.file.close()
+        # Nothing more to remember about this file, since reading from it
+        # again would just find it closed.
+        if buffers.get(id(self.file)) is self: del buffers[id(self.file)]
+        if last_buffer is self: last_buffer = None
+
+    def char(self) -> Optional[str]:
+        if self.words_total: self.sync()
+        pos = self.pos
+        if pos >= len(self.buf):
+            if self.closed: return None
+            if not self.fill():
+                self.close()
+                return None
+            pos = 0
+        self.pos = pos + 1
+        return self.buf[pos]
+
+    def sync(self) -> None:
+        """Move pos past the words taken from the batch split off by
+        word_eof, throwing away the rest of the batch."""
+        if not self.words_total: return
+        if self.words_taken < self.words_total:
+            for _ in range(self.words_taken):
+                self.pos = WORD.match(self.buf, self.pos).end() # type: ignore
+        else:
+            self.pos = self.words_end
+        self.words = []
+        self.words_taken = self.words_total = 0
+
+    # bool is if eof was encountered *before* this read
+    def word_eof(self) -> Tuple[Optional[str], bool]:
+        if self.words:
+            self.words_taken += 1
+            return (self.words.pop(), False)
+        if self.closed: return (None, True)
+        self.sync()
+        # Split all the words we have that are followed by whitespace at once.
+        # Each word and exactly one whitespace character after it are
+        # consumed. A word not followed by any whitespace is dropped, since
+        # that's what reading a character at a time used to do. FIXME maybe
+        while True:
+            chunk = self.buf[self.pos:]
+            words = chunk.split()
+            if words and not chunk[-1].isspace():
+                # the last word might continue in the next chunk
+                chunk = chunk[:len(chunk) - len(words.pop())]
+            if words:
+                words.reverse()
+                self.words = words
+                self.words_taken = 1
+                self.words_total = len(words)
+                self.words_end = self.pos + len(chunk.rstrip()) + 1
+                return (words.pop(), False)
+            self.pos += len(chunk)
+            if not self.fill():
+                self.close()
+                return (None, False)
+
+    # bool is if eof was encountered *before* this read
+    def line_eof(self) -> Tuple[Optional[str], bool]:
+        if self.words_total: self.sync()
+        i = self.buf.find('\n', self.pos)
+        if i < 0:
+            if self.closed: return (None, True)
+            while i < 0:
+                scan = len(self.buf) - self.pos
+                if not self.fill():
+                    if self.pos < len(self.buf):
+                        # a last line without a newline
+                        res = self.buf[self.pos:]
+                        self.pos = len(self.buf)
+                        return (res, False)
+                    # empty string means EOF
+                    self.close()
+                    return (None, False)
+                i = self.buf.find('\n', scan)
+        res = self.buf[self.pos:i]
+        self.pos = i + 1
+        return (res, False)
+
+    def read_all(self) -> str:
+        """Read everything left in the file at once, memory-mapping it if
+        it's a regular file we haven't started reading."""
+        try:
+            if self.prefetcher is not None:
+                return ''.join(iter(self.prefetcher.get, ''))
+            if not self.started:
+                text = self.read_mapped()
+                if text is not None: return text
+            self.started = True
+            return self.file.read()
+        except ValueError:
+            # someone else closed the file
+            return ''
+
+    def read_mapped(self) -> Optional[str]:
+        if not isinstance(self.file, io.TextIOWrapper): return None
+        try:
+            raw = self.file.buffer
+            fd = raw.fileno()
+            start = raw.tell()
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode) or st.st_size <= start: return None
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                text = codecs.decode(mm[start:], self.file.encoding, self.file.errors or 'strict')
+        except (OSError, UnicodeDecodeError):
+            # let reading the file normally deal with it
             return None
+        # We can't tell if the file would have translated newlines, so leave
+        # those to it.
+        if '\r' in text: return None
+        self.file.seek(0, io.SEEK_END)
+        self.started = True
+        return text
+
+    def rest(self) -> Optional[str]:
+        if self.closed: return None
+        self.sync()
+        res = self.buf[self.pos:] + self.read_all()
+        self.close()
         return res
-    except ValueError: return None
+
+    def all_lines(self) -> Optional[List[str]]:
+        text = self.rest()
+        if text is None: return None
+        lines = text.split('\n')
+        # the empty string after the last newline, or the empty input
+        if not lines[-1]: lines.pop()
+        return lines
+
+    def all_values(self) -> Optional[List[Union[str, int, float]]]:
+        text = self.rest()
+        if text is None: return None
+        words = text.split()
+        # same FIXME as word_eof
+        if words and not text[-1].isspace(): words.pop()
+        return parse_values(words)
+
+buffers: Dict[int, InputBuffer] = dict()
+last_buffer: Optional[InputBuffer] = None
+
+def input_buffer(file: IO[str]) -> InputBuffer:
+    global last_buffer
+    if last_buffer is not None and last_buffer.file is file:
+        return last_buffer
+    # The buffer holds on to the file, so its id can't be reused while the
+    # buffer is still here.
+    b = buffers.get(id(file))
+    if b is None or b.file is not file:
+        b = buffers[id(file)] = InputBuffer(file)
+    last_buffer = b
+    return b
+
+def prefetch(file: IO[str] = sys.stdin, maxsize: int = 1 << 10) -> None:
+    """Start reading the file ahead on a background thread, keeping up to
+    maxsize lines that haven't been used yet."""
+    input_buffer(file).prefetch(maxsize)
+
+def char(file: IO[str] = sys.stdin) -> Optional[str]:
+    # This gets called a lot, so take the next character right here if we can.
+    b = last_buffer
+    if b is not None and b.file is file and not b.words_total:
+        pos = b.pos
+        if pos < len(b.buf):
+            b.pos = pos + 1
+            return b.buf[pos]
+    return input_buffer(file).char()
 
 # bool is if eof was encountered *before* this read
 def word_eof(file: IO[str] = sys.stdin) -> Tuple[Optional[str], bool]:
-    try:
-        c = file.read(1)
-        # Skip space
-        while c.isspace(): c = file.read(1)
-
-        res: List[str] = []
-
-        while not c.isspace():
-            res.append(c)
-            c = file.read(1)
-            # so this assumes the file ends with some whitespace I guess...
-            # seems questionable FIXME maybe
-            if not c:
-                file.close()
-                return (None, False)
-
-        return (''.join(res), False)
-    except ValueError: return (None, True)
+    b = last_buffer
+    if b is None or b.file is not file: b = input_buffer(file)
+    return b.word_eof()
 
 def word(file: IO[str] = sys.stdin) -> Optional[str]:
     return word_eof(file)[0]
 
-def value_eof(file: IO[str] = sys.stdin) -> Tuple[Optional[Union[str, int, float]], bool]:
-    w, eof = word_eof(file)
-    if w is None: return w, eof
+def parse_value(w: str) -> Union[str, int, float]:
     try:
-        return int(w), eof
+        return str_to_int(w)
     except ValueError:
         try:
-            return float(w), eof
+            return float(w)
         except ValueError:
-            return w, eof
+            return w
+
+# below this many words it's not worth importing numpy
+NUMPY_THRESHOLD = 1 << 12
+
+def parse_values(ws: List[str]) -> List[Union[str, int, float]]:
+    """parse_value on each word, but converting them all at once if they're
+    all ints."""
+    if len(ws) >= NUMPY_THRESHOLD:
+        try:
+            # lazy import in case you don't have numpy
+            import numpy
+            with warnings.catch_warnings():
+                # numpy only warns if it stops early at something it can't
+                # parse
+                warnings.simplefilter('error')
+                array = numpy.fromstring(' '.join(ws), dtype=numpy.int64, sep=' ')
+            info = numpy.iinfo(numpy.int64)
+            # If numpy got a different count, it parsed some words together
+            # (e.g. a lone '-' followed by a number); if it got the largest
+            # or smallest int64, something might have overflowed.
+            if (len(array) == len(ws) and
+                    info.min < array.min() and array.max() < info.max):
+                return array.tolist()
+        except (ImportError, ValueError, DeprecationWarning):
+            pass
+    try:
+        return list(map(int, ws))
+    except ValueError:
+        return [parse_value(w) for w in ws]
+
+def value_eof(file: IO[str] = sys.stdin) -> Tuple[Optional[Union[str, int, float]], bool]:
+    w, eof = word_eof(file)
+    if w is None: return w, eof
+    return parse_value(w), eof
 
 def value(file: IO[str] = sys.stdin) -> Optional[Union[str, int, float]]:
     return value_eof(file)[0]
 
 # bool is if eof was encountered *before* this read
 def line_eof(file: IO[str] = sys.stdin) -> Tuple[Optional[str], bool]:
-    try:
-        ret = file.readline()
-        if ret:
-            # TODO: does this work on Windows?
-            assert ret[-1] == '\n'
-            return (ret[:-1], False)
-        else:
-            # empty string means EOF
-            file.close()
-            return (None, False)
-    except ValueError: return (None, True)
+    b = last_buffer
+    if b is None or b.file is not file: b = input_buffer(file)
+    return b.line_eof()
 
 def line(file: IO[str] = sys.stdin) -> Optional[str]:
     return line_eof(file)[0]
 
 def all_lines(file: IO[str] = sys.stdin) -> Optional[List[str]]:
-    ret: List[str] = []
-    while True:
-        nextline, eof = line_eof(file)
-        if eof: return None
-        if nextline is None: return ret
-        ret.append(nextline)
+    return input_buffer(file).all_lines()
 
 def all_values(file: IO[str] = sys.stdin) -> Optional[List[Union[str, int, float]]]:
-    ret: List[Union[str, int, float]] = []
-    while True:
-        nextvalue, eof = value_eof(file)
-        if eof: return None
-        if nextvalue is None: return ret
-        ret.append(nextvalue)
-    return ret
+    return input_buffer(file).all_values()
 
 def record(file: IO[str] = sys.stdin) -> Optional[Union[str, int, float]]:
     w = line(file)
     if w is None: return w
-    try:
-        return int(w)
-    except ValueError:
-        try:
-            return float(w)
-        except ValueError:
-            return w
+    return parse_value(w)
 
 def all(file: IO[str] = sys.stdin) -> Optional[str]:
-    try:
-        ret = file.read()
-        file.close()
+    return input_buffer(file).rest()
+
+class IteratorFile(io.TextIOBase):
+    """A read-only text file whose lines are the strings from an iterator,
+    each given a newline."""
+    def __init__(self, records: Iterator[Any]) -> None:
+        self.records = records
+        self.pending = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def readline(self, size: Optional[int] = -1) -> str: # type: ignore # _IOBase.readline is bytes
+        if self.closed: raise ValueError('I/O operation on closed file.')
+        if not self.pending:
+            for record in self.records:
+                self.pending = str(record) + '\n'
+                break
+        if size is None or size < 0 or size >= len(self.pending):
+            ret, self.pending = self.pending, ''
+        else:
+            ret, self.pending = self.pending[:size], self.pending[size:]
         return ret
-    except ValueError: return None
+
+    def read(self, size: Optional[int] = -1) -> str:
+        if size is not None and size >= 0:
+            return self.readline(size)
+        return ''.join(iter(self.readline, ''))
+
+class InputSource:
+    """What an Environment's input triggers read from: a file, a string, a
+    list of lines, or an iterator of records, one per line. By default, it's
+    whatever sys.stdin is when reading, through the same buffer as the
+    module-level functions."""
+    def __init__(self, source: Union[None, str, IO[str], Iterable[Any]] = None) -> None:
+        self.own_buffer: Optional[InputBuffer] = None
+        if source is None:
+            return
+        file: Any
+        if isinstance(source, str):
+            file = io.StringIO(source)
+        elif isinstance(source, list):
+            file = io.StringIO(''.join(str(line) + '\n' for line in source))
+        elif isinstance(source, io.IOBase):
+            file = source
+        else:
+            file = IteratorFile(iter(source))
+        self.own_buffer = InputBuffer(file)
+
+    def buffer(self) -> InputBuffer:
+        if self.own_buffer is None: return input_buffer(sys.stdin)
+        return self.own_buffer
+
+    def prefetch(self, maxsize: int = 1 << 10) -> None:
+        self.buffer().prefetch(maxsize)
+
+    def char(self) -> Optional[str]:
+        return self.buffer().char()
+
+    def word(self) -> Optional[str]:
+        return self.buffer().word_eof()[0]
+
+    def value(self) -> Optional[Union[str, int, float]]:
+        w = self.word()
+        if w is None: return w
+        return parse_value(w)
+
+    def line(self) -> Optional[str]:
+        return self.buffer().line_eof()[0]
+
+    def record(self) -> Optional[Union[str, int, float]]:
+        w = self.line()
+        if w is None: return w
+        return parse_value(w)
+
+    def all(self) -> Optional[str]:
+        return self.buffer().rest()
+
+    def all_lines(self) -> Optional[List[str]]:
+        return self.buffer().all_lines()
+
+    def all_values(self) -> Optional[List[Union[str, int, float]]]:
+        return self.buffer().all_values()
 
 # vim:set tabstop=4 shiftwidth=4 expandtab fdm=marker:
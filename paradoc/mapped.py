@@ -0,0 +1,161 @@
+# coding: utf-8
+# vim:set ts=4 sw=4 et:
+# File-backed storage for hoards, for data you'd rather not hold in Python
+# lists: an append-only log of records, one per line, and a fixed-length
+# array of 64-bit ints accessed through mmap. Only the unsandboxed builtins
+# hand these out.
+from typing import Iterator, List, Optional, Union, overload
+import array
+import mmap
+import os
+from paradoc.num import Char
+from paradoc.input_triggers import parse_value
+
+Record = Union[str, int, float]
+
+class RecordLog:
+    """A text file read as a list of records, one per line, parsed like the
+    record input trigger. Records can only be appended; reads seek to the
+    record's offset, so only the offsets are kept in memory."""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.file = open(filename, 'a+b')
+        self.offsets = array.array('q')
+        self.file.seek(0)
+        self.end = 0
+        last = b'\n'
+        for line in self.file:
+            self.offsets.append(self.end)
+            self.end += len(line)
+            last = line
+        # A final line without its newline still counts as a record, but the
+        # next append has to terminate it first.
+        self.unterminated = not last.endswith(b'\n')
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def record(self, i: int) -> Record:
+        if self.dirty:
+            self.flush()
+        self.file.seek(self.offsets[i])
+        line = self.file.readline().decode('utf-8')
+        if line.endswith('\n'):
+            line = line[:-1]
+        return parse_value(line)
+
+    @overload
+    def __getitem__(self, index: int) -> Record: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[Record]: ...
+    def __getitem__(self, index: Union[int, slice]) -> Union[Record, List[Record]]:
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self)))]
+        return self.record(index)
+
+    def __iter__(self) -> Iterator[Record]:
+        # Not a plain sequential read, since appends can happen while we're
+        # iterating and move the file position.
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def __reversed__(self) -> Iterator[Record]:
+        for i in range(len(self) - 1, -1, -1):
+            yield self.record(i)
+
+    def append(self, value: object) -> None:
+        if isinstance(value, Char):
+            value = value.chr
+        if not isinstance(value, (str, int, float)):
+            raise TypeError("Can only log numbers and strings, not " + repr(value))
+        s = str(value)
+        if '\n' in s:
+            raise ValueError("Cannot log record containing a newline")
+        data = s.encode('utf-8') + b'\n'
+        if self.unterminated:
+            self.file.write(b'\n')
+            self.end += 1
+            self.unterminated = False
+        self.file.write(data)
+        self.offsets.append(self.end)
+        self.end += len(data)
+        self.dirty = True
+
+    def flush(self) -> None:
+        self.file.flush()
+        self.dirty = False
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __repr__(self) -> str:
+        return "RecordLog({!r})".format(self.filename)
+
+class MappedArray:
+    """A fixed-length array of signed 64-bit ints, native byte order, stored
+    in a file and accessed through mmap."""
+
+    CHUNK = 65536
+
+    def __init__(self, filename: str, length: Optional[int] = None) -> None:
+        self.filename = filename
+        self.fd = os.open(filename, os.O_RDWR | os.O_CREAT)
+        if length is not None:
+            if length < 0:
+                raise ValueError("Mapped array length must be nonnegative")
+            os.ftruncate(self.fd, 8 * length)
+        size = os.fstat(self.fd).st_size
+        if size % 8:
+            os.close(self.fd)
+            raise ValueError("File size is not a multiple of 8 bytes: " + filename)
+        # You can't mmap an empty file.
+        self.map: Optional[mmap.mmap] = mmap.mmap(self.fd, size) if size else None
+        self.view: Union[memoryview, List[int]] = (
+                memoryview(self.map).cast('q') if self.map is not None else [])
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    @overload
+    def __getitem__(self, index: int) -> int: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[int]: ...
+    def __getitem__(self, index: Union[int, slice]) -> Union[int, List[int]]:
+        if isinstance(index, slice):
+            return list(self.view[index])
+        return self.view[index]
+
+    def __setitem__(self, index: int, value: object) -> None:
+        if isinstance(value, Char):
+            value = value.ord
+        if not isinstance(value, int):
+            raise TypeError("Can only store ints in mapped array, not " + repr(value))
+        self.view[index] = value
+
+    def __iter__(self) -> Iterator[int]:
+        for start in range(0, len(self), MappedArray.CHUNK):
+            yield from self.view[start:start + MappedArray.CHUNK]
+
+    def __reversed__(self) -> Iterator[int]:
+        for end in range(len(self), 0, -MappedArray.CHUNK):
+            yield from reversed(self.view[max(0, end - MappedArray.CHUNK):end])
+
+    def flush(self) -> None:
+        if self.map is not None:
+            self.map.flush()
+
+    def close(self) -> None:
+        if isinstance(self.view, memoryview):
+            self.view.release()
+        self.view = []
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        os.close(self.fd)
+
+    def __repr__(self) -> str:
+        return "MappedArray({!r})".format(self.filename)
+
+# vim:set tabstop=4 shiftwidth=4 expandtab fdm=marker:
@@ -1,17 +1,27 @@
 # coding: utf-8
 import typing
 from typing import (
-        Any, Callable, Dict, Deque, Generator, Match, Iterable, Iterator, List,
-        Optional, Set, Tuple, TypeVar, Union, overload,
+        Any, Callable, Dict, Deque, Generator, Hashable, Match, Iterable, Iterator, List,
+        Optional, Pattern, Sequence, Set, Tuple, TypeVar, Union, overload,
         )
 import sys
 import math, cmath
+import re
 from paradoc.num import Char, Num, PdNum
 import paradoc.num as num
+from paradoc.mapped import RecordLog, MappedArray
+from paradoc.search import kmp_find_all, aho_corasick, AhoCorasick
+from paradoc.pvector import PersistentVector
+from paradoc.input_triggers import InputSource
+from paradoc.base import int_str, str_to_int
 import collections
+import bisect
+import heapq
 import random
 import itertools
 import copy
+import functools
+import time
 
 T = TypeVar('T')
 
@@ -20,10 +30,37 @@ T = TypeVar('T')
 # Block, BuiltIn {{{
 # Probably un-Pythonic superclass to allow isinstance and mypy tests:
 class Block:
+    # Set on blocks known to take two numbers and leave exactly one, computed
+    # by a plain Python function; folds and scans use it to skip running the
+    # block on every pair.
+    fold_op: Optional['FoldOp'] = None
+
     def __call__(self, env: 'Environment') -> None:
         raise NotImplementedError
     def code_repr(self) -> str:
         raise NotImplementedError
+    def direct_call(self, env: 'Environment', args: List['PdObject']) -> Optional[List['PdObject']]:
+        """If this block is known to consume exactly these arguments and do
+        nothing else but leave some results, compute those results without
+        setting up a stack. Otherwise, return None, having done nothing."""
+        return None
+
+class FoldOp:
+    """How a block combines two numbers: func, on any two PdNums. The
+    optional rest are faster equivalents when every element is an int
+    (int_func on two, int_fold on a whole nonempty list), and how the block
+    combines two strings and folds a list of them, if it does."""
+    def __init__(self,
+            func: Callable[[Any, Any], Any],
+            int_func: Optional[Callable[[int, int], int]] = None,
+            int_fold: Optional[Callable[[Any], int]] = None,
+            str_func: Optional[Callable[[str, str], str]] = None,
+            str_fold: Optional[Callable[[Any], str]] = None) -> None:
+        self.func = func
+        self.int_func = int_func or func
+        self.int_fold = int_fold
+        self.str_func = str_func
+        self.str_fold = str_fold
 
 class BuiltIn(Block):
     def __init__(self,
@@ -32,13 +69,15 @@ class BuiltIn(Block):
             aliases: Optional[List[str]] = None,
             docs: Optional[str] = None,
             stability: str = "unknown",
-            golf_aliases: Optional[List[str]] = None) -> None:
+            golf_aliases: Optional[List[str]] = None,
+            fold_op: Optional[FoldOp] = None) -> None:
         self.name = name
         self.aliases: List[str] = aliases or [name]
         self.golf_aliases: List[str] = golf_aliases or []
         self.func = func
         self.docs = docs
         self.stability = stability
+        self.fold_op = fold_op
 
     def __call__(self, env: 'Environment') -> None:
         self.func(env)
@@ -49,25 +88,322 @@ class BuiltIn(Block):
     def __repr__(self) -> str:
         return '<BuiltIn {}>'.format(self.name)
 # }}}
+# ListView, a list slice that doesn't copy {{{
+class ListView:
+    """A read-only view of some of the elements of a list, which the runtime
+    treats just like a list. Slicing a view gives another view of the same
+    list, so repeatedly taking tails, windows or slices doesn't copy elements.
+    Anything that needs to mutate one copies it into a list first.
+
+    The base can also be a PersistentVector, which is how arrays that are
+    updated a few elements at a time (see pd_assoc) share structure, or a
+    NumericArray wrapping a NumPy array."""
+    __slots__ = ('base', 'indices')
+
+    def __init__(self, base: Union[list, PersistentVector, "NumericArray", "Grid"], indices: range) -> None:
+        self.base = base
+        self.indices = indices
+
+    @staticmethod
+    def of(seq: Union[list, 'ListView'], key: slice) -> 'ListView':
+        if isinstance(seq, ListView):
+            return ListView(seq.base, seq.indices[key])
+        else:
+            return ListView(seq, range(len(seq))[key])
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @overload
+    def __getitem__(self, key: int) -> "PdObject": ...
+    @overload
+    def __getitem__(self, key: slice) -> 'ListView': ...
+    def __getitem__(self, key: Union[int, slice]) -> Union["PdObject", 'ListView']:
+        if isinstance(key, slice):
+            return ListView(self.base, self.indices[key])
+        return self.base[self.indices[key]]
+
+    def __iter__(self) -> Iterator["PdObject"]:
+        if not isinstance(self.base, list) and self.indices.step == 1:
+            return self.base.iter_slice(self.indices.start, self.indices.stop)
+        return map(self.base.__getitem__, self.indices)
+
+    def __reversed__(self) -> Iterator["PdObject"]:
+        return map(self.base.__getitem__, reversed(self.indices))
+
+    def __contains__(self, obj: Any) -> bool:
+        return any(e == obj for e in self)
+
+    def index(self, obj: Any) -> int:
+        for i, e in enumerate(self):
+            if e == obj: return i
+        raise ValueError('element not in list')
+
+    def count(self, obj: Any) -> int:
+        return sum(1 for e in self if e == obj)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, ListView)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other: Any) -> bool:
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None # type: ignore
+
+    def __add__(self, other: Any) -> list:
+        if isinstance(other, (list, ListView)):
+            return list(self) + list(other)
+        return NotImplemented
+
+    def __radd__(self, other: Any) -> list:
+        if isinstance(other, (list, ListView)):
+            return list(other) + list(self)
+        return NotImplemented
+
+    def __mul__(self, n: int) -> list:
+        return list(self) * n
+
+    def __repr__(self) -> str:
+        # It should look like a list in stack dumps.
+        return repr(list(self))
+# }}}
+# LazySeq, a possibly infinite sequence {{{
+class LazySeq:
+    """A sequence whose elements are computed from an iterator, which may
+    never end, only as they're needed. Elements are remembered once computed,
+    so consuming or indexing it again doesn't redo any work. Printing or
+    forcing it computes everything, so shouldn't be done to an infinite
+    one."""
+    __slots__ = ('source', 'cache')
+
+    def __init__(self, source: Iterable[Any]) -> None:
+        self.source: Optional[Iterator[Any]] = iter(source)
+        self.cache: List[Any] = []
+
+    def fill(self, n: int) -> bool:
+        """Compute the first n elements if there are that many; return
+        whether there are."""
+        cache = self.cache
+        while len(cache) < n:
+            if self.source is None: return False
+            try:
+                cache.append(next(self.source))
+            except StopIteration:
+                self.source = None
+                return False
+        return True
+
+    def force(self) -> List[Any]:
+        if self.source is not None:
+            self.cache.extend(self.source)
+            self.source = None
+        return self.cache
+
+    def take(self, n: int) -> List[Any]:
+        self.fill(n)
+        return self.cache[:n]
+
+    def __getitem__(self, i: int) -> Any:
+        if i < 0:
+            return self.force()[i]
+        if not self.fill(i + 1):
+            raise IndexError('lazy sequence index out of range')
+        return self.cache[i]
+
+    def __iter__(self) -> Iterator[Any]:
+        i = 0
+        while self.fill(i + 1):
+            yield self.cache[i]
+            i += 1
+
+    def __bool__(self) -> bool:
+        return self.fill(1)
+
+    def __repr__(self) -> str:
+        # Don't compute anything just to show it in a stack dump.
+        return 'LazySeq({}{})'.format(
+                repr(self.cache)[:-1],
+                '' if self.source is None else ', ...]' if self.cache else '...]')
+
+def lazy_unsupported(what: str) -> TypeError:
+    """The error for something that got a lazy sequence but can only work
+    on one that has been computed in full."""
+    return TypeError(what + " doesn't work on lazy sequences; use Force to make one a list first")
+# }}}
 # Hoard, general mutable data structure {{{
-HoardStructure = Union[List["PdObject"], Deque["PdObject"], Dict["PdKey", Tuple["PdObject", "PdObject"]]]
+# A hoard whose keys are all ints keeps them in an IntKeyedStructure instead
+# of a general dict, so that updating far past the end of a list or deleting
+# from one stays cheap and doesn't have to key everything through pykey.
+_HOLE: Any = object()
+
+class IntKeyedStructure:
+    """Int-keyed storage: a dense list for small nonnegative keys, where
+    missing keys are holes, and a sparse dict for negative keys and keys far
+    past the end of the dense list. Every nonnegative key in the sparse dict
+    is at least the length of the dense list."""
+
+    def __init__(self, dense: Optional[List["PdObject"]] = None) -> None:
+        self.dense: List[Any] = [] if dense is None else dense
+        self.dense_count = len(self.dense)
+        self.sparse: Dict[int, "PdObject"] = dict()
+
+    @staticmethod
+    def int_key(key: Any) -> Optional[int]:
+        if isinstance(key, int):
+            return key
+        elif isinstance(key, float) and key.is_integer():
+            return int(key)
+        else:
+            return None
+
+    def __len__(self) -> int:
+        return self.dense_count + len(self.sparse)
+
+    def __contains__(self, key0: Any) -> bool:
+        key = IntKeyedStructure.int_key(key0)
+        if key is None:
+            return False
+        elif 0 <= key < len(self.dense):
+            return self.dense[key] is not _HOLE
+        else:
+            return key in self.sparse
+
+    def get(self, key0: Any, default: "PdObject") -> "PdObject":
+        key = IntKeyedStructure.int_key(key0)
+        if key is None:
+            return default
+        elif 0 <= key < len(self.dense):
+            v = self.dense[key]
+            return default if v is _HOLE else v
+        else:
+            return self.sparse.get(key, default)
+
+    def __getitem__(self, key: Any) -> "PdObject":
+        v = self.get(key, _HOLE)
+        if v is _HOLE:
+            raise KeyError(key)
+        return v
+
+    def __setitem__(self, key: int, value: "PdObject") -> None:
+        dense = self.dense
+        n = len(dense)
+        if 0 <= key < n:
+            if dense[key] is _HOLE:
+                self.dense_count += 1
+            dense[key] = value
+        elif n <= key <= 2 * n + 8:
+            # Grow the dense list, pulling in any sparse keys it now covers.
+            sparse = self.sparse
+            if sparse:
+                for i in range(n, key):
+                    v = sparse.pop(i, _HOLE)
+                    if v is not _HOLE:
+                        self.dense_count += 1
+                    dense.append(v)
+                sparse.pop(key, None)
+            else:
+                dense.extend(itertools.repeat(_HOLE, key - n))
+            dense.append(value)
+            self.dense_count += 1
+        else:
+            self.sparse[key] = value
+
+    def __delitem__(self, key0: Any) -> None:
+        key = IntKeyedStructure.int_key(key0)
+        if key is None:
+            raise KeyError(key0)
+        dense = self.dense
+        if 0 <= key < len(dense):
+            if dense[key] is _HOLE:
+                raise KeyError(key0)
+            dense[key] = _HOLE
+            self.dense_count -= 1
+            while dense and dense[-1] is _HOLE:
+                dense.pop()
+        else:
+            del self.sparse[key]
+
+    def items(self) -> Iterator[Tuple[int, "PdObject"]]:
+        sparse_keys = sorted(self.sparse)
+        split = bisect.bisect_left(sparse_keys, 0)
+        for k in sparse_keys[:split]:
+            yield (k, self.sparse[k])
+        for k, v in enumerate(self.dense):
+            if v is not _HOLE:
+                yield (k, v)
+        for k in sparse_keys[split:]:
+            yield (k, self.sparse[k])
+
+    def reversed_items(self) -> Iterator[Tuple[int, "PdObject"]]:
+        sparse_keys = sorted(self.sparse)
+        split = bisect.bisect_left(sparse_keys, 0)
+        for k in reversed(sparse_keys[split:]):
+            yield (k, self.sparse[k])
+        for k in range(len(self.dense) - 1, -1, -1):
+            v = self.dense[k]
+            if v is not _HOLE:
+                yield (k, v)
+        for k in reversed(sparse_keys[:split]):
+            yield (k, self.sparse[k])
+
+    def keys(self) -> Iterator[int]:
+        return (k for k, _ in self.items())
+
+    def values(self) -> Iterator["PdObject"]:
+        return (v for _, v in self.items())
+
+    def __copy__(self) -> "IntKeyedStructure":
+        ret = IntKeyedStructure(list(self.dense))
+        ret.dense_count = self.dense_count
+        ret.sparse = dict(self.sparse)
+        return ret
+
+    def __repr__(self) -> str:
+        return "IntKeyedStructure({})".format(dict(self.items()))
+
+# A hoard used as a set or a multiset (through updateone, modify, or the set
+# trailers) keeps just the pykeys: a set of them, whose values are all 1, or
+# a Counter mapping them to ints. The original keys can be rebuilt with
+# unpykey.
+HoardStructure = Union[
+        List["PdObject"],
+        Deque["PdObject"],
+        IntKeyedStructure,
+        Set["PdKey"],
+        typing.Counter["PdKey"],
+        Dict["PdKey", Tuple["PdValue", "PdObject"]],
+        RecordLog,
+        MappedArray]
+# Structures indexed like lists, by ints from 0 up to their length.
+SequenceStructures = (list, collections.deque, RecordLog, MappedArray)
 class Hoard:
     def __init__(self, init: Optional[HoardStructure] = None) -> None:
         self.structure: HoardStructure = [] if init is None else init
 
     @classmethod
-    def dictionary(cls, init: Iterable[Tuple["PdValue", "PdObject"]]) -> "Hoard":
+    def dictionary(cls, init: Iterable[Tuple["PdObject", "PdObject"]]) -> "Hoard":
         ret = cls(dict())
-        for k, v in init: ret.update(k, v)
+        for k, v in init: ret.update_object(k, v)
         return ret
 
+    @classmethod
+    def set_of(cls, init: Iterable["PdObject"]) -> "Hoard":
+        return cls(set(pykey(k) for k in init))
+
+    @classmethod
+    def counter_of(cls, init: Iterable["PdObject"]) -> "Hoard":
+        return cls(collections.Counter(pykey(k) for k in init))
+
     @classmethod
     def dictionary_from_general_iterable(cls, init: Iterable["PdObject"]) -> "Hoard":
         # Try really hard to make this iterable a dictionary. Probably too
         # hard.
         ret = cls(dict())
         for v in init:
-            if isinstance(v, (str, list, range, Hoard)):
+            if isinstance(v, (str, list, range, ListView, Hoard)):
                 if len(v) >= 2:
                     ret.update_object(pd_index(v, 0), pd_index(v, 1))
                 elif len(v) == 1:
@@ -78,11 +414,19 @@ class Hoard:
                 ret.update_object(v, 1)
         return ret
 
+    def structure_kind(self) -> str:
+        if isinstance(self.structure, RecordLog):
+            return "record log"
+        elif isinstance(self.structure, MappedArray):
+            return "mapped array"
+        else:
+            return "dictionary"
+
     def append(self, obj: "PdObject") -> None:
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, (list, collections.deque, RecordLog)):
             self.structure.append(obj)
         else:
-            raise TypeError("Hoard is dictionary; appending is not allowed")
+            raise TypeError("Hoard is {}; appending is not allowed".format(self.structure_kind()))
 
     def appendleft(self, obj: "PdObject") -> None:
         if isinstance(self.structure, (list, collections.deque)):
@@ -90,19 +434,21 @@ class Hoard:
                 self.structure = collections.deque(self.structure)
             self.structure.appendleft(obj)
         else:
-            raise TypeError("Hoard is dictionary; appending is not allowed")
+            raise TypeError("Hoard is {}; appending is not allowed".format(self.structure_kind()))
 
     def extend(self, obj: "PdObject") -> None:
         if isinstance(self.structure, (list, collections.deque)):
             self.structure.extend(pd_to_list_range(obj))
+        elif isinstance(self.structure, RecordLog):
+            for e in pd_to_list_range(obj): self.structure.append(e)
         else:
-            raise TypeError("Hoard is dictionary; extending is not allowed")
+            raise TypeError("Hoard is {}; extending is not allowed".format(self.structure_kind()))
 
     def pop(self) -> "PdObject":
         if isinstance(self.structure, (list, collections.deque)):
             return self.structure.pop()
         else:
-            raise TypeError("Hoard is dictionary; popping is not allowed")
+            raise TypeError("Hoard is {}; popping is not allowed".format(self.structure_kind()))
 
     def popleft(self) -> "PdObject":
         if isinstance(self.structure, (list, collections.deque)):
@@ -110,36 +456,50 @@ class Hoard:
                 self.structure = collections.deque(self.structure)
             return self.structure.popleft()
         else:
-            raise TypeError("Hoard is dictionary; popping is not allowed")
+            raise TypeError("Hoard is {}; popping is not allowed".format(self.structure_kind()))
 
     def index(self, key0: "PdValue") -> "PdObject":
         key = pykey(key0)
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             if isinstance(key, int):
                 return self.structure[key]
             else:
                 raise TypeError("Hoard is list/deque, must index by int")
+        elif isinstance(self.structure, IntKeyedStructure):
+            return self.structure[key]
+        elif isinstance(self.structure, set):
+            if key in self.structure: return 1
+            raise KeyError(key0)
+        elif isinstance(self.structure, collections.Counter):
+            if key in self.structure: return self.structure[key]
+            raise KeyError(key0)
         else:
             return self.structure[key][1]
 
-    def get(self, key0: "PdValue", default: "PdObject") -> "PdObject":
+    def get(self, key0: "PdObject", default: "PdObject") -> "PdObject":
         key = pykey(key0)
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             if isinstance(key, int) and 0 <= key < len(self.structure):
                 return self.structure[key]
             return default
+        elif isinstance(self.structure, IntKeyedStructure):
+            return self.structure.get(key, default)
+        elif isinstance(self.structure, set):
+            return 1 if key in self.structure else default
+        elif isinstance(self.structure, collections.Counter):
+            return self.structure.get(key, default)
         else:
             return self.structure.get(key, (None, default))[1]
 
     def haskey(self, key0: "PdValue") -> bool:
         key = pykey(key0)
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             return isinstance(key, int) and 0 <= key < len(self.structure)
         else:
             return key in self.structure
 
     def slice(self, left: Optional["PdKey"], right: Optional["PdKey"]) -> list:
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             if (
                     (left is None or isinstance(left, (Char, int, float))) and
                     (right is None or isinstance(right, (Char, int, float)))):
@@ -150,22 +510,32 @@ class Hoard:
                 return ls[num.intify_opt(left):num.intify_opt(right)]
             else:
                 raise TypeError("Hoard is list/deque, must slice by numbers")
+        elif isinstance(self.structure, IntKeyedStructure):
+            return [self.structure[k] for k in pykey_slice(self.structure.keys(), left, right)]
+        elif isinstance(self.structure, (set, collections.Counter)):
+            return [self.structure_value(k) for k in pykey_slice(self.structure, left, right)]
         else:
-            items = [(k, vp) for k, vp in self.structure.items()
-                    if (left is None or pykey_lte(left, k)) and (right is None or pykey_lt(k, right))]
-            return [v for _, (_, v) in sorted(items, key=lambda pair: pair[0])]
+            return [self.structure[k][1] for k in pykey_slice(self.structure, left, right)]
 
     def first(self) -> "PdObject":
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             return self.structure[0]
+        elif isinstance(self.structure, IntKeyedStructure):
+            return next(self.structure.values())
+        elif isinstance(self.structure, (set, collections.Counter)):
+            return self.structure_value(pykey_extremum(self.structure, False))
         else:
-            return min(self.structure.items(), key=lambda pair: pair[0])[1][1]
+            return self.structure[pykey_extremum(self.structure, False)][1]
 
     def last(self) -> "PdObject":
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             return self.structure[-1]
+        elif isinstance(self.structure, IntKeyedStructure):
+            return next(self.structure.reversed_items())[1]
+        elif isinstance(self.structure, (set, collections.Counter)):
+            return self.structure_value(pykey_extremum(self.structure, True))
         else:
-            return max(self.structure.items(), key=lambda pair: pair[0])[1][1]
+            return self.structure[pykey_extremum(self.structure, True)][1]
 
     def butfirst(self) -> List["PdObject"]:
         return self.to_list()[1:]
@@ -173,34 +543,50 @@ class Hoard:
     def butlast(self) -> List["PdObject"]:
         return self.to_list()[:-1]
 
-    def key_list(self) -> Union[range, List["PdObject"]]:
-        if isinstance(self.structure, (list, collections.deque)):
+    def key_list(self) -> Union[range, List["PdValue"]]:
+        if isinstance(self.structure, SequenceStructures):
             return range(len(self.structure))
+        elif isinstance(self.structure, IntKeyedStructure):
+            return list(self.structure.keys())
+        elif isinstance(self.structure, (set, collections.Counter)):
+            return [unpykey(k) for k in pykey_sorted(self.structure)]
         else:
-            return [k for _, (k, _) in sorted(self.structure.items(),
-                key=lambda pair: pair[0])]
+            return [self.structure[k][0] for k in pykey_sorted(self.structure)]
 
     def to_iterable(self) -> Iterable["PdObject"]:
         # Making this an explicit function for more conservative type safety
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             return self.structure
+        elif isinstance(self.structure, IntKeyedStructure):
+            return self.structure.values()
+        elif isinstance(self.structure, set):
+            return itertools.repeat(1, len(self.structure))
+        elif isinstance(self.structure, collections.Counter):
+            return (self.structure[k] for k in pykey_sorted(self.structure))
         else:
-            return (v for _, (_, v) in sorted(self.structure.items(),
-                key=lambda pair: pair[0]))
+            return (self.structure[k][1] for k in pykey_sorted(self.structure))
 
     def to_reversed_iterable(self) -> Iterable["PdObject"]:
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             return reversed(self.structure)
+        elif isinstance(self.structure, IntKeyedStructure):
+            return (v for _, v in self.structure.reversed_items())
+        elif isinstance(self.structure, set):
+            return itertools.repeat(1, len(self.structure))
+        elif isinstance(self.structure, collections.Counter):
+            return (self.structure[k] for k in pykey_sorted(self.structure, reverse=True))
         else:
-            return (v for _, (_, v) in reversed(sorted(self.structure.items(),
-                key=lambda pair: pair[0])))
+            return (self.structure[k][1] for k in pykey_sorted(self.structure, reverse=True))
 
     def to_list(self) -> List["PdObject"]:
-        if isinstance(self.structure, (list, collections.deque)):
+        if isinstance(self.structure, SequenceStructures):
             return list(self.structure)
+        elif isinstance(self.structure, IntKeyedStructure):
+            return list(self.structure.values())
+        elif isinstance(self.structure, (set, collections.Counter)):
+            return list(self.to_iterable())
         else:
-            return [v for _, (_, v) in sorted(self.structure.items(),
-                key=lambda pair: pair[0])]
+            return [self.structure[k][1] for k in pykey_sorted(self.structure)]
 
     def __repr__(self) -> str:
         return "Hoard({})".format(repr(self.structure))
@@ -209,49 +595,144 @@ class Hoard:
         return len(self.structure)
 
     def update(self, key: "PdValue", value: "PdObject") -> None:
+        if isinstance(self.structure, MappedArray):
+            if not isinstance(key, int):
+                raise TypeError("Hoard is mapped array, must update by int")
+            self.structure[key] = value
+            return
+        elif isinstance(self.structure, RecordLog):
+            raise TypeError("Hoard is record log; updating is not allowed")
         if isinstance(self.structure, (list, collections.deque)):
             if isinstance(key, int):
                 try:
                     self.structure[key] = value
                     return
                 except IndexError:
-                    pass
-            self.structure = {pykey(k): (k, v) for k, v in enumerate(self.structure)}
+                    self.structure = IntKeyedStructure(list(self.structure))
+            else:
+                self.structure = {pykey(k): (k, v) for k, v in enumerate(self.structure)}
+        if isinstance(self.structure, IntKeyedStructure):
+            if isinstance(key, int):
+                self.structure[key] = value
+                return
+            self.structure = {pykey(k): (k, v) for k, v in self.structure.items()}
+        if isinstance(self.structure, set):
+            if isinstance(value, int) and value == 1:
+                self.structure.add(pykey(key))
+                return
+            self.structure = collections.Counter(self.structure)
+        if isinstance(self.structure, collections.Counter):
+            if isinstance(value, int):
+                self.structure[pykey(key)] = value
+                return
+            self.structure = {k: (unpykey(k), v) for k, v in self.structure.items()}
         self.structure[pykey(key)] = (key, value)
 
+    def updateone(self, key: "PdValue") -> None:
+        if isinstance(self.structure, (list, collections.deque)) and not self.structure:
+            self.structure = set()
+        self.update(key, 1)
+
+    def increment(self, key: "PdValue", delta: PdNum) -> None:
+        if isinstance(self.structure, (list, collections.deque)) and not self.structure:
+            self.structure = collections.Counter()
+        if isinstance(self.structure, collections.Counter) and isinstance(delta, int):
+            self.structure[pykey(key)] += delta
+            return
+        old = self.get(key, 0)
+        if not isinstance(old, (Char, int, float)):
+            raise TypeError("Cannot modify non-number by number")
+        self.update(key, num.pd_add(old, delta))
+
+    def structure_value(self, key: "PdKey") -> "PdObject":
+        # The value at a key known to be in a set or Counter structure.
+        if isinstance(self.structure, collections.Counter):
+            return self.structure[key]
+        return 1
+
     def update_object(self, key: "PdObject", value: "PdObject") -> None:
         if isinstance(key, Block):
             raise TypeError('Cannot update hoard with block as key')
         self.update(key, value)
 
     def delete(self, key0: "PdValue") -> None:
+        if isinstance(self.structure, (RecordLog, MappedArray)):
+            raise TypeError("Hoard is {}; deleting is not allowed".format(self.structure_kind()))
         if isinstance(self.structure, (list, collections.deque)):
-            self.structure = {pykey(k): (k, v) for k, v in enumerate(self.structure)}
+            self.structure = IntKeyedStructure(list(self.structure))
         key = pykey(key0)
-        if key in self.structure:
+        if isinstance(self.structure, set):
+            self.structure.discard(key)
+        elif key in self.structure:
             del self.structure[key]
 
+    # In-place set algebra on keys. The other operand is a sequence of keys
+    # or a hoard; a Counter hoard combines counts like Python's Counter.
+    def union_update(self, other: "PdValue") -> None:
+        if isinstance(self.structure, (list, collections.deque)) and not self.structure:
+            self.structure = set()
+        if isinstance(self.structure, set):
+            self.structure.update(pd_hoard_operand_pykeys(other))
+        elif isinstance(self.structure, collections.Counter):
+            self.structure |= pd_hoard_operand_counter(other)
+        else:
+            for k in pd_hoard_operand_keys(other):
+                if not self.haskey(k): self.update(k, 1)
+
+    def intersection_update(self, other: "PdValue") -> None:
+        if isinstance(self.structure, set):
+            self.structure.intersection_update(pd_hoard_operand_pykeys(other))
+        elif isinstance(self.structure, collections.Counter):
+            self.structure &= pd_hoard_operand_counter(other)
+        else:
+            keep = set(pd_hoard_operand_pykeys(other))
+            for k in self.key_list():
+                if pykey(k) not in keep: self.delete(k)
+
+    def difference_update(self, other: "PdValue") -> None:
+        if isinstance(self.structure, set):
+            self.structure.difference_update(pd_hoard_operand_pykeys(other))
+        elif isinstance(self.structure, collections.Counter):
+            self.structure -= pd_hoard_operand_counter(other)
+        else:
+            for k in pd_hoard_operand_keys(other):
+                self.delete(k)
+
     def copy(self) -> "Hoard":
+        if isinstance(self.structure, (RecordLog, MappedArray)):
+            return Hoard(list(self.structure))
         return Hoard(copy.copy(self.structure))
 
     def clear(self) -> None:
         self.structure = []
 
+    # For hoards attached to files; other hoards have nothing to flush.
+    def flush(self) -> None:
+        if isinstance(self.structure, (RecordLog, MappedArray)):
+            self.structure.flush()
+
+    def close(self) -> None:
+        # Detaches the hoard from its file, leaving it empty.
+        if isinstance(self.structure, (RecordLog, MappedArray)):
+            self.structure.flush()
+            self.structure.close()
+            self.structure = []
+
     def replace(self, a: "PdObject") -> None:
-        if isinstance(a, (str, list, range)):
+        if isinstance(a, (str, list, range, ListView)):
             self.structure = list(a)
         elif isinstance(a, Hoard):
-            self.structure = copy.copy(a.structure)
+            self.structure = a.copy().structure
         elif isinstance(a, (Char, int, float)):
             self.structure = [a]
         else:
             raise TypeError('Replacing hoard with unknown')
 # }}}
 
-PdImmutableSeq = Union[str, list, range]
-PdSeq = Union[str, list, range, Hoard]
-PdImmutable = Union[PdNum, str, list, range]
-PdValue = Union[PdImmutable, Hoard]
+PdImmutableSeq = Union[str, list, range, ListView]
+PdSeq = Union[str, list, range, ListView, Hoard]
+PdImmutable = Union[PdNum, str, list, range, ListView]
+PdValue = Union[PdImmutable, Hoard, LazySeq]
 PdObject = Union[PdValue, Block]
 
 PdKey = Union[PdNum, str, tuple, range]
@@ -297,6 +778,68 @@ def short_repr(obj: PdObject, length_guide: int = 8) -> str:
             return "[{}]".format(", ".join(short_repr(e, lower_length_guide) for e in obj))
     return repr(obj)
 # }}}
+# output sinks {{{
+class OutputSink:
+    """Where an Environment's output goes. Writes are collected and written
+    to the file together once there are at least buffer_size characters of
+    them, or flush is called; the default buffer_size of 0 writes each one
+    straight through to the file, like print, leaving any buffering to the
+    file itself. If flush_interval is given, a write also flushes everything
+    (including the file) if that many seconds have passed since the last
+    flush. That is only checked when writing, so output can still wait
+    longer than that if the program computes or blocks on input without
+    writing anything. The file defaults to whatever sys.stdout is when
+    writing."""
+    def __init__(self,
+            file: Optional[typing.IO[str]] = None,
+            buffer_size: int = 0,
+            flush_interval: Optional[float] = None) -> None:
+        self.file = file
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.parts: List[str] = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, s: str) -> None:
+        if self.buffer_size <= 0:
+            (self.file or sys.stdout).write(s)
+        else:
+            self.parts.append(s)
+            self.size += len(s)
+            if self.size >= self.buffer_size:
+                self.flush()
+                return
+        if (self.flush_interval is not None and
+                time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        file = self.file or sys.stdout
+        if self.parts:
+            file.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+        file.flush()
+        self.last_flush = time.monotonic()
+
+class CaptureSink(OutputSink):
+    """Output kept in memory, for embedding."""
+    def __init__(self) -> None:
+        OutputSink.__init__(self)
+
+    def write(self, s: str) -> None:
+        self.parts.append(s)
+
+    def flush(self) -> None:
+        pass
+
+    def getvalue(self) -> str:
+        return ''.join(self.parts)
+
+    def clear(self) -> None:
+        self.parts = []
+# }}}
 class Environment: # {{{
     def __init__(self,
             evaluator: Callable[['Environment', str], None],
@@ -305,10 +848,14 @@ class Environment: # {{{
             stack: Optional[List[PdObject]] = None,
             x_stack: Optional[List[PdObject]] = None,
             vars_delegate: Optional['Environment'] = None,
-            lazy_var_triggers: Optional[List[Callable[[str], Optional[PdObject]]]] = None) -> None:
+            lazy_var_triggers: Optional[List[Callable[[str], Optional[PdObject]]]] = None,
+            output: Optional[OutputSink] = None,
+            input_source: Optional[InputSource] = None) -> None:
         self.evaluator = evaluator
         self.input_trigger = input_trigger
+        self.input_source = input_source or InputSource()
         self.stack_trigger = stack_trigger
+        self.output = output or OutputSink()
         self.vars:          Dict[str, PdObject] = dict()
         self.var_docs:      Dict[str, str]      = dict()
         self.var_stability: Dict[str, str]      = dict()
@@ -318,6 +865,12 @@ class Environment: # {{{
         self.vars_delegate = vars_delegate
         self.lazy_var_triggers: List[Callable[[str], Optional[PdObject]]] = lazy_var_triggers or []
         self.marker_stack: List[int] = []
+        # Compiled regexes by source, least recently used first. Like vars,
+        # this lives on the root environment.
+        self.regex_cache: 'collections.OrderedDict[str, Pattern]' = collections.OrderedDict()
+        self.regex_cache_limit = 256
+        self.regex_cache_hits = 0
+        self.regex_cache_misses = 0
 
     def evaluate(self, code: str, set_quine: bool) -> None:
         if set_quine:
@@ -330,6 +883,29 @@ class Environment: # {{{
         else:
             return self.input_trigger()
 
+    def compile_regex(self, regex: str) -> Pattern:
+        if self.vars_delegate is not None:
+            return self.vars_delegate.compile_regex(regex)
+        pattern = self.regex_cache.get(regex)
+        if pattern is None:
+            self.regex_cache_misses += 1
+            pattern = re.compile(regex)
+            self.regex_cache[regex] = pattern
+            if len(self.regex_cache) > self.regex_cache_limit:
+                self.regex_cache.popitem(last=False)
+        else:
+            self.regex_cache_hits += 1
+            self.regex_cache.move_to_end(regex)
+        return pattern
+
+    def regex_cache_info(self) -> Tuple[int, int, int, int]:
+        """(hits, misses, limit, current size), like functools'
+        cache_info."""
+        if self.vars_delegate is not None:
+            return self.vars_delegate.regex_cache_info()
+        return (self.regex_cache_hits, self.regex_cache_misses,
+                self.regex_cache_limit, len(self.regex_cache))
+
     def index_x(self, index: int) -> PdObject:
         if self.vars_delegate is None:
             return self._x_stack[-1-index]
@@ -528,8 +1104,11 @@ class Environment: # {{{
     def join_output_fields(self, ss: Iterable[str]) -> str:
         return self.get_output_field_separator().join(ss)
 
-    def print_output_record(self, s: str = "", outfile: typing.IO[str] = sys.stdout) -> None:
-        print(s, end=self.get_output_record_separator(), file=outfile)
+    def write_output(self, s: str) -> None:
+        self.output.write(s)
+
+    def print_output_record(self, s: str = "") -> None:
+        self.output.write(s + self.get_output_record_separator())
 
     def get_epsilon(self) -> float:
         ret = self.get_or_none('Ep')
@@ -541,13 +1120,28 @@ class Environment: # {{{
             raise TypeError('Ep (epsilon) is not numeric')
 
     def pd_str(self, obj: PdObject) -> str:
-        if isinstance(obj, (list, range)):
-            return self.join_output_fields(self.pd_str(e) for e in obj)
-        elif isinstance(obj, (Hoard)):
-            return self.join_output_fields(self.pd_str(e) for e in obj.to_iterable())
+        if isinstance(obj, (list, range, ListView, Hoard, LazySeq)):
+            return ''.join(self.pd_str_chunks(obj))
         else: # includes str, int, float etc.
             return basic_pd_str(obj)
 
+    def pd_str_chunks(self, obj: PdObject) -> Iterator[str]:
+        return pd_str_chunks(obj, self.get_output_field_separator(), hoards=True)
+
+    def write_pd_str(self, obj: PdObject) -> None:
+        """Output pd_str(obj) in pieces of about STR_CHUNK characters,
+        without building the whole string."""
+        parts: List[str] = []
+        size = 0
+        for part in self.pd_str_chunks(obj):
+            parts.append(part)
+            size += len(part)
+            if size >= STR_CHUNK:
+                self.output.write(''.join(parts))
+                parts = []
+                size = 0
+        if parts: self.output.write(''.join(parts))
+
     def pop_stack_marker(self) -> Optional[int]:
         if self.marker_stack:
             return self.marker_stack.pop()
@@ -619,7 +1213,9 @@ class BracketedShadowEnvironment(Environment):
                 evaluator = shadow_parent.evaluator,
                 input_trigger = shadow_parent.input_trigger,
                 stack_trigger = self.shadow_trigger,
-                vars_delegate = shadow_parent)
+                vars_delegate = shadow_parent,
+                output = shadow_parent.output,
+                input_source = shadow_parent.input_source)
         self.shadow_parent = shadow_parent
         self.shadow_i = 0
         self.mark_stack()
@@ -687,14 +1283,16 @@ def pd_sandbox_truthy(env: Environment, func: Block, lst: List[PdObject]) -> boo
 # }}}
 # coercion {{{
 def pynumber_length(x: PdValue) -> Num:
-    if isinstance(x, (str, list, range, Hoard)):
+    if isinstance(x, (str, list, range, ListView, Hoard)):
         return len(x)
     elif isinstance(x, Char):
         return x.ord
+    elif isinstance(x, LazySeq):
+        raise lazy_unsupported('Taking the length')
     else:
         return x
 
-def pd_to_list_range(obj: PdObject, coerce_start: int = 0) -> Union[list, range]:
+def pd_to_list_range(obj: PdObject, coerce_start: int = 0) -> Union[list, range, ListView]:
     ir = pd_to_immutable_seq_range(obj)
     if isinstance(ir, str):
         return [Char(ord(c)) for c in ir]
@@ -702,7 +1300,7 @@ def pd_to_list_range(obj: PdObject, coerce_start: int = 0) -> Union[list, range]
         return ir
 
 def pd_to_immutable_seq_range(obj: PdObject, coerce_start: int = 0) -> PdImmutableSeq:
-    if isinstance(obj, (str, list, range)):
+    if isinstance(obj, (str, list, range, ListView)):
         return obj
     elif isinstance(obj, Char):
         return range(coerce_start, coerce_start + obj.ord)
@@ -710,19 +1308,51 @@ def pd_to_immutable_seq_range(obj: PdObject, coerce_start: int = 0) -> PdImmutab
         return range(coerce_start, coerce_start + obj)
     elif isinstance(obj, Hoard):
         return obj.to_list()
+    elif isinstance(obj, LazySeq):
+        raise lazy_unsupported('Converting to a list')
     else:
         raise AssertionError(repr(obj) + " cannot be converted to list")
 
 # Returns Hashable, but typing that doesn't really work...
 def pykey(obj: PdObject) -> PdKey:
     if isinstance(obj, (Char, int, float, str, range)): return obj
-    elif isinstance(obj, list): return tuple(pykey(x) for x in obj)
+    elif isinstance(obj, (list, ListView)): return tuple(pykey(x) for x in obj)
     else:
         raise TypeError(repr(obj) + " cannot be converted to key")
 
+def unpykey(key: PdKey) -> PdValue:
+    if isinstance(key, tuple): return [unpykey(x) for x in key]
+    else: return key
+
+def pd_hoard_key(obj: PdObject) -> PdValue:
+    if isinstance(obj, Block):
+        raise TypeError('Cannot use block as hoard key')
+    return obj
+
+def pd_hoard_operand_keys(obj: PdObject) -> Iterable[PdValue]:
+    if isinstance(obj, Hoard):
+        return obj.key_list()
+    elif isinstance(obj, (str, list, range, ListView)):
+        return map(pd_hoard_key, pd_iterable(obj))
+    else:
+        raise TypeError("Cannot use " + repr(obj) + " as keys for hoard set algebra")
+
+def pd_hoard_operand_pykeys(obj: PdObject) -> Iterable[PdKey]:
+    if isinstance(obj, Hoard) and isinstance(obj.structure, (set, collections.Counter)):
+        return obj.structure
+    return (pykey(k) for k in pd_hoard_operand_keys(obj))
+
+def pd_hoard_operand_counter(obj: PdObject) -> typing.Counter[PdKey]:
+    if isinstance(obj, Hoard) and isinstance(obj.structure, collections.Counter):
+        return obj.structure
+    return collections.Counter(pd_hoard_operand_pykeys(obj))
+
 # }}}
 # sandbox {{{
 def pd_sandbox(env: Environment, func: Block, lst: List[PdObject]) -> List[PdObject]:
+    direct = func.direct_call(env, lst)
+    if direct is not None:
+        return direct
     # There are a bunch of reasonable ways to define/implement this...
     shadow = env.bracketed_shadow()
     shadow.push(*lst)
@@ -738,36 +1368,17 @@ def pd_sandbox(env: Environment, func: Block, lst: List[PdObject]) -> List[PdObj
     # return temp_env.stack
 # }}}
 # comparisons {{{
-def to_comparable_list(a: PdValue) -> list:
-    if isinstance(a, list): return a
-    elif isinstance(a, (Char, int, float)): return [a]
-    elif isinstance(a, complex): return [a.real, a.imag] # FIXME ???
-    elif isinstance(a, Hoard): return a.to_list()
-    else: return list(pd_iterable(a))
-
-def to_comparable_tuple(a: PdKey) -> tuple:
-    if isinstance(a, tuple): return a
-    elif isinstance(a, (Char, int, float)): return (a,)
-    elif isinstance(a, complex): return (a.real, a.imag) # FIXME ???
-    elif isinstance(a, Hoard): return tuple(a.to_iterable())
-    else: return tuple(pd_iterable(a))
-
-def pd_to_list(a: Union[list, range, Hoard]) -> list:
+def pd_to_list(a: Union[list, range, ListView, Hoard]) -> list:
     if isinstance(a, list): return a
-    elif isinstance(a, range): return list(a)
+    elif isinstance(a, (range, ListView)): return list(a)
     else: return a.to_list()
 
-def pd_to_tuple(a: Union[tuple, range, Hoard]) -> tuple:
-    if isinstance(a, tuple): return a
-    elif isinstance(a, range): return tuple(a)
-    else: return tuple(a.to_iterable())
-
-def pd_to_sorted(a: Union[list, range, Hoard]) -> list:
-    if isinstance(a, (list, range)): return sorted(a)
-    elif isinstance(a, range): return sorted(a)
-    else: return sorted(a.to_iterable())
+def pd_to_sorted(a: Union[list, range, ListView, Hoard]) -> list:
+    if isinstance(a, range): return list(a) if a.step > 0 else list(reversed(a))
+    elif isinstance(a, (list, ListView)): return pd_sorted(a)
+    else: return pd_sorted(a.to_iterable())
 
-def pd_deref(a: PdSeq) -> Union[str, list, range]:
+def pd_deref(a: PdSeq) -> PdImmutableSeq:
     if isinstance(a, Hoard): return a.to_list()
     else: return a
 
@@ -782,39 +1393,100 @@ def pd_zip_with_tail(a: PdSeq) -> Generator[Tuple[PdObject, PdObject], None, Non
             yield (recent, e)
         recent = e
 
+# Sort keys {{{
+# pd_sort_key maps any value to a key that Python compares natively, in C,
+# the same way pd_cmp compares values: numbers by value, with Chars as their
+# code points and complex numbers lexicographically by real and imaginary
+# part; sequences lexicographically, with strings as sequences of Chars; and
+# a number against a sequence as if it were a singleton sequence. Each
+# element becomes a tagged "cell", so numbers and nested sequences inside a
+# list are comparable too (numbers first). pykeys, with tuples in place of
+# lists, get the same keys as the values they came from.
+def pd_sort_key_cell(obj: Union[PdObject, PdKey]) -> tuple:
+    if isinstance(obj, (int, float)): return (0, obj, 0)
+    elif isinstance(obj, Char): return (0, obj.ord, 0)
+    elif isinstance(obj, complex): return (0, obj.real, obj.imag)
+    else: return (1, pd_sort_key(obj))
+
+def pd_sort_key(obj: Union[PdObject, PdKey]) -> tuple:
+    if isinstance(obj, (int, float)): return ((0, obj, 0),)
+    elif isinstance(obj, Char): return ((0, obj.ord, 0),)
+    elif isinstance(obj, complex): return ((0, obj.real, obj.imag),)
+    elif isinstance(obj, str): return tuple((0, ord(c), 0) for c in obj)
+    elif isinstance(obj, (list, tuple, range, ListView)):
+        return tuple(pd_sort_key_cell(e) for e in obj)
+    elif isinstance(obj, Hoard):
+        return tuple(pd_sort_key_cell(e) for e in obj.to_iterable())
+    elif isinstance(obj, Block):
+        raise TypeError('cannot compare blocks')
+    else:
+        raise TypeError(repr(obj) + " cannot be converted to sort key")
+
+def native_sortable(objs: List[Any]) -> bool:
+    """Whether Python's own < on these objects already agrees with pd_cmp:
+    they're all real numbers, all strings, or all Chars."""
+    types = set(map(type, objs))
+    return types <= {int, float} or types == {str} or types == {Char}
+
+def pd_comparable_keys(objs: List[Any]) -> List[Any]:
+    """Keys for these objects that compare with Python's < like the objects
+    do under pd_cmp; the objects themselves if possible."""
+    if native_sortable(objs):
+        return objs
+    return [pd_sort_key(obj) for obj in objs]
+
+def pd_sorted(objs: Iterable[T], reverse: bool = False) -> List[T]:
+    lst = list(objs)
+    keys = pd_comparable_keys(lst)
+    if keys is lst: # the objects are their own keys
+        return sorted(keys, reverse=reverse)
+    order = sorted(range(len(lst)), key=keys.__getitem__, reverse=reverse)
+    return [lst[i] for i in order]
+
+def pd_sorted_by(objs: Iterable[T], key_objs: List[Any]) -> List[T]:
+    """Stably sort objs by the corresponding values in key_objs, which are
+    compared like pd_cmp; ties are left in order, never compared."""
+    lst = list(objs)
+    # The common case of a keying block that produced one number each.
+    # Singleton lists only compare like their elements if those are all of
+    # one natively sortable kind, though; [100] < ['a'] but 100 > 'a'.
+    if all(isinstance(k, list) and len(k) == 1 for k in key_objs):
+        unwrapped = [k[0] for k in key_objs]
+        if native_sortable(unwrapped):
+            key_objs = unwrapped
+    keys = pd_comparable_keys(key_objs)
+    order = sorted(range(len(lst)), key=keys.__getitem__)
+    return [lst[i] for i in order]
+
 def pd_cmp(a: PdObject, b: PdObject) -> int:
     if isinstance(a, (Char, int)) and isinstance(b, (Char, int)):
         return num.any_cmp(num.intify(a), num.intify(b))
     elif isinstance(a, (Char, int, float)) and isinstance(b, (Char, int, float)):
         return num.any_cmp(num.floatify(a), num.floatify(b))
-    elif isinstance(a, (Char, int, float, complex)) and isinstance(b, (Char, int, float, complex)):
-        fa = num.numerify(a)
-        fb = num.numerify(b)
-        return num.any_cmp((fa.real, fa.imag), (fb.real, fb.imag))
-    elif isinstance(a, (list, range, Hoard)) and isinstance(b, (list, range, Hoard)):
-        return num.any_cmp(pd_to_list(a), pd_to_list(b))
     elif isinstance(a, str) and isinstance(b, str):
         return num.any_cmp(a, b)
-    elif isinstance(a, (Char, str)) and isinstance(b, (Char, str)):
-        return num.any_cmp(basic_pd_str(a), basic_pd_str(b))
-    elif isinstance(a, Block) or isinstance(b, Block):
-        raise TypeError('cannot compare blocks')
     else:
-        return num.any_cmp(to_comparable_list(a), to_comparable_list(b))
+        return num.any_cmp(pd_sort_key(a), pd_sort_key(b))
 
 def pykey_cmp(a: PdKey, b: PdKey) -> int:
-    if isinstance(a, (Char, int, float, complex)) and isinstance(b, (Char, int, float, complex)):
-        return pd_cmp(a, b)
-    elif isinstance(a, (tuple, range, Hoard)) and isinstance(b, (tuple, range, Hoard)):
-        return num.any_cmp(pd_to_tuple(a), pd_to_tuple(b))
-    elif isinstance(a, str) and isinstance(b, str):
-        return num.any_cmp(a, b)
-    elif isinstance(a, (Char, str)) and isinstance(b, (Char, str)):
-        return num.any_cmp(basic_pd_str(a), basic_pd_str(b))
-    elif isinstance(a, Block) or isinstance(b, Block):
-        raise TypeError('cannot compare blocks')
-    else:
-        return num.any_cmp(to_comparable_tuple(a), to_comparable_tuple(b))
+    return num.any_cmp(pd_sort_key(a), pd_sort_key(b))
+
+def pykey_sorted(keys: Iterable[PdKey], reverse: bool = False) -> List[PdKey]:
+    return pd_sorted(keys, reverse=reverse)
+
+def pykey_slice(keys: Iterable[PdKey], left: Optional[PdKey], right: Optional[PdKey]) -> List[PdKey]:
+    """The keys k with left <= k < right, in order; either bound can be
+    None."""
+    ks = pykey_sorted(keys)
+    sort_keys = [pd_sort_key(k) for k in ks]
+    lo = 0 if left is None else bisect.bisect_left(sort_keys, pd_sort_key(left))
+    hi = len(ks) if right is None else bisect.bisect_left(sort_keys, pd_sort_key(right))
+    return ks[lo:hi]
+
+def pykey_extremum(keys: Iterable[PdKey], is_max: bool) -> PdKey:
+    lst = list(keys)
+    comparable = pd_comparable_keys(lst)
+    return lst[(max if is_max else min)(range(len(lst)), key=comparable.__getitem__)]
 
 def pd_less_than(a: PdObject, b: PdObject) -> bool:
     return pd_cmp(a, b) < 0
@@ -826,6 +1498,14 @@ def pykey_lt(a: PdKey, b: PdKey) -> bool:
 def pykey_lte(a: PdKey, b: PdKey) -> bool:
     return pykey_cmp(a, b) <= 0
 
+def pd_is_sorted(a: PdSeq, strict: bool = False, reverse: bool = False) -> bool:
+    keys = pd_comparable_keys(list(pd_iterable(a)))
+    if reverse: keys.reverse()
+    if strict:
+        return all(x < y for x, y in zip(keys, keys[1:]))
+    else:
+        return not any(y < x for x, y in zip(keys, keys[1:]))
+# }}}
 def pd_minmax(a: PdObject, b: PdObject, ef: Optional[Tuple[Environment, Block]] = None) -> Tuple[PdObject, PdObject]:
     if ef is None:
         ar = a
@@ -854,22 +1534,22 @@ def pd_median_of_three(a: PdObject, b: PdObject, c: PdObject, ef: Optional[Tuple
     if pd_less_than(ar, br): a, b = b, a
     return b
 def pd_extrema_of_seq(a: PdSeq, is_max: bool, ef: Optional[Tuple[Environment, Block]] = None) -> PdSeq:
+    elts = list(pd_iterable(a))
+    if ef is None:
+        key_objs: List[Any] = elts
+    else:
+        env, f = ef
+        key_objs = [pd_sandbox(env, f, [e]) for e in elts]
+    keys = pd_comparable_keys(key_objs)
     cur: List[PdObject] = []
-    cur_key: Optional[PdObject] = None
-    for e in pd_iterable(a):
-        if ef is None:
-            e_key = e
-        else:
-            env, f = ef
-            e_key = pd_sandbox(env, f, [e])
-        if cur_key is None:
+    cur_key: Any = None
+    for e, e_key in zip(elts, keys):
+        if not cur:
             cur, cur_key = [e], e_key
-        else:
-            cmp_result = pd_cmp(e_key, cur_key)
-            if (cmp_result > 0 if is_max else cmp_result < 0):
-                cur, cur_key = [e], e_key
-            elif cmp_result == 0:
-                cur.append(e)
+        elif (cur_key < e_key) if is_max else (e_key < cur_key):
+            cur, cur_key = [e], e_key
+        elif not (e_key < cur_key or cur_key < e_key):
+            cur.append(e)
     return pd_build_like(a, cur)
 def pd_minima_of_seq(a: PdSeq, ef: Optional[Tuple[Environment, Block]] = None) -> PdSeq:
     return pd_extrema_of_seq(a, False, ef)
@@ -891,30 +1571,133 @@ def pd_max_of_seq(a: PdSeq, ef: Optional[Tuple[Environment, Block]] = None) -> P
 def pd_max_of_seq_list_op(env: Environment, func: Block, seq: PdSeq) -> PdObject:
     return pd_max_of_seq(seq, (env, func))
 
-# Heavy-handed, probably slow, meant to make complex numbers sort
-# lexicographically. So we only use it if necessary.
-def py_sortable_key(obj: PdObject) -> PdKey:
-    if isinstance(obj, (Char, int, float)): return (obj, 0)
-    elif isinstance(obj, complex): return (obj.real, obj.imag)
-    elif isinstance(obj, str): return tuple(Char(c) for c in obj)
-    elif isinstance(obj, range): return tuple(obj)
-    elif isinstance(obj, list): return tuple(py_sortable_key(x) for x in obj)
-    else:
-        raise TypeError(repr(obj) + " cannot be converted to sortable key")
-
 def pd_sort(a: PdSeq, ef: Optional[Tuple[Environment, Block]] = None) -> PdSeq:
     if ef is None:
         if isinstance(a, str):
             return ''.join(sorted(a))
         else:
-            try:
-                return list(sorted(pd_to_list(a)))
-            except TypeError as te:
-                return list(sorted(pd_to_list(a), key=py_sortable_key))
+            return pd_sorted(pd_iterable(a))
     else:
         env, f = ef
-        keyed = [(pd_sandbox(env, f, [elt]), elt) for elt in pd_iterable(a)]
-        return pd_build_like(a, [se for sk, se in sorted(keyed)])
+        elts = list(pd_iterable(a))
+        return pd_build_like(a, pd_sorted_by(elts, [pd_sandbox(env, f, [elt]) for elt in elts]))
+# }}}
+# Selection {{{
+# Order statistics without a full sort: find the elements that pd_sorted
+# would put at some positions by quickselect, partitioning with list
+# comprehensions around a median-of-three pivot. Like introsort, we fall
+# back to sorting whatever's left if the partitions stay lopsided for too
+# long, and we use a heap when a single position is close to either end.
+# Many positions at once are cheaper to read off one sort.
+def _multiselect(xs: List[Any], ranks: List[int], offset: int, depth: int, out: Dict[int, Any]) -> None:
+    # ranks is sorted, relative to xs; out is keyed by rank + offset
+    while ranks:
+        n = len(xs)
+        if n <= 16 or depth <= 0:
+            s = sorted(xs)
+            for r in ranks: out[r + offset] = s[r]
+            return
+        pivot = sorted([xs[0], xs[n // 2], xs[-1]])[1]
+        lo = [x for x in xs if x < pivot]
+        hi = [x for x in xs if pivot < x]
+        lo_end = len(lo)
+        hi_start = n - len(hi)
+        split_lo = bisect.bisect_left(ranks, lo_end)
+        split_hi = bisect.bisect_left(ranks, hi_start)
+        for r in ranks[split_lo:split_hi]: out[r + offset] = pivot
+        depth -= 1
+        _multiselect(lo, ranks[:split_lo], offset, depth, out)
+        xs, ranks, offset = hi, [r - hi_start for r in ranks[split_hi:]], offset + hi_start
+
+def pd_select(objs: Iterable[T], ranks: Iterable[PdObject]) -> List[T]:
+    """The elements that pd_sorted(objs) would have at each of the given
+    (zero-indexed, possibly negative) positions."""
+    lst = list(objs)
+    n = len(lst)
+    targets: List[int] = []
+    for r0 in ranks:
+        if not isinstance(r0, (Char, int, float)):
+            raise TypeError("Order statistic index must be number, not " + repr(r0))
+        r = num.intify(r0)
+        if r < 0: r += n
+        if not 0 <= r < n:
+            raise IndexError("order statistic index out of range")
+        targets.append(r)
+    if not targets: return []
+
+    # Elements with equal keys but different types (1 and 1.0, or 'a and
+    # "a") must come out as a stable sort would put them, so we decorate
+    # with indices unless there's only one type of element.
+    if len(set(map(type, lst))) == 1 and native_sortable(lst):
+        keys: List[Any] = lst
+        decorated = False
+    else:
+        keys = [(k, i) for i, k in enumerate(pd_comparable_keys(lst))]
+        decorated = True
+
+    found: Dict[int, Any] = dict()
+    if len(targets) == 1 and min(targets[0], n - 1 - targets[0]) < 64:
+        r = targets[0]
+        if r < n - 1 - r:
+            found[r] = heapq.nsmallest(r + 1, keys)[-1]
+        else:
+            found[r] = heapq.nlargest(n - r, keys)[-1]
+    elif len(set(targets)) <= 2:
+        _multiselect(keys, sorted(set(targets)), 0, 2 * n.bit_length(), found)
+    else:
+        # Python-level partitioning only beats the C sort for a couple of
+        # positions; past that, sort once for the whole batch.
+        s = sorted(keys)
+        for r in targets: found[r] = s[r]
+
+    if decorated:
+        return [lst[found[r][1]] for r in targets]
+    else:
+        return [found[r] for r in targets]
+
+def pd_median(objs: Iterable[PdObject], average: bool = False) -> PdObject:
+    lst = list(objs)
+    n = len(lst)
+    if not n:
+        raise ValueError("Cannot take median of empty sequence")
+    if average and n % 2 == 0:
+        a, b = pd_select(lst, [n // 2 - 1, n // 2])
+        if not isinstance(a, (Char, int, float, complex)) or not isinstance(b, (Char, int, float, complex)):
+            raise TypeError("Cannot average non-numbers for median")
+        return num.pd_div(num.pd_add(a, b), 2)
+    return pd_select(lst, [n // 2])[0]
+
+def pd_quantiles(objs: Iterable[PdObject], qs: Iterable[PdObject]) -> List[PdObject]:
+    """Quantiles, each a fraction from 0 to 1, interpolating linearly
+    between the closest order statistics when needed. All of them come
+    from one batched selection."""
+    lst = list(objs)
+    n = len(lst)
+    if not n:
+        raise ValueError("Cannot take quantiles of empty sequence")
+    positions: List[Tuple[int, int, float]] = []
+    for q0 in qs:
+        if not isinstance(q0, (Char, int, float)):
+            raise TypeError("Quantile must be number, not " + repr(q0))
+        q = num.floatify(q0)
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        pos = q * (n - 1)
+        below = min(int(pos), n - 1)
+        positions.append((below, min(below + 1, n - 1), pos - below))
+    ranks = sorted(set(r for below, above, _ in positions for r in (below, above)))
+    values = dict(zip(ranks, pd_select(lst, ranks)))
+    ret: List[PdObject] = []
+    for below, above, frac in positions:
+        a = values[below]
+        if frac == 0:
+            ret.append(a)
+        else:
+            b = values[above]
+            if not isinstance(a, (Char, int, float, complex)) or not isinstance(b, (Char, int, float, complex)):
+                raise TypeError("Cannot interpolate between non-numbers for quantile")
+            ret.append(num.pd_add(a, num.pd_mul(num.pd_sub(b, a), frac)))
+    return ret
 # }}}
 # deep actions {{{
 # copy a thing recursively, fully structured as mutable lists
@@ -1072,6 +1855,8 @@ def pd_deep_reduce_complex(obj: PdObject) -> PdValue:
                 repr(obj))
     if isinstance(obj, (Char, int, float, complex)):
         raise TypeError('Cannot deeply reduce complex over scalar ' + repr(obj))
+    elif isinstance(obj, LazySeq):
+        raise lazy_unsupported('Deeply reducing')
     else:
         # Should be all sequences or all scalars
         seq_accum: List[PdObject] = []
@@ -1125,7 +1910,7 @@ def pd_deepmap_block(env: Environment, func: Block, seq: PdSeq) -> PdObject:
         env.pop_yx()
 # }}}
 # iteration wrappers {{{
-def pd_iterable(seq: PdSeq) -> Iterable[PdObject]:
+def pd_iterable(seq: Union[PdSeq, LazySeq]) -> Iterable[PdObject]:
     if isinstance(seq, str):
         return (Char(ord(c)) for c in seq)
     elif isinstance(seq, Hoard):
@@ -1135,6 +1920,8 @@ def pd_iterable(seq: PdSeq) -> Iterable[PdObject]:
 def pd_len_singleton(v: PdValue) -> int:
     if isinstance(v, (Char, int, float, complex)):
         return 1
+    elif isinstance(v, LazySeq):
+        raise lazy_unsupported('Taking the length')
     else:
         return len(v)
 
@@ -1144,6 +1931,8 @@ def pd_cycle_to_len(n: int, obj: PdValue) -> Iterable[PdObject]:
     elif isinstance(obj, str):
         n0 = len(obj)
         return (Char(ord(obj[i % n0])) for i in range(n))
+    elif isinstance(obj, LazySeq):
+        raise lazy_unsupported('Cycling')
     else:
         if isinstance(obj, Hoard):
             obj = obj.to_list()
@@ -1162,7 +1951,7 @@ def pd_deep_generator(obj: PdObject) -> Generator[PdValue, None, None]:
         yield obj
     elif isinstance(obj, str):
         yield from (Char(ord(c)) for c in obj)
-    elif isinstance(obj, (list, range)):
+    elif isinstance(obj, (list, range, ListView)):
         for e in obj:
             yield from pd_deep_generator(e)
     else:
@@ -1193,10 +1982,12 @@ def pd_slice(seq: list, left: Optional[PdNum], right: Optional[PdNum]) -> list:
 @overload
 def pd_slice(seq: range, left: Optional[PdNum], right: Optional[PdNum]) -> range: ...
 @overload
+def pd_slice(seq: ListView, left: Optional[PdNum], right: Optional[PdNum]) -> ListView: ...
+@overload
 def pd_slice(seq: Hoard, left: Optional[PdNum], right: Optional[PdNum]) -> list: ...
 
 def pd_slice(seq: PdSeq, left: Optional[PdNum], right: Optional[PdNum]) -> PdImmutableSeq:
-    if isinstance(seq, (str, list, range)):
+    if isinstance(seq, (str, list, range, ListView)):
         return seq[num.intify_opt(left):num.intify_opt(right)]
     else:
         return seq.slice(left, right)
@@ -1210,31 +2001,53 @@ def pd_last(seq: PdSeq) -> PdObject:
         return seq.last()
     else:
         return pd_index(seq, -1)
+def pd_slice_view(seq: PdImmutableSeq, left: Optional[int], right: Optional[int]) -> PdImmutableSeq:
+    """Like slicing, but slices of lists are ListViews, so taking many of
+    them doesn't copy elements."""
+    if isinstance(seq, list):
+        return ListView.of(seq, slice(left, right))
+    else:
+        return seq[left:right]
 def pd_butfirst(seq: PdSeq) -> PdImmutableSeq:
     if isinstance(seq, Hoard):
         return seq.butfirst()
     else:
-        return pd_slice(seq, 1, None)
+        return pd_slice_view(seq, 1, None)
 def pd_butlast(seq: PdSeq) -> PdImmutableSeq:
     if isinstance(seq, Hoard):
         return seq.butlast()
     else:
-        return pd_slice(seq, None, -1)
+        return pd_slice_view(seq, None, -1)
+def pd_persistent(seq: PdSeq) -> ListView:
+    """The elements of seq as a view of a PersistentVector, reusing seq if it
+    already is one."""
+    if isinstance(seq, ListView) and isinstance(seq.base, PersistentVector):
+        return seq
+    vec = PersistentVector.from_iterable(pd_iterable(seq))
+    return ListView(vec, range(len(vec)))
+def pd_assoc(seq: PdSeq, n: int, value: PdObject) -> ListView:
+    """A copy of seq with the element at index n replaced, in O(log n) time
+    if seq came from pd_persistent or pd_assoc."""
+    seq = pd_persistent(seq)
+    return ListView(seq.base.set(seq.indices[n], value), seq.indices) # type: ignore
 def pd_modify_index(env: Environment, func: Block, seq: PdImmutableSeq, n: int) -> PdObject:
     if isinstance(seq, str): seq = list(pd_iterable(seq))
     elif isinstance(seq, Hoard): seq = seq.to_list()
+    result = pd_sandbox(env, func, [seq[n]])
+    if len(result) == 1 and isinstance(seq, ListView) and isinstance(seq.base, PersistentVector):
+        return pd_assoc(seq, n, result[0])
     before = list(seq[:n])
     after  = [] if n == -1 else list(seq[n+1:])
-    return before + pd_sandbox(env, func, [seq[n]]) + after
+    return before + result + after
 def pd_join(env: Environment, seq: PdSeq, joiner: PdSeq) -> PdObject:
-    if isinstance(seq, (list, range)) and isinstance(joiner, (list, range)):
+    if isinstance(seq, (list, range, ListView)) and isinstance(joiner, (list, range, ListView)):
         acc: List[PdObject] = []
         started = False
         for e in seq:
             if started:
                 acc.extend(joiner)
             started = True
-            if isinstance(e, (list, range)):
+            if isinstance(e, (list, range, ListView)):
                 acc.extend(e)
             else:
                 acc.append(e)
@@ -1278,36 +2091,86 @@ def pd_split_seq_int_gen(seq: PdSeq, n: int, include_leftover: bool) -> Generato
 def pd_split_seq(seq: PdSeq, n: PdNum, include_leftover: bool) -> List[PdSeq]:
     return list(pd_split_seq_int_gen(seq, num.intify(n), include_leftover))
 
+# Searching for a subsequence: strings in strings go through Python's own
+# methods; everything else goes through KMP over the elements, with strings
+# as sequences of Chars so that they match lists of Chars.
+def pd_chars_as_str(seq: PdSeq) -> Optional[str]:
+    if isinstance(seq, str): return seq
+    elif isinstance(seq, (list, ListView, Hoard)):
+        elts = list(pd_iterable(seq))
+        if all(isinstance(c, Char) for c in elts):
+            return ''.join(c.chr for c in elts) # type: ignore
+    return None
+
+def pd_find_all_subseq(seq: PdSeq, tok: PdSeq) -> Iterator[int]:
+    """Starting indices of non-overlapping occurrences of nonempty tok in
+    seq."""
+    tok_elts = list(pd_iterable(tok))
+    if not tok_elts:
+        raise ValueError("empty separator")
+    return kmp_find_all(tok_elts, pd_iterable(seq))
+
 def pd_split_seq_by_gen(seq: PdSeq, tok: PdSeq) -> Generator[PdSeq, None, None]:
     if isinstance(seq, Hoard): seq = seq.to_list()
     if isinstance(tok, Hoard): tok = tok.to_list()
-    i = 0
-    cur_start = 0
-    seqlen = len(seq)
     toklen = len(tok)
-    while True:
-        if i + toklen > seqlen:
-            # No more breaks are possible.
-            yield seq[cur_start:]
-            return
-        elif list(seq[i:i+toklen]) == list(tok):
-            yield seq[cur_start:i]
-            i += toklen
-            cur_start = i
-        else:
-            i += 1
+    cur_start = 0
+    for i in pd_find_all_subseq(seq, tok):
+        yield seq[cur_start:i]
+        cur_start = i + toklen
+    yield seq[cur_start:]
 
 def pd_split_seq_by(seq: PdSeq, tok: PdSeq) -> List[PdSeq]:
     if isinstance(seq, str):
         # Python is probably faster than we are. And less error-prone :)
         # Ignoring types to pretend List is covariant
-        if isinstance(tok, str):
-            return seq.split(tok) # type: ignore
-        elif isinstance(tok, Char):
+        if isinstance(tok, Char):
             return seq.split(tok.chr) # type: ignore
-        # TODO: Special case for list of Chars?
+        tok_str = pd_chars_as_str(tok)
+        if tok_str is not None:
+            return seq.split(tok_str) # type: ignore
     return list(pd_split_seq_by_gen(seq, tok))
 
+def pd_count_subseq(seq: PdSeq, tok: PdSeq) -> int:
+    """Count non-overlapping occurrences, like str.count."""
+    if isinstance(seq, str):
+        tok_str = pd_chars_as_str(tok)
+        if tok_str is not None:
+            return seq.count(tok_str)
+    if not list(pd_iterable(tok)):
+        return len(seq) + 1
+    return sum(1 for _ in pd_find_all_subseq(seq, tok))
+
+# Searching for many subsequences at once, with one cached Aho-Corasick
+# automaton per list of patterns. A string searched for strings (or lists
+# of Chars) is matched character by character; otherwise elements are
+# matched by their keys.
+def pd_multi_search(seq: PdSeq, pats: PdSeq) -> Tuple[AhoCorasick, Iterable[Hashable]]:
+    pat_objs = list(pd_iterable(pats))
+    if isinstance(seq, str):
+        pat_strs = [pd_chars_as_str(p) if isinstance(p, (str, list, Hoard))
+                else p.chr if isinstance(p, Char) else None for p in pat_objs]
+        if all(p is not None for p in pat_strs):
+            return aho_corasick(tuple(pat_strs)), seq # type: ignore
+    pat_keys = tuple(
+            tuple(pykey(x) for x in pd_iterable(p))
+            if isinstance(p, (str, list, range, ListView, Hoard)) else (pykey(p),)
+            for p in pat_objs)
+    return aho_corasick(pat_keys), (pykey(x) for x in pd_iterable(seq))
+
+def pd_multi_find_all(seq: PdSeq, pats: PdSeq) -> List[PdObject]:
+    automaton, haystack = pd_multi_search(seq, pats)
+    return [list(match) for match in sorted(automaton.find_all(haystack))]
+
+def pd_multi_find_first(seq: PdSeq, pats: PdSeq) -> List[PdObject]:
+    automaton, haystack = pd_multi_search(seq, pats)
+    match = automaton.find_first(haystack)
+    return [] if match is None else list(match)
+
+def pd_multi_count(seq: PdSeq, pats: PdSeq) -> List[PdObject]:
+    automaton, haystack = pd_multi_search(seq, pats)
+    return list(automaton.count(haystack))
+
 # Emulate str.split(). Never returns any empty sequences.
 def pd_split_seq_by_pred(seq: PdSeq, pred: Callable[[PdObject], bool]) -> Generator[PdSeq, None, None]:
     if isinstance(seq, Hoard): seq = seq.to_list()
@@ -1345,7 +2208,7 @@ def pd_split_seq_by_spaces(seq: PdSeq) -> List[PdSeq]:
 def pd_sliding_window_seq_int_gen(seq: PdSeq, n: int) -> Generator[PdSeq, None, None]:
     if isinstance(seq, Hoard): seq = seq.to_list()
     for i in range(len(seq) + 1 - n):
-        yield seq[i:i+n]
+        yield pd_slice_view(seq, i, i+n)
 
 def pd_sliding_window_seq(seq: PdSeq, n: PdNum) -> List[PdSeq]:
     return list(pd_sliding_window_seq_int_gen(seq, num.intify(n)))
@@ -1387,7 +2250,7 @@ def pd_flatten_once(val: PdValue) -> PdImmutable:
             for e in val:
                 if isinstance(e, str):
                     acc.extend(Char(c) for c in e)
-                elif isinstance(e, (list, range)):
+                elif isinstance(e, (list, range, ListView)):
                     acc.extend(e)
                 else:
                     acc.append(e)
@@ -1396,7 +2259,7 @@ def pd_flatten_once(val: PdValue) -> PdImmutable:
 @overload
 def pd_flatten(val: range) -> range: ...
 @overload
-def pd_flatten(val: Union[list, Hoard]) -> Union[list, str]: ...
+def pd_flatten(val: Union[list, ListView, Hoard]) -> Union[list, str]: ...
 @overload
 def pd_flatten(val: Char) -> Char: ...
 @overload
@@ -1418,7 +2281,7 @@ def pd_flatten(val: PdValue) -> PdImmutable:
         for e in val:
             if isinstance(e, str):
                 acc.extend(Char(c) for c in e)
-            elif isinstance(e, (list, range)):
+            elif isinstance(e, (list, range, ListView)):
                 acc.extend(pd_flatten(e))
             else:
                 acc.append(e)
@@ -1494,7 +2357,7 @@ def pd_organize_by(env: Environment, func: Block, seq: PdSeq) -> list:
 
 def pd_mold_from(value_iterable: Iterator[PdValue], template: PdObject) -> PdObject:
     if isinstance(template, (Char, int, float)): return next(value_iterable)
-    elif isinstance(template, (str, list, range)):
+    elif isinstance(template, (str, list, range, ListView)):
         acc = []
         for te in pd_iterable(template):
             acc.append(pd_mold_from(iter(value_iterable), te))
@@ -1562,7 +2425,7 @@ def pd_str_subsequences_gen(seq: str) -> Generator[str, None, None]:
         for s in pd_str_subsequences_gen(seq[1:]):
             yield fst + s
 
-def pd_lst_subsequences_gen(seq: list) -> Generator[list, None, None]:
+def pd_lst_subsequences_gen(seq: Union[list, ListView]) -> Generator[list, None, None]:
     if not seq:
         yield []
     else:
@@ -1595,14 +2458,14 @@ def pd_palindromize(seq: PdSeq) -> PdSeq:
 def pd_rectangularize_fill(matrix: PdSeq, filler: PdObject) -> List[list]:
     n = 0
     for row0 in pd_iterable(matrix):
-        if isinstance(row0, (str, list, range)):
+        if isinstance(row0, (str, list, range, ListView)):
             n = max(n, len(row0))
         else:
             n = max(n, 1)
 
     acc: List[list] = []
     for row0 in pd_iterable(matrix):
-        if isinstance(row0, (str, list, range)):
+        if isinstance(row0, (str, list, range, ListView)):
             row = list(pd_iterable(row0))
         else:
             row = [row0]
@@ -1612,7 +2475,7 @@ def pd_rectangularize_fill(matrix: PdSeq, filler: PdObject) -> List[list]:
 def pd_transpose(matrix: PdSeq) -> List[list]:
     res: List[list] = []
     for row0 in pd_iterable(matrix):
-        if isinstance(row0, (str, list, range)):
+        if isinstance(row0, (str, list, range, ListView)):
             row = pd_iterable(row0)
         else:
             row = [row0]
@@ -1626,7 +2489,7 @@ def pd_transpose(matrix: PdSeq) -> List[list]:
 def pd_transpose_fill(matrix: PdSeq, filler: PdObject) -> List[list]:
     res: List[list] = []
     for ri, row0 in py_enumerate(matrix):
-        if isinstance(row0, (str, list, range)):
+        if isinstance(row0, (str, list, range, ListView)):
             row = pd_iterable(row0)
         else:
             row = [row0]
@@ -1654,6 +2517,8 @@ def pd_orthogonal_neighbors(obj: PdObject) -> list:
         raise TypeError('Cannot compute neighbors of block ' + repr(obj))
     if isinstance(obj, (Char, int, float, complex)):
         return [num.pd_add_const(obj, -1), num.pd_add_const(obj, 1)]
+    elif isinstance(obj, LazySeq):
+        raise lazy_unsupported('Computing neighbors')
     elif len(obj) == 0:
         return []
     elif isinstance(obj, str):
@@ -1691,6 +2556,8 @@ def pd_king_neighbors_and_self(obj: PdObject) -> List[Tuple[bool, Any]]:
             (False, obj),
             (True, num.pd_add_const(obj, 1)),
         ]
+    elif isinstance(obj, LazySeq):
+        raise lazy_unsupported('Computing neighbors')
     elif len(obj) == 0:
         return [(False, obj)]
     elif isinstance(obj, str):
@@ -1727,17 +2594,13 @@ def pd_find_substring_index(env: Environment, needle: PdSeq, haystack: PdSeq) ->
         except ValueError:
             return -1
     else:
-        if isinstance(needle, Hoard): needle = needle.to_list()
-        if isinstance(haystack, Hoard): haystack = haystack.to_list()
-        nn = len(needle)
-        needle = list(needle)
-        for i in range(len(haystack) - nn + 1):
-            # TODO: Is this the correct way to compare slices? Probably make a
-            # utility function, there are some comparisons elsewhere that seem
-            # problematic.
-            if list(haystack[i:i + nn]) == needle:
-                return i
-        return -1
+        if isinstance(haystack, str):
+            needle_str = pd_chars_as_str(needle)
+            if needle_str is not None:
+                return haystack.find(needle_str)
+        if not list(pd_iterable(needle)):
+            return 0
+        return next(pd_find_all_subseq(haystack, needle), -1)
 
 def pd_find_entry(env: Environment, func: Block, seq: PdSeq) -> Tuple[int, Optional[PdObject]]:
     for i, e in py_enumerate(seq):
@@ -1819,7 +2682,7 @@ def pd_map_iterable(env: Environment, func: Block, it: Iterable[PdObject]) -> Li
         env.pop_yx()
     return acc
 
-def pd_map_fold_into(env: Environment, func: Block, seq: PdSeq,
+def pd_map_fold_into(env: Environment, func: Block, seq: Union[PdSeq, LazySeq],
         f: Callable[[Optional[List[PdObject]]], Optional[T]]) -> T:
     # Couldn't come up with a great name for this. Runs the block on successive
     # elements of the sequence and calls f on the result, and finally call f
@@ -1844,7 +2707,30 @@ def pd_map_fold_into(env: Environment, func: Block, seq: PdSeq,
             raise AssertionError("pd_map_fold_into: function(None) should return non-None")
     return ret
 
-def pd_map(env: Environment, func: Block, seq: PdSeq) -> PdImmutableSeq:
+def all_fold_f(es: Optional[List[PdObject]]) -> Optional[bool]:
+    if es is None:
+        return True
+    else:
+        for e in es:
+            if not e: return False
+        return None
+def any_fold_f(es: Optional[List[PdObject]]) -> Optional[bool]:
+    if es is None:
+        return False
+    else:
+        for e in es:
+            if e: return True
+        return None
+
+# These stop running the block as soon as the answer is known.
+def pd_map_all(env: Environment, func: Block, seq: Union[PdSeq, LazySeq]) -> bool:
+    return pd_map_fold_into(env, func, seq, all_fold_f)
+def pd_map_any(env: Environment, func: Block, seq: Union[PdSeq, LazySeq]) -> bool:
+    return pd_map_fold_into(env, func, seq, any_fold_f)
+
+def pd_map(env: Environment, func: Block, seq: Union[PdSeq, LazySeq]) -> Union[PdImmutableSeq, LazySeq]:
+    if isinstance(seq, LazySeq):
+        return pd_lazy_map(env, func, seq)
     return pd_build_like(seq,
         pd_map_iterable(env, func, pd_iterable(seq)))
 
@@ -1868,6 +2754,8 @@ def pd_map_reverse_singleton(seq: PdSeq) -> List[PdObject]:
             acc.append([e])
         elif isinstance(e, Hoard):
             acc.append(e.to_list()[::-1])
+        elif isinstance(e, LazySeq):
+            raise lazy_unsupported('Reversing')
         else:
             acc.append(e[::-1])
     return acc
@@ -2011,10 +2899,12 @@ def pd_filter_entries(env: Environment, func: Block, seq: PdSeq,
         env.pop_yx()
     return acc
 
-def pd_filter(env: Environment, func: Block, seq: PdSeq, negate: bool = False) -> PdSeq:
+def pd_filter(env: Environment, func: Block, seq: Union[PdSeq, LazySeq], negate: bool = False) -> Union[PdSeq, LazySeq]:
+    if isinstance(seq, LazySeq):
+        return pd_lazy_filter(env, func, seq, negate)
     return pd_build_like(seq,
             [e for (i, e) in pd_filter_entries(env, func, seq, negate)])
-def pd_reject(env: Environment, func: Block, seq: PdSeq) -> PdSeq:
+def pd_reject(env: Environment, func: Block, seq: Union[PdSeq, LazySeq]) -> Union[PdSeq, LazySeq]:
     return pd_filter(env, func, seq, negate = True)
 def pd_filter_and_reject(env: Environment, func: Block, seq: PdSeq) -> Tuple[PdSeq, PdSeq]:
     env.push_yx()
@@ -2039,9 +2929,19 @@ def pd_mask(seq1: PdSeq, seq2: PdSeq, negate: bool = False) -> PdObject:
                 for (e, p) in zip(pd_iterable(seq1), pd_iterable(seq2))
                 if bool(p) ^ negate])
 
-def pd_count(env: Environment, func: Block, seq: PdSeq, negate: bool = False) -> int:
-    return len(pd_filter_entries(env, func, seq, negate))
-def pd_countnot(env: Environment, func: Block, seq: PdSeq) -> int:
+def pd_count(env: Environment, func: Block, seq: Union[PdSeq, LazySeq], negate: bool = False) -> int:
+    # Like len(pd_filter_entries(...)), without keeping the entries.
+    count = 0
+    env.push_yx()
+    try:
+        for i, element in enumerate(pd_iterable(seq)):
+            env.set_yx(i, element)
+            if pd_sandbox_truthy(env, func, [element]) ^ negate:
+                count += 1
+    finally:
+        env.pop_yx()
+    return count
+def pd_countnot(env: Environment, func: Block, seq: Union[PdSeq, LazySeq]) -> int:
     return pd_count(env, func, seq, negate = True)
 
 def pd_countdistinct(env: Environment, func: Block, seq: PdSeq, negate: bool = False) -> int:
@@ -2098,7 +2998,36 @@ def pd_while_then_empty_list(env: Environment, cond: Block, body: Block,
     return []
 # }}}
 # reduce, zip {{{
+FoldStep = Callable[[Any, Any], Any]
+FoldAll = Optional[Callable[[Any], Any]]
+
+def pd_fold_fast_path(func: Block, seq: PdSeq) -> Optional[Tuple[FoldStep, FoldAll, Iterable[Any]]]:
+    """If the block has a fold_op that can fold this nonempty sequence
+    directly, the function combining two elements, the function folding
+    all of them if there's a faster one, and the elements."""
+    op = func.fold_op
+    if op is None or not seq or isinstance(seq, Hoard):
+        return None
+    if isinstance(seq, range):
+        return (op.int_func, op.int_fold, seq)
+    if isinstance(seq, str):
+        return (op.func, None, pd_iterable(seq))
+    types = set(map(type, seq))
+    if types <= {int}:
+        return (op.int_func, op.int_fold, seq)
+    elif types <= {int, float, complex, Char}:
+        return (op.func, None, seq)
+    elif types == {str} and op.str_func is not None:
+        return (op.str_func, op.str_fold, seq)
+    return None
+
 def pd_reduce(env: Environment, func: Block, seq: PdSeq) -> PdObject:
+    fast = pd_fold_fast_path(func, seq)
+    if fast is not None:
+        step, fold, values = fast
+        if fold is not None: return fold(values)
+        return functools.reduce(step, values)
+
     acc: Optional[PdObject] = None
     for element in pd_iterable(seq):
         if acc is None:
@@ -2110,6 +3039,11 @@ def pd_reduce(env: Environment, func: Block, seq: PdSeq) -> PdObject:
     return acc
 
 def pd_scan(env: Environment, func: Block, seq: PdSeq) -> List[PdObject]:
+    fast = pd_fold_fast_path(func, seq)
+    if fast is not None:
+        step, _, values = fast
+        return list(itertools.accumulate(values, step))
+
     acc: Optional[PdObject] = None
     res: List[PdObject] = []
     for element in pd_iterable(seq):
@@ -2211,19 +3145,224 @@ def pd_iterate(env: Environment, func: Block) -> Tuple[List[PdObject], PdObject]
         seen.add(key)
         func(env)
 # }}}
+# graph search {{{
+# Graphs are given implicitly by a block that takes a node and leaves a list
+# of its neighbors (for Dijkstra, a list of [neighbor weight] pairs). The
+# searches themselves run in Python; only expanding a node goes through the
+# interpreter. Nodes are compared by pykey.
+def pd_graph_starts(start: PdValue) -> List[PdObject]:
+    """A node or a list of nodes to start searching from. (So a node that's a
+    list has to be wrapped in another list.)"""
+    if isinstance(start, (str, list, range, ListView, Hoard)):
+        return list(pd_iterable(start))
+    else:
+        return [start]
+
+def pd_graph_neighbors(env: Environment, func: Block, node: PdObject) -> Iterable[PdObject]:
+    stack = pd_sandbox(env, func, [node])
+    if not stack:
+        raise TypeError("Graph neighbor block lacked return value")
+    top = stack[-1]
+    if not isinstance(top, (str, list, range, ListView, Hoard)):
+        raise TypeError("Graph neighbor block must return a list, not " + repr(top))
+    return pd_iterable(top)
+
+def pd_bfs(env: Environment, start: PdValue, func: Block,
+        goal: Optional[Block] = None
+        ) -> Tuple[List[Tuple[PdObject, int]], Dict[PdKey, Tuple[PdObject, Optional[PdObject]]], Optional[int]]:
+    """Breadth-first search. Returns the (node, distance) pairs in the order
+    nodes were expanded, a dict from each node's key reached to the node and
+    its parent (None for the starts), and the distance of the first node
+    satisfying goal, if a goal is given and one was found. The search stops
+    there."""
+    queue: Deque[Tuple[PdObject, int]] = collections.deque()
+    parents: Dict[PdKey, Tuple[PdObject, Optional[PdObject]]] = dict()
+    for node in pd_graph_starts(start):
+        key = pykey(node)
+        if key not in parents:
+            parents[key] = (node, None)
+            queue.append((node, 0))
+    order: List[Tuple[PdObject, int]] = []
+    while queue:
+        node, dist = queue.popleft()
+        order.append((node, dist))
+        if goal is not None and pd_sandbox_truthy(env, goal, [node]):
+            return order, parents, dist
+        for neighbor in pd_graph_neighbors(env, func, node):
+            key = pykey(neighbor)
+            if key not in parents:
+                parents[key] = (neighbor, node)
+                queue.append((neighbor, dist + 1))
+    return order, parents, None
+
+def pd_dfs_order(env: Environment, start: PdValue, func: Block) -> List[PdObject]:
+    """Depth-first search; returns the nodes reached in preorder. Neighbors
+    are visited in the order the block lists them."""
+    stack = pd_graph_starts(start)
+    stack.reverse()
+    seen: Set[PdKey] = set()
+    order: List[PdObject] = []
+    while stack:
+        node = stack.pop()
+        key = pykey(node)
+        if key in seen: continue
+        seen.add(key)
+        order.append(node)
+        stack.extend(reversed(list(pd_graph_neighbors(env, func, node))))
+    return order
+
+def pd_dijkstra(env: Environment, start: PdValue, func: Block,
+        goal: Optional[Block] = None
+        ) -> Tuple[List[Tuple[PdObject, Union[int, float]]], Optional[Union[int, float]]]:
+    """Dijkstra's algorithm. Returns the (node, distance) pairs in the order
+    nodes were finalized and the distance of the first node satisfying goal,
+    as pd_bfs does."""
+    heap: List[Tuple[Union[int, float], int, PdObject]] = []
+    counter = itertools.count()
+    for node in pd_graph_starts(start):
+        heapq.heappush(heap, (0, next(counter), node))
+    done: Set[PdKey] = set()
+    order: List[Tuple[PdObject, Union[int, float]]] = []
+    while heap:
+        dist, _, node = heapq.heappop(heap)
+        key = pykey(node)
+        if key in done: continue
+        done.add(key)
+        order.append((node, dist))
+        if goal is not None and pd_sandbox_truthy(env, goal, [node]):
+            return order, dist
+        for edge in pd_graph_neighbors(env, func, node):
+            if not isinstance(edge, (str, list, range, ListView, Hoard)):
+                raise TypeError("Edge must be a [neighbor weight] pair, not " + repr(edge))
+            neighbor = pd_index(edge, 0)
+            weight = pd_index(edge, 1)
+            if not isinstance(weight, (int, float)):
+                raise TypeError("Edge weight must be a number, not " + repr(weight))
+            if weight < 0:
+                raise ValueError("Dijkstra can't handle negative edge weight " + repr(weight))
+            if pykey(neighbor) not in done:
+                heapq.heappush(heap, (dist + weight, next(counter), neighbor))
+    return order, None
+# }}}
+# lazy sequences {{{
+# Blocks in these only run when the elements are demanded, so each run sets
+# up and tears down its own X/Y variables rather than holding them across
+# yields. PdContinueException skips an element and PdBreakException ends the
+# sequence, as in the eager versions.
+def pd_to_lazy(seq: Union[PdSeq, LazySeq]) -> LazySeq:
+    if isinstance(seq, LazySeq):
+        return seq
+    return LazySeq(pd_iterable(seq))
+
+def pd_lazy_map(env: Environment, func: Block, seq: LazySeq) -> LazySeq:
+    def gen() -> Iterator[PdObject]:
+        for i, element in enumerate(seq):
+            env.push_yx()
+            try:
+                env.set_yx(i, element)
+                res = pd_sandbox(env, func, [element])
+            except PdContinueException: continue
+            except PdBreakException: return
+            finally:
+                env.pop_yx()
+            yield from res
+    return LazySeq(gen())
+
+def pd_lazy_filter(env: Environment, func: Block, seq: LazySeq, negate: bool = False) -> LazySeq:
+    def gen() -> Iterator[PdObject]:
+        for i, element in enumerate(seq):
+            env.push_yx()
+            try:
+                env.set_yx(i, element)
+                keep = pd_sandbox_truthy(env, func, [element]) ^ negate
+            except PdContinueException: continue
+            except PdBreakException: return
+            finally:
+                env.pop_yx()
+            if keep: yield element
+    return LazySeq(gen())
+
+def pd_lazy_iterate(env: Environment, func: Block, start: PdObject) -> LazySeq:
+    """The infinite sequence of start, then the results of running the block
+    on start, then on that, and so on."""
+    def gen() -> Iterator[PdObject]:
+        x = start
+        while True:
+            yield x
+            x = pd_sandbox(env, func, [x])[-1]
+    return LazySeq(gen())
+
+def pd_lazy_zip(a: LazySeq, b: LazySeq) -> LazySeq:
+    return LazySeq([x, y] for x, y in zip(a, b))
+# }}}
 # string conversions {{{
+# How many elements of a sequence to convert at once when they're all ints or
+# all Chars, and roughly how long the pieces written to output are.
+STR_CHUNK = 1 << 12
+# What next() gives for the end of a level's elements.
+_DONE: Any = object()
+
+def pd_str_chunks(obj: PdObject, sep: str = '', hoards: bool = False) -> Iterator[str]:
+    """The pieces of obj as a string, with sep between the elements of each
+    sequence (and Hoard, if hoards). Nested sequences are walked with a stack
+    instead of recursion, and runs of ints or Chars are joined in bulk."""
+    # Each level is an iterator over elements, whether to take them a chunk
+    # at a time, and a cell holding whether the next element is the first of
+    # its sequence, which a chunk that can't be done in bulk shares with the
+    # level it came from.
+    levels: List[Tuple[Iterator[PdObject], bool, List[bool]]] = [(iter((obj,)), False, [True])]
+    while levels:
+        it, bulk, first = levels[-1]
+        if bulk:
+            chunk = list(itertools.islice(it, STR_CHUNK))
+            if not chunk:
+                levels.pop()
+                continue
+            if all(type(e) is int for e in chunk):
+                ints = typing.cast(List[int], chunk)
+                try:
+                    s = sep.join(map(str, ints))
+                except ValueError: # too long for str
+                    s = sep.join(map(int_str, ints))
+            elif all(isinstance(e, Char) for e in chunk):
+                s = sep.join(e.chr for e in chunk) # type: ignore
+            else:
+                levels.append((iter(chunk), False, first))
+                continue
+            if first[0]: first[0] = False
+            elif sep: yield sep
+            yield s
+            continue
+        e = next(it, _DONE)
+        if e is _DONE:
+            levels.pop()
+            continue
+        if first[0]: first[0] = False
+        elif sep: yield sep
+        if isinstance(e, LazySeq): e = e.force()
+        if isinstance(e, (list, range, ListView)):
+            levels.append((iter(e), True, [True]))
+        elif hoards and isinstance(e, Hoard):
+            levels.append((iter(e.to_iterable()), True, [True]))
+        elif isinstance(e, Char):
+            yield e.chr
+        elif isinstance(e, int):
+            yield int_str(e)
+        else: # includes str, float etc.
+            yield str(e)
+
 def basic_pd_str(obj: PdObject) -> str:
-    if isinstance(obj, (list, range)):
-        return ''.join(basic_pd_str(e) for e in obj)
+    if isinstance(obj, (list, range, ListView, LazySeq)):
+        return ''.join(pd_str_chunks(obj))
     elif isinstance(obj, Char):
         return obj.chr
-    else: # includes str, int, float etc.
+    elif isinstance(obj, int):
+        return int_str(obj)
+    else: # includes str, float etc.
         return str(obj)
 
-def pd_repr(obj: PdObject) -> str:
-    if isinstance(obj, (list, range)):
-        return '[' + ' '.join(pd_repr(e) for e in obj) + ']'
-    elif isinstance(obj, Block):
+def pd_repr_scalar(obj: PdObject) -> str:
+    if isinstance(obj, Block):
         return obj.code_repr()
     elif isinstance(obj, Char):
         return "'" + obj.chr
@@ -2232,17 +3371,66 @@ def pd_repr(obj: PdObject) -> str:
             '\\"' if c == '"' else '\\\\' if c == '\\' else c
             for c in obj) + '"'
     elif isinstance(obj, int):
-        return repr(obj)
+        return int_str(obj)
     elif isinstance(obj, float):
         return repr(obj).replace('-', '—')
     elif isinstance(obj, complex):
         return pd_repr(obj.real) + ' ' + pd_repr(obj.imag) + 'j+'
     elif isinstance(obj, Hoard):
         return repr(obj) # TODO
+    raise TypeError('Cannot repr ' + repr(obj))
+
+def pd_repr_chunks(obj: PdObject) -> Iterator[str]:
+    """The pieces of pd_repr(obj), walking nested sequences like
+    pd_str_chunks."""
+    # Like pd_str_chunks, plus what to output after the last element.
+    levels: List[Tuple[Iterator[PdObject], bool, List[bool], str]] = [(iter((obj,)), False, [True], '')]
+    while levels:
+        it, bulk, first, close = levels[-1]
+        if bulk:
+            chunk = list(itertools.islice(it, STR_CHUNK))
+            if not chunk:
+                levels.pop()
+                yield close
+                continue
+            if all(type(e) is int for e in chunk):
+                ints = typing.cast(List[int], chunk)
+                try:
+                    s = ' '.join(map(repr, ints))
+                except ValueError: # too long for repr
+                    s = ' '.join(map(int_str, ints))
+            elif all(isinstance(e, Char) for e in chunk):
+                s = ' '.join("'" + e.chr for e in chunk) # type: ignore
+            else:
+                levels.append((iter(chunk), False, first, ''))
+                continue
+            if first[0]: first[0] = False
+            else: yield ' '
+            yield s
+            continue
+        e = next(it, _DONE)
+        if e is _DONE:
+            levels.pop()
+            yield close
+            continue
+        if first[0]: first[0] = False
+        else: yield ' '
+        if isinstance(e, LazySeq): e = e.force()
+        if isinstance(e, (list, range, ListView)):
+            yield '['
+            levels.append((iter(e), True, [True], ']'))
+        else:
+            yield pd_repr_scalar(e)
+
+def pd_repr(obj: PdObject) -> str:
+    if isinstance(obj, (list, range, ListView, LazySeq)):
+        return ''.join(pd_repr_chunks(obj))
+    else:
+        return pd_repr_scalar(obj)
 # }}}
 # other conversions {{{
-def pd_to_char(val: PdValue) -> Char:
-    if isinstance(val, (list, range)):
+def pd_to_char(val: PdObject) -> Char:
+    if isinstance(val, (list, range, ListView)):
         if not val:
             raise ValueError('converting empty list/range to char')
         else:
@@ -2258,8 +3446,8 @@ def pd_to_char(val: PdValue) -> Char:
         assert isinstance(val, (int, float)) # https://github.com/python/mypy/issues/3196
         return Char(int(val))
 
-def pd_to_float(val: PdValue) -> float:
-    if isinstance(val, (list, range)):
+def pd_to_float(val: PdObject) -> float:
+    if isinstance(val, (list, range, ListView)):
         if not val:
             raise ValueError('converting empty list/range to float')
         else:
@@ -2275,8 +3463,8 @@ def pd_to_float(val: PdValue) -> float:
         assert isinstance(val, (int, float, complex)) # https://github.com/python/mypy/issues/3196
         return float(val.real)
 
-def pd_to_int(val: PdValue) -> int:
-    if isinstance(val, (list, range)):
+def pd_to_int(val: PdObject) -> int:
+    if isinstance(val, (list, range, ListView)):
         if not val:
             raise ValueError('converting empty list/range to int')
         else:
@@ -2285,7 +3473,7 @@ def pd_to_int(val: PdValue) -> int:
         if not val:
             raise ValueError('converting empty string to int')
         else:
-            return int(val)
+            return str_to_int(val)
     elif isinstance(val, Char):
         return val.ord
     else:
@@ -2412,61 +3600,247 @@ class CompositionBlock(Block):
         return 'CompositionBlock({})'.format(', '.join(repr(block) for block in self.blocks))
 
 # key/array operations {{{
-def new_array_of_dims(dims: List[int], filler: PdValue) -> list:
-    if len(dims) == 1:
-        return [filler] * dims[0]
+# Arrays here are nested ListViews of PersistentVectors, so that Key_map
+# can update a few elements at a time without copying the whole array.
+def new_array_of_dims(dims: List[int], filler: PdValue) -> PdValue:
+    arr: PdValue = filler
+    for dim in reversed(dims):
+        # Every row starts out as the same row; they're never mutated.
+        arr = ListView(PersistentVector.repeat(arr, dim), range(dim))
+    return arr
+
+# If NumPy is installed, arrays of 64-bit ints or of floats are ndarrays
+# instead, so Key_new and Key_map can read and write all their keys with one
+# fancy index each. Anything that would change the element type falls back
+# to persistent vectors.
+def numpy_or_none() -> Any:
+    # lazy import in case you don't have numpy
+    try:
+        import numpy
+        return numpy
+    except ModuleNotFoundError:
+        return None
+
+def numpy_dtype_of(values: Sequence[PdObject]) -> Optional[str]:
+    if all(type(v) is int and -2**63 <= v < 2**63 for v in values): # type: ignore
+        return 'int64'
+    elif all(type(v) is float for v in values):
+        return 'float64'
     else:
-        return [new_array_of_dims(dims[1:], filler) for _ in range(dims[0])]
+        return None
 
-def pd_new_array(kvs: Union[list, range, Hoard], dims: Union[list, range, Hoard], filler: PdValue) -> list:
-    arr = new_array_of_dims(list(pd_flatten_to_int_generator(dims)),
-            filler)
-    # TODO: do it lazily so we can loop last value
+def numpy_index(keys: List[List[int]]) -> Tuple[List[int], ...]:
+    return tuple(list(axis) for axis in zip(*keys))
+
+class NumericArray:
+    """An ndarray as the base of a ListView. Indexing it gives Python numbers
+    or ListViews of its subarrays, never NumPy objects."""
+    __slots__ = ('array',)
+
+    def __init__(self, array: Any) -> None:
+        self.array = array
+
+    @staticmethod
+    def view(array: Any) -> ListView:
+        return ListView(NumericArray(array), range(len(array)))
+
+    @staticmethod
+    def whole(arr: PdObject) -> Optional[Any]:
+        """The ndarray arr is a view of all of, if any."""
+        if (isinstance(arr, ListView) and isinstance(arr.base, NumericArray)
+                and arr.indices == range(len(arr.base))):
+            return arr.base.array
+        return None
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, i: int) -> PdObject:
+        if self.array.ndim == 1:
+            return self.array[i].item()
+        else:
+            return NumericArray.view(self.array[i])
+
+    def iter_slice(self, start: int, stop: int) -> Iterator[PdObject]:
+        if self.array.ndim == 1:
+            return iter(self.array[start:stop].tolist())
+        else:
+            return (NumericArray.view(sub) for sub in self.array[start:stop])
+
+def pd_array_key_assoc(arr: PdValue, key: List[int], func: Callable[[PdObject], PdObject]) -> PdValue:
+    if not isinstance(arr, (str, list, range, ListView, Hoard)):
+        raise TypeError('could not index {} into {}: not indexable'.format(
+            key, repr(arr)))
+    i = key[0]
+    old = pd_index(arr, i)
+    if len(key) == 1:
+        return pd_assoc(arr, i, func(old))
+    else:
+        return pd_assoc(arr, i, pd_array_key_assoc(old, key[1:], func)) # type: ignore
+
+def pd_array_key_list(key: PdObject) -> List[int]:
+    if isinstance(key, (str, list, range, ListView, Hoard)):
+        return [num.intify(i) for i in pd_iterable(key)] # type: ignore
+    else:
+        return [num.intify(key)] # type: ignore
+
+def pd_new_array(kvs: Union[list, range, ListView, Hoard], dims: Union[list, range, ListView, Hoard], filler: PdValue) -> PdValue:
+    dim_list = list(pd_flatten_to_int_generator(dims))
+    items: List[Tuple[List[int], PdObject]] = []
     for item in pd_iterable(kvs):
         try:
             key, value = item # type: ignore
-            target = arr
-            for i in key[:-1]: target = target[i] # type: ignore
-            target[key[-1]] = value # type: ignore
         except ValueError as e:
             raise ValueError("Element in array construction argument not usable length-2 key-value list") from e
+        items.append((pd_array_key_list(key), value))
+
+    numpy = numpy_or_none()
+    if numpy is not None and dim_list and all(len(key) == len(dim_list) for key, _ in items):
+        dtype = numpy_dtype_of([filler] + [value for _, value in items])
+        if dtype is not None:
+            array = numpy.full(dim_list, filler, dtype=dtype)
+            # later pairs win, which a fancy index doesn't promise
+            for key, value in items:
+                array[tuple(key)] = value
+            return NumericArray.view(array)
+
+    # TODO: do it lazily so we can loop last value
+    arr = new_array_of_dims(dim_list, filler)
+    for key, value in items:
+        arr = pd_array_key_assoc(arr, key, lambda _: value)
     return arr
 
-# def pd_sandbox(env: Environment, func: Block, lst: List[PdObject]) -> List[PdObject]:
 def pd_array_keys_map(env: Environment, arr: PdValue, ks: PdSeq, func: Block) -> PdValue:
-    arr_new = pd_deep_copy_to_list(arr)
-    for key in pd_iterable(ks):
+    keys = [pd_array_key_list(key) for key in pd_iterable(ks)]
+    array = NumericArray.whole(arr)
+    if (array is not None and keys and all(len(key) == array.ndim for key in keys)
+            and len(set(tuple(key) for key in keys)) == len(keys)):
+        index = numpy_index(keys)
         try:
-            target: PdObject = arr_new
-            if isinstance(key, (str, list, range, Hoard)):
-                for i in pd_iterable(pd_butlast(key)):
-                    if isinstance(target, (str, list, range)):
-                        target = pd_index(target, i) # type: ignore
-                    else:
-                        raise TypeError(
-                            'could not index {} into {}: {} not indexable'.format(
-                            repr(key), repr(arr_new), i, repr(target)))
-                key_last = pd_last(key)
-            else:
-                key_last = key
-            if isinstance(target, list):
-                target[key_last] = pd_sandbox(env, func, [target[key[-1]]])[-1] # type: ignore
-
-            else:
-                raise TypeError(
-                    'could not assign into index {} of {}: {} not list'.format(
-                    repr(key), repr(arr_new), repr(target)))
+            olds = array[index].tolist()
         except IndexError as e:
-            raise IndexError('could not index {} into {}: IndexError'.format(key, arr_new)) from e
-    return arr_new
+            raise IndexError('could not index {} into {}: IndexError'.format(ks, arr)) from e
+        news = [pd_sandbox(env, func, [old])[-1] for old in olds]
+        if numpy_dtype_of(news) == array.dtype.name:
+            array = array.copy()
+            array[index] = news
+            return NumericArray.view(array)
+        # Some result doesn't fit; store them all the slow way.
+        for key, new in zip(keys, news):
+            arr = pd_array_key_assoc(arr, key, lambda _: new)
+        return arr
+
+    for key in keys:
+        try:
+            arr = pd_array_key_assoc(arr, key,
+                    lambda old: pd_sandbox(env, func, [old])[-1])
+        except IndexError as e:
+            raise IndexError('could not index {} into {}: IndexError'.format(key, arr)) from e
+    return arr
 
 def pd_array_key_get(arr: PdSeq, k: PdSeq) -> PdObject:
+    array = NumericArray.whole(arr)
+    if array is not None and len(k) == array.ndim:
+        return array[tuple(pd_array_key_list(k))].item()
     target = arr
     for sk in pd_iterable(k):
         # pretty unsafe but eh
         target = pd_index(target, sk) # type: ignore
     return target
 # }}}
+# Grid, for 2D puzzle input {{{
+class Grid:
+    """A rectangular grid, stored row-major in one flat list of cells, as the
+    base of a ListView of its rows (or, transposed, its columns). Rows and
+    columns are ListViews of the cells, so none of them are copied. Cells
+    are also addressed by their flat index in the cells, which is what the
+    neighbor queries return."""
+    __slots__ = ('cells', 'height', 'width', 'transposed')
+
+    def __init__(self, cells: List[PdObject], height: int, width: int, transposed: bool = False) -> None:
+        self.cells = cells
+        self.height = height
+        self.width = width
+        self.transposed = transposed
+
+    @staticmethod
+    def of(rows: PdObject) -> 'Grid':
+        if (isinstance(rows, ListView) and isinstance(rows.base, Grid)
+                and rows.indices == range(len(rows.base))):
+            return rows.base
+        if not isinstance(rows, (list, range, ListView, Hoard)):
+            raise TypeError('cannot make grid of ' + repr(rows))
+        cells: List[PdObject] = []
+        width = None
+        height = 0
+        for row in pd_iterable(rows):
+            if not isinstance(row, (str, list, range, ListView, Hoard)):
+                raise TypeError('grid row is not a sequence: ' + repr(row))
+            cells.extend(pd_iterable(row))
+            height += 1
+            if width is None:
+                width = len(cells)
+            elif len(cells) != width * height:
+                raise ValueError('grid rows have different lengths')
+        return Grid(cells, height, width or 0)
+
+    def view(self) -> ListView:
+        return ListView(self, range(len(self)))
+
+    def transpose(self) -> 'Grid':
+        return Grid(self.cells, self.height, self.width, not self.transposed)
+
+    def __len__(self) -> int:
+        return self.width if self.transposed else self.height
+
+    def __getitem__(self, i: int) -> ListView:
+        n = len(self)
+        j = i + n if i < 0 else i
+        if not 0 <= j < n:
+            raise IndexError('grid {} index {} out of range'.format(
+                'column' if self.transposed else 'row', i))
+        i = j
+        if self.transposed:
+            return ListView(self.cells, range(i, self.height * self.width, self.width))
+        else:
+            return ListView(self.cells, range(i * self.width, (i + 1) * self.width))
+
+    def iter_slice(self, start: int, stop: int) -> Iterator[ListView]:
+        return (self[i] for i in range(start, stop))
+
+    def flat_index(self, coord: PdObject) -> int:
+        """The flat index of a flat index or [row column] pair (in this
+        grid's orientation), which must be in the grid."""
+        if isinstance(coord, (Char, int, float)):
+            i = num.intify(coord)
+            if 0 <= i < len(self.cells):
+                return i
+        else:
+            r, c = pd_array_key_list(coord)
+            if self.transposed: r, c = c, r
+            if 0 <= r < self.height and 0 <= c < self.width:
+                return r * self.width + c
+        raise IndexError('grid coordinates {} out of range'.format(repr(coord)))
+
+    def coordinates(self, i: int) -> List[PdObject]:
+        r, c = divmod(self.flat_index(i), self.width)
+        return [c, r] if self.transposed else [r, c]
+
+    def neighbors(self, coord: PdObject, offsets: List[Tuple[int, int]]) -> List[PdObject]:
+        r, c = divmod(self.flat_index(coord), self.width)
+        return [(r + dr) * self.width + c + dc for dr, dc in offsets
+                if 0 <= r + dr < self.height and 0 <= c + dc < self.width]
+
+ORTHOGONAL_OFFSETS = [(-1, 0), (0, -1), (0, 1), (1, 0)]
+KING_OFFSETS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+
+def pd_grid_find(env: Environment, grid: Grid, target: PdObject) -> List[PdObject]:
+    if isinstance(target, Block):
+        return [i for i, cell in enumerate(grid.cells) if pd_sandbox_truthy(env, target, [cell])]
+    else:
+        return [i for i, cell in enumerate(grid.cells) if cell == target]
+
+# }}}
 # regex {{{
 def match_to_pd(m: Optional[Match]) -> PdObject:
     if m is None:
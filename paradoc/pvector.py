@@ -0,0 +1,103 @@
+# coding: utf-8
+# vim:set ts=4 sw=4 et:
+# A persistent vector: an immutable sequence where replacing an element gives
+# a new vector sharing all but O(log n) of its structure with the old one.
+# It's a radix trie of BRANCH-way nodes, like Clojure's vectors (without the
+# tail optimization, since we never append to one).
+import itertools
+from typing import Any, Iterable, Iterator, List
+
+BITS = 5
+BRANCH = 1 << BITS
+MASK = BRANCH - 1
+
+def chunks(xs: List[Any]) -> List[List[Any]]:
+    return [xs[i:i + BRANCH] for i in range(0, len(xs), BRANCH)]
+
+class PersistentVector:
+    """Elements live in leaves of up to BRANCH elements; the element at index
+    i is found by taking BITS bits of i at a time, most significant first, as
+    the child to descend into. shift is how far to shift i for the root."""
+    __slots__ = ('root', 'length', 'shift')
+
+    def __init__(self, root: List[Any], length: int, shift: int) -> None:
+        self.root = root
+        self.length = length
+        self.shift = shift
+
+    @classmethod
+    def from_leaves(cls, nodes: List[List[Any]], length: int) -> 'PersistentVector':
+        shift = 0
+        while len(nodes) > 1:
+            nodes = chunks(nodes)
+            shift += BITS
+        return cls(nodes[0] if nodes else [], length, shift)
+
+    @classmethod
+    def from_iterable(cls, it: Iterable[Any]) -> 'PersistentVector':
+        xs = list(it)
+        return cls.from_leaves(chunks(xs), len(xs))
+
+    @classmethod
+    def repeat(cls, value: Any, length: int) -> 'PersistentVector':
+        """A vector of one value repeated, whose full leaves are all the same
+        node, so it takes about a BRANCHth of the time and space."""
+        full, rest = divmod(length, BRANCH)
+        leaves = [[value] * BRANCH] * full
+        if rest: leaves.append([value] * rest)
+        return cls.from_leaves(leaves, length)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def normalize(self, i: int) -> int:
+        if i < 0: i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError('persistent vector index out of range')
+        return i
+
+    def leaf(self, i: int) -> List[Any]:
+        node = self.root
+        level = self.shift
+        while level > 0:
+            node = node[(i >> level) & MASK]
+            level -= BITS
+        return node
+
+    def __getitem__(self, i: int) -> Any:
+        i = self.normalize(i)
+        return self.leaf(i)[i & MASK]
+
+    def set(self, i: int, value: Any) -> 'PersistentVector':
+        """A new vector with the element at i replaced, copying only the
+        nodes on the path to it."""
+        i = self.normalize(i)
+        root = list(self.root)
+        node = root
+        level = self.shift
+        while level > 0:
+            j = (i >> level) & MASK
+            child = list(node[j])
+            node[j] = child
+            node = child
+            level -= BITS
+        node[i & MASK] = value
+        return PersistentVector(root, self.length, self.shift)
+
+    def iter_slice(self, start: int, stop: int) -> Iterator[Any]:
+        """Iterate over the elements from start to stop, one leaf at a
+        time."""
+        i = start
+        while i < stop:
+            lo = i & MASK
+            hi = min(BRANCH, lo + stop - i)
+            yield from itertools.islice(self.leaf(i), lo, hi)
+            i += hi - lo
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.iter_slice(0, self.length)
+
+    def __repr__(self) -> str:
+        return 'PersistentVector({})'.format(list(self))
+
+# vim:set tabstop=4 shiftwidth=4 expandtab fdm=marker:
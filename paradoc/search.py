@@ -0,0 +1,133 @@
+# coding: utf-8
+# vim:set ts=4 sw=4 et:
+# Pure sequence search utilities: finding every occurrence of a needle
+# sequence in a haystack sequence (or any iterable) in linear time, with
+# Knuth-Morris-Pratt, and of any of several needles at once, with
+# Aho-Corasick. KMP only ever compares elements with ==, so they don't need
+# to be hashable; Aho-Corasick needs hashable elements.
+import collections
+import functools
+from typing import Any, Dict, Generator, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+def kmp_failure(needle: Sequence[Any]) -> List[int]:
+    """fail[i] is the length of the longest proper prefix of needle[:i+1]
+    that's also a suffix of it."""
+    fail = [0] * len(needle)
+    k = 0
+    for i in range(1, len(needle)):
+        while k and needle[i] != needle[k]:
+            k = fail[k - 1]
+        if needle[i] == needle[k]:
+            k += 1
+        fail[i] = k
+    return fail
+
+def kmp_find_all(needle: Sequence[Any], haystack: Iterable[Any],
+        overlapping: bool = False) -> Generator[int, None, None]:
+    """Generate the starting index of each occurrence of a nonempty needle in
+    haystack, left to right. Unless overlapping, each occurrence starts
+    after the previous one ends, like str.count and str.split."""
+    m = len(needle)
+    if not m:
+        raise ValueError("empty needle")
+    fail = kmp_failure(needle)
+    k = 0
+    for i, x in enumerate(haystack):
+        while k and x != needle[k]:
+            k = fail[k - 1]
+        if x == needle[k]:
+            k += 1
+            if k == m:
+                yield i - m + 1
+                k = fail[k - 1] if overlapping else 0
+
+class AhoCorasick:
+    """An automaton finding occurrences of any of several nonempty needles in
+    one pass over a haystack. Matches are reported as (start, needle index)
+    pairs."""
+    def __init__(self, needles: Sequence[Sequence[Hashable]]) -> None:
+        self.lengths = [len(needle) for needle in needles]
+        if not all(self.lengths):
+            raise ValueError("empty needle")
+        # A trie of the needles; out[s] lists the needles ending at state s,
+        # including (after the failure links are built) those that are
+        # suffixes of its own.
+        goto: List[Dict[Hashable, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for i, needle in enumerate(needles):
+            s = 0
+            for x in needle:
+                t = goto[s].get(x)
+                if t is None:
+                    t = len(goto)
+                    goto[s][x] = t
+                    goto.append({})
+                    out.append([])
+                s = t
+            out[s].append(i)
+
+        fail = [0] * len(goto)
+        queue = collections.deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for x, t in goto[s].items():
+                queue.append(t)
+                f = fail[s]
+                while f and x not in goto[f]:
+                    f = fail[f]
+                fail[t] = goto[f].get(x, 0)
+                out[t].extend(out[fail[t]])
+
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+
+    def find_all(self, haystack: Iterable[Hashable]) -> Generator[Tuple[int, int], None, None]:
+        """Generate every match, including overlapping ones, in order of
+        where they end."""
+        goto, fail, out, lengths = self.goto, self.fail, self.out, self.lengths
+        s = 0
+        for i, x in enumerate(haystack):
+            while s and x not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(x, 0)
+            for n in out[s]:
+                yield (i - lengths[n] + 1, n)
+
+    def find_first(self, haystack: Iterable[Hashable]) -> Optional[Tuple[int, int]]:
+        """The match starting earliest (breaking ties by needle index), or
+        None. Stops reading the haystack once no later match could start
+        earlier."""
+        longest = max(self.lengths, default=0)
+        goto, fail, out, lengths = self.goto, self.fail, self.out, self.lengths
+        best: Optional[Tuple[int, int]] = None
+        s = 0
+        for i, x in enumerate(haystack):
+            if best is not None and i - longest >= best[0]:
+                break
+            while s and x not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(x, 0)
+            for n in out[s]:
+                match = (i - lengths[n] + 1, n)
+                if best is None or match < best:
+                    best = match
+        return best
+
+    def count(self, haystack: Iterable[Hashable]) -> List[int]:
+        """For each needle, the number of non-overlapping occurrences, like
+        str.count."""
+        counts = [0] * len(self.lengths)
+        free = [0] * len(self.lengths)
+        for start, n in self.find_all(haystack):
+            if start >= free[n]:
+                counts[n] += 1
+                free[n] = start + self.lengths[n]
+        return counts
+
+@functools.lru_cache(maxsize=64)
+def aho_corasick(needles: Tuple[Sequence[Hashable], ...]) -> AhoCorasick:
+    """Build an automaton, reusing a recent one for the same needles."""
+    return AhoCorasick(needles)
+
+# vim:set tabstop=4 shiftwidth=4 expandtab fdm=marker:
@@ -3,9 +3,10 @@ import traceback
 import sys
 import random
 from paradoc.num import Char
-from paradoc.objects import Block, BuiltIn, Environment, Hoard, PdBreakException, PdContinueException, PdImmutableSeq, PdObject
+from paradoc.objects import Block, BuiltIn, Environment, Hoard, LazySeq, ListView, PdBreakException, PdContinueException, PdImmutableSeq, PdObject
 import paradoc.num as num
 import paradoc.base as base
+import paradoc.discrete as discrete
 import paradoc.objects as objects
 from paradoc.trailer import TrailerFunc, Trailer
 from paradoc.builtins.acutegrave import ag_convert, ag_document
@@ -34,9 +35,21 @@ def apply_pd_list_op(
         coerce_start: int = 0,
         ) -> None:
 
-    lst = objects.pd_to_immutable_seq_range(env.pop(), coerce_start)
+    obj = env.pop()
+    if isinstance(obj, LazySeq):
+        # Ops that make sense on infinite sequences, like map, filter and
+        # get, know how to consume one lazily.
+        env.push(op(env, b, obj)) # type: ignore
+        return
+    lst = objects.pd_to_immutable_seq_range(obj, coerce_start)
     env.push(op(env, b, lst))
 
+def pop_list_range_or_lazy(env: Environment) -> Union[list, range, ListView, LazySeq]:
+    obj = env.pop()
+    if isinstance(obj, LazySeq):
+        return obj
+    return objects.pd_to_list_range(obj) # not immutable_seq, as '\0' is truthy
+
 T = TypeVar('T')
 
 TrailerPutter = Callable[[TrailerFunc[T]], Trailer[T]]
@@ -390,34 +403,35 @@ def build_block_trailer_dict() -> Dict[str, Trailer[Block]]: # {{{
 
     @put("all", "â",
             docs="""Apply this block to each element of a list (coerces numbers
-            to ranges); push whether at least one result is truthy.""",
+            to ranges); push whether all results are truthy. Stops at the
+            first falsy result.""",
             stability="alpha")
     def all_trailer(outer_env: Environment, b: Block) -> Tuple[Block, bool]:
         def all_b(env: Environment) -> None:
-            lst = objects.pd_to_list_range(env.pop()) # not immutable_seq, as '\0' is truthy
-            env.push(int(all(
-                objects.pd_map(env, b, lst))))
+            lst = pop_list_range_or_lazy(env)
+            env.push(int(objects.pd_map_all(env, b, lst)))
         return (BuiltIn(b.code_repr() + "_all", all_b), False)
 
     @put("exists", "any", "ê",
             docs="""Apply this block to each element of a list (coerces numbers
-            to ranges); push whether at least one result is truthy.""",
+            to ranges); push whether at least one result is truthy. Stops
+            at the first truthy result.""",
             stability="alpha")
     def exists_trailer(outer_env: Environment, b: Block) -> Tuple[Block, bool]:
         def exists_b(env: Environment) -> None:
-            lst = objects.pd_to_list_range(env.pop()) # not immutable_seq, as '\0' is truthy
-            env.push(int(any(
-                objects.pd_map(env, b, lst))))
+            lst = pop_list_range_or_lazy(env)
+            env.push(int(objects.pd_map_any(env, b, lst)))
         return (BuiltIn(b.code_repr() + "_exists", exists_b), False)
 
     @put("none", "ô",
             docs="""Apply this block to each element of a list (coerces numbers
-            to ranges); push whether all results are falsy.""",
+            to ranges); push whether all results are falsy. Stops at the
+            first truthy result.""",
             stability="alpha")
     def none_trailer(outer_env: Environment, b: Block) -> Tuple[Block, bool]:
         def none_b(env: Environment) -> None:
-            lst = objects.pd_to_list_range(env.pop()) # not immutable_seq, as '\0' is truthy
-            env.push(int(not any(objects.pd_map(env, b, lst))))
+            lst = pop_list_range_or_lazy(env)
+            env.push(int(not objects.pd_map_any(env, b, lst)))
         return (BuiltIn(b.code_repr() + "_none", none_b), False)
 
     @put("autozip", "az", "ä",
@@ -586,7 +600,7 @@ def build_string_trailer_dict() -> Dict[str, Trailer[str]]: # {{{
             stability="alpha")
     def interoutput_trailer(outer_env: Environment, s: str) -> Tuple[PdObject, bool]:
         def interoutput_s(env: Environment) -> None:
-            print(simple_interpolate(env, s, '%'), end="")
+            env.write_output(simple_interpolate(env, s, '%'))
         return (BuiltIn(objects.pd_repr(s) + "_interoutput", interoutput_s), False)
 
     @put("interprint", "p",
@@ -779,7 +793,7 @@ def build_int_trailer_dict() -> Dict[str, Trailer[int]]: # {{{
             if isinstance(v, Block):
                 raise TypeError('Cannot take root of block')
             else:
-                env.push(objects.pd_deepmap_n2v(lambda e: e ** (1/i), v))
+                env.push(objects.pd_deepmap_n2v(lambda e: discrete.root(e, i), v))
         return (BuiltIn(str(i) + "_root", root_i), False)
 
     @put("get", "g",
@@ -788,7 +802,7 @@ def build_int_trailer_dict() -> Dict[str, Trailer[int]]: # {{{
     def get_trailer(outer_env: Environment, i: int) -> Tuple[Block, bool]:
         def get_i(env: Environment) -> None:
             e = env.pop()
-            assert isinstance(e, (str, list, range))
+            assert isinstance(e, (str, list, range, ListView))
             env.push(objects.pd_index(e, i))
         return (BuiltIn(str(i) + "_get", get_i), False)
 
@@ -798,7 +812,7 @@ def build_int_trailer_dict() -> Dict[str, Trailer[int]]: # {{{
     def last_trailer(outer_env: Environment, i: int) -> Tuple[Block, bool]:
         def last_i(env: Environment) -> None:
             e = env.pop()
-            assert isinstance(e, (str, list, range))
+            assert isinstance(e, (str, list, range, ListView))
             env.push(objects.pd_index(e, -1-i))
         return (BuiltIn(str(i) + "_last", last_i), False)
 
@@ -845,7 +859,7 @@ def build_int_trailer_dict() -> Dict[str, Trailer[int]]: # {{{
             e = env.pop()
             if isinstance(e, (Char, int, float)):
                 env.push(num.pd_mul_div_const(e, i, 4))
-            elif isinstance(e, (str, list, range)):
+            elif isinstance(e, (str, list, range, ListView)):
                 env.push(e[:len(e)*i//4])
             elif isinstance(e, Hoard):
                 env.push(e.to_list()[:len(e)*i//4])
@@ -1022,10 +1036,7 @@ def build_hoard_trailer_dict() -> Dict[str, Trailer[Hoard]]: # {{{
             if isinstance(key, Block):
                 raise TypeError("Cannot modify hoard with block as key")
             if isinstance(modifier, (Char, int, float)):
-                old = h.get(key, 0)
-                if not isinstance(old, (Char, int, float)):
-                    raise TypeError("Cannot modify non-number by number")
-                h.update(key, num.pd_add(old, modifier))
+                h.increment(key, modifier)
             elif isinstance(modifier, Block):
                 old = h.get(key, 0)
                 sandboxed_result = objects.pd_sandbox(env, modifier, [old])
@@ -1078,7 +1089,7 @@ def build_hoard_trailer_dict() -> Dict[str, Trailer[Hoard]]: # {{{
             key = env.pop()
             if isinstance(key, Block):
                 raise TypeError("Cannot update hoard with block as key")
-            h.update(key, 1)
+            h.updateone(key)
         return (BuiltIn(objects.pd_repr(h) + "_updateone", updateone_b), False)
 
     @put("getzero", "z", docs="Get value at a key with 0 as default is the key is not found", stability="unstable")
@@ -1104,6 +1115,44 @@ def build_hoard_trailer_dict() -> Dict[str, Trailer[Hoard]]: # {{{
     def keys_trailer(outer_env: Environment, h: Hoard) -> Tuple[Union[range, list], bool]:
         return (h.key_list(), False)
 
+    @put("union", "v",
+            docs="""Add every key of a sequence or hoard, in place, with value
+            1 if it wasn't present. On a counter hoard, take the maximum of
+            counts.""",
+            stability="unstable")
+    def union_trailer(outer_env: Environment, h: Hoard) -> Tuple[Block, bool]:
+        def union_b(env: Environment) -> None:
+            other = env.pop()
+            if isinstance(other, Block):
+                raise TypeError("Cannot union hoard with block")
+            h.union_update(other)
+        return (BuiltIn(objects.pd_repr(h) + "_union", union_b), False)
+
+    @put("intersect", "n",
+            docs="""Delete every key not in a sequence or hoard, in place. On
+            a counter hoard, take the minimum of counts.""",
+            stability="unstable")
+    def intersect_trailer(outer_env: Environment, h: Hoard) -> Tuple[Block, bool]:
+        def intersect_b(env: Environment) -> None:
+            other = env.pop()
+            if isinstance(other, Block):
+                raise TypeError("Cannot intersect hoard with block")
+            h.intersection_update(other)
+        return (BuiltIn(objects.pd_repr(h) + "_intersect", intersect_b), False)
+
+    @put("difference", "e",
+            docs="""Delete every key in a sequence or hoard, in place. On a
+            counter hoard, subtract counts, dropping keys that aren't left
+            positive.""",
+            stability="unstable")
+    def difference_trailer(outer_env: Environment, h: Hoard) -> Tuple[Block, bool]:
+        def difference_b(env: Environment) -> None:
+            other = env.pop()
+            if isinstance(other, Block):
+                raise TypeError("Cannot take difference of hoard with block")
+            h.difference_update(other)
+        return (BuiltIn(objects.pd_repr(h) + "_difference", difference_b), False)
+
     return ret
 hoard_trailer_dict = build_hoard_trailer_dict()
 # }}}
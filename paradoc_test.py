@@ -1,8 +1,14 @@
 # coding: utf-8
-from paradoc import lex_code, pd_simple_eval, autogolf
+from paradoc import lex_code, pd_simple_eval, autogolf, initialized_environment, OutputSink, CaptureSink, InputSource
 from paradoc.num import Char
+from paradoc.objects import pd_repr, basic_pd_str
+import paradoc.base as base
+from paradoc import input_triggers
+import io
 import unittest
 import math
+import os
+import tempfile
 
 class TestParadoc(unittest.TestCase):
 
@@ -231,6 +237,22 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('[[4 5][6 7]][[6 7][5 4]]&'), [[[6,7]]])
         self.assertEqual(pd_simple_eval('[[4 5][6 7]][[5 4][6 7]]|'), [[[4,5],[6,7],[5,4]]])
 
+    def test_list_views(self):
+        self.assertEqual(pd_simple_eval('[1 2 3 4](;(;[3 4]='), [1])
+        self.assertEqual(pd_simple_eval('[1 2 3 4 5]3Window{Š}%'), [[6,9,12]])
+        self.assertEqual(pd_simple_eval('[1 2 1 2 1]2Window Uniquify'), [[[1,2],[2,1]]])
+        self.assertEqual(pd_simple_eval('[1 2 1 2 1]2Window [1 2] #'), [2])
+        self.assertEqual(pd_simple_eval('[1 2 3](;[4]+ [5 6 7]Uncons;Reverse'), [[2,3,4],[7,6]])
+
+    def test_key_arrays(self):
+        self.assertEqual(pd_simple_eval('[[[0 1] 5] [[2 2] 7]] [3 3] 0 Key_new'), [[[0,5,0],[0,0,0],[0,0,7]]])
+        self.assertEqual(pd_simple_eval('[[0 0][0 0]] [[0 1] [1 0] [0 1]] {)} Key_map'), [[[0,2],[1,0]]])
+        self.assertEqual(pd_simple_eval('[] [3 3] 0 Key_new [[1 1]]{7+}Key_map :1=\\ :0=\\ [1 1]Kg'), [[0,7,0],[0,0,0],7])
+        self.assertEqual(pd_simple_eval('[] 4 0 Key_new {9+}Modify_first {8+}Modify_last [3 1]{5+}Key_map'), [[9,5,0,13]])
+        self.assertEqual(pd_simple_eval('[] 4 0 Key_new 1{9+}Key_map [2 3 4]0{)}Km'), [[0,9,0,0],[3,3,4]])
+        self.assertEqual(pd_simple_eval('[[[0 1] 5]] [2 2] 0 Key_new [[0 1] [1 1]] {1.5*} Key_map'), [[[0,7.5],[0,0.0]]])
+        self.assertEqual(pd_simple_eval('[] [3 3] 0.5 Key_new [[1 1] [2 0]]{2*}Key_map [1 1]Kg'), [1.0])
+
     def test_indexing(self):
         self.assertEqual(pd_simple_eval('[3 7 2 5]0=q;1=q;3=q;1m='), [3,7,5,5])
         self.assertEqual(pd_simple_eval('[3 7 2 5]8=cq;6m=cq;13=c'), [3,2,7])
@@ -292,6 +314,40 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('[1 2]+n'), [[[0,2],[2,2],[1,1],[1,3]]])
         self.assertEqual(pd_simple_eval('[1 2]*n'), [[[0,1],[0,2],[0,3],[1,1],[1,3],[2,1],[2,2],[2,3]]])
 
+    def test_lazy(self):
+        self.assertEqual(pd_simple_eval('1 Naturals_from ²m 5 Take'), [[1,4,9,16,25]])
+        self.assertEqual(pd_simple_eval('1 Naturals_from {3%}j 4 Lazy_get'), [15])
+        self.assertEqual(pd_simple_eval('1 {2*} Unfold 6 Take'), [[1,2,4,8,16,32]])
+        self.assertEqual(pd_simple_eval('1 Naturals_from {100>}g'), [101])
+        self.assertEqual(pd_simple_eval('1 Naturals_from {50>}ê'), [1])
+        self.assertEqual(pd_simple_eval('0 Naturals_from "abc" Lazy_zip Force'), [[[0,Char('a')],[1,Char('b')],[2,Char('c')]]])
+        self.assertEqual(pd_simple_eval('3 Lazy ²m Force'), [[0,1,4]])
+        for code in ['3 Lazy ~', '3 Lazy {)}ž', '3 Lazy L', '3 Lazy 1+']:
+            with self.assertRaisesRegex(Exception, 'Force'):
+                pd_simple_eval(code)
+
+    def test_graph_search(self):
+        self.assertEqual(pd_simple_eval('1 {[:)\\2*]{20<}+} Bfs_distances 17='), [5])
+        self.assertEqual(pd_simple_eval('1 {[:)\\2*]{20<}+} Bfs_parents 17='), [16])
+        self.assertEqual(pd_simple_eval('0 {[:)\\2*]{10<}+} Bfs_reachable'), [[0,1,2,3,4,6,5,8,7,9]])
+        self.assertEqual(pd_simple_eval('1 {[:)\\2*]} {17=} Bfs_goal'), [5])
+        self.assertEqual(pd_simple_eval('1 {[:)\\2*]{9<}+} {99=} Bfs_goal'), [-1])
+        self.assertEqual(pd_simple_eval('0 {[:)\\3*]{10<}+} Dfs_reachable'), [[0,1,2,3,4,5,6,7,8,9]])
+        self.assertEqual(pd_simple_eval('0 {—Q[[Q)5][Q 2+ 1]]} {7=} Dijkstra_goal'), [8])
+        self.assertEqual(pd_simple_eval('0 {—Q[[Q)3][Q 2+ 7]]{0=6<}+} Dijkstra_distances 5='), [15])
+
+    def test_grid(self):
+        self.assertEqual(pd_simple_eval('["ab#" "#cd"] Grid \'# Grid_find'), [[2,3]])
+        self.assertEqual(pd_simple_eval('["ab#" "#cd"] Grid {\'c<} Grid_find'), [[0,1,2,3]])
+        self.assertEqual(pd_simple_eval('["abc" "def" "ghi"] Grid [1 1] Grid_king_neighbors'), [[0,1,2,3,5,6,7,8]])
+        self.assertEqual(pd_simple_eval('["abc" "def" "ghi"] Grid [0 0] Grid_orthogonal_neighbors'), [[1,3]])
+        self.assertEqual(pd_simple_eval('["abc" "def" "ghi"] Grid Grid_transpose [0 2] Grid_get'), [Char('g')])
+        self.assertEqual(pd_simple_eval('["abc" "def" "ghi"] Grid 2 Grid_column'), [[Char('c'),Char('f'),Char('i')]])
+        self.assertEqual(pd_simple_eval('[[1 2][3 4]] 0 1- Grid_column'), [[2,4]])
+        self.assertRaises(Exception, lambda: pd_simple_eval('[[1 2][3 4]] 2 Grid_column'))
+        self.assertRaises(Exception, lambda: pd_simple_eval('[[1 2][3 4]] 5 Grid_column'))
+        self.assertEqual(pd_simple_eval('["abc" "def" "ghi"] Grid 7 Grid_coordinates'), [[2,1]])
+
     def test_bind(self):
         self.assertEqual(pd_simple_eval('10,3%bf'), [[1,2,4,5,7,8]])
         self.assertEqual(pd_simple_eval('[1 2 3] 100 +v'), [[101,102,103]])
@@ -336,10 +392,30 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('10J*r'), [3628800])
         self.assertEqual(pd_simple_eval('[5 7 8]+_scan'), [[5,12,20]])
         self.assertEqual(pd_simple_eval('5,+s'), [[0,1,3,6,10]])
+        self.assertEqual(pd_simple_eval('[1 2.5 3]+s'), [[1,3.5,6.5]])
+        self.assertEqual(pd_simple_eval('["ab" "cd" "e"]+s'), [["ab","abcd","abcde"]])
+        self.assertEqual(pd_simple_eval('[[1 2] [3]]+r'), [[1,2,3]])
+        self.assertEqual(pd_simple_eval('[3 1 4 1 5]Ãs'), [[3,3,4,4,5]])
+        self.assertEqual(pd_simple_eval('[12 18 8]Gcd_reduce'), [2])
+        self.assertEqual(pd_simple_eval('[6 3 5]^s'), [[6,5,0]])
+
+    def test_short_circuit_predicates(self):
+        # The block would divide by zero on the second element.
+        self.assertEqual(pd_simple_eval('[1 0 5] {5\\/ 3<}â'), [0])
+        self.assertEqual(pd_simple_eval('[1 0 5] {5\\/ 3>}ê'), [1])
+        self.assertEqual(pd_simple_eval('[1 0 5] {5\\/ 3>}ô'), [0])
+        self.assertEqual(pd_simple_eval('[1 2 3]{2%}ç'), [2])
+        self.assertEqual(pd_simple_eval('1 Naturals_from {50>}Any'), [1])
 
     def test_square_map(self):
         self.assertEqual(pd_simple_eval('5²m'), [[0,1,4,9,16]])
 
+    def test_direct_call_map(self):
+        self.assertEqual(pd_simple_eval('[1 2 3])m'), [[2,3,4]])
+        self.assertEqual(pd_simple_eval('[[1 2] 3])m'), [[[1],2,4]])
+        self.assertEqual(pd_simple_eval('"aBcD" Is_upper_count'), [2])
+        self.assertEqual(pd_simple_eval('[0 1 2]!f'), [[0]])
+
     def test_strings(self):
         self.assertEqual(pd_simple_eval('"foo"'), ["foo"])
         self.assertEqual(pd_simple_eval(r'"\"what\""'), ['"what"'])
@@ -369,6 +445,17 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('[2 4 6 0 1]4.2±b$'), [[4,6,2,1,0]])
         self.assertEqual(pd_simple_eval('[2 4 6 0 1]3¢'), [4])
         self.assertEqual(pd_simple_eval('[2 4 6 0 1]=r'), [2])
+        self.assertEqual(pd_simple_eval('[2 4 6 0 1]1m¢'), [6])
+        self.assertEqual(pd_simple_eval('[2 4 6 0 1][0 4 2]¢'), [[0,6,2]])
+        self.assertEqual(pd_simple_eval('"hello"1¢'), [Char('h')])
+        self.assertEqual(pd_simple_eval('[2 4 6 0]=r [2 4 6 0]Average_median [3 1 2]Average_median'), [4,3.0,2])
+        self.assertEqual(pd_simple_eval('[1 2 3 4 5].3 Quantiles [5 4 3 2 1][0 .5 1]Quantiles'), [2.2,[1,3,5]])
+        self.assertEqual(pd_simple_eval('[3 "b" [1 2] 1.5 \'a "a" [0]]$'), [[[0],[1,2],1.5,3,Char('a'),'a','b']])
+        self.assertEqual(pd_simple_eval('[1j 2 1]$'), [[1j,1,2]])
+        self.assertEqual(pd_simple_eval('[1 2 3 4 5]{2%}$'), [[2,4,1,3,5]])
+        self.assertEqual(pd_simple_eval('["a" 100]{}$ [["a"] [100]]$'), [[100,'a'],[[100],['a']]])
+        self.assertEqual(pd_simple_eval('[[3 1] [2] [2 0]]$'), [[[2],[2,0],[3,1]]])
+        self.assertEqual(pd_simple_eval('[]Hr 1 2Hu "a" 3Hu [1] 4Hu Hl Hk'), [[2,4,3],[1,[1],'a']])
 
     def test_is_sorted(self):
         self.assertEqual(pd_simple_eval('[0 1 2 4 6]$p'), [1])
@@ -395,6 +482,19 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('10, 5, @'), [0])
         self.assertEqual(pd_simple_eval('10, [6 7] @'), [6])
         self.assertEqual(pd_simple_eval('[3 1 4 1 5 9] {3>} @'), [2])
+        self.assertEqual(pd_simple_eval('[1 1 2 1 1 2 1 1 1] [1 1 1] @'), [6])
+        self.assertEqual(pd_simple_eval('"banana" [\'n \'a] @'), [2])
+        self.assertEqual(pd_simple_eval('"aaaa" "aa" Count_infix [1 1 1 1 1] [1 1] Count_infix'), [2, 2])
+
+    def test_multi_pattern_search(self):
+        self.assertEqual(pd_simple_eval('"she sells sea shells" ["she" "sea" "he"] Find_all_patterns'),
+                [[[0,0],[1,2],[10,1],[14,0],[15,2]]])
+        self.assertEqual(pd_simple_eval('"she sells" ["sel" "he"] Find_first_pattern "she" ["x"] Find_first_pattern'),
+                [[1,1],[]])
+        self.assertEqual(pd_simple_eval('"aaaa" ["aa" \'a] Count_patterns [1 2 3 1 2] [[1 2] 3] Count_patterns'),
+                [[2,4],[2,1]])
+        self.assertEqual(pd_simple_eval('"abc" []Hr 0 "b"Hu 1 99Hu H Count_patterns "abc" ["b" 99] Count_patterns'),
+                [[1,0],[1,0]])
 
     def test_find(self):
         self.assertEqual(pd_simple_eval('[3 1 4 1 5 9 2 6 5 3 5] {5>} ='), [9])
@@ -655,6 +755,29 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('"DeFaCeD" 16 B'), [233811181])
         self.assertEqual(pd_simple_eval('314159 Dr'), [23])
 
+    def test_big_base(self):
+        n = 3 ** 50000 - 2
+        self.assertEqual(pd_simple_eval('3 50000ˆ 2- 3B'), [[2] * 49999 + [1]])
+        m = 3 ** 100000
+        self.assertEqual(pd_simple_eval('3 100000ˆ 8589934592 B'),
+                [[(m >> k) & ((1 << 33) - 1) for k in reversed(range(0, m.bit_length(), 33))]])
+        self.assertEqual(pd_simple_eval('3 50000ˆ 2- S L'), [len(base.int_str(n))])
+        self.assertEqual(pd_simple_eval('7 30000ˆ S I 7 30000ˆ ='), [1])
+        self.assertEqual(pd_simple_eval('[7 30000ˆ —1] 7 30000ˆ 1+ B'), [7 ** 30000 * (7 ** 30000 + 1) - 1])
+        self.assertEqual(pd_simple_eval('10 20000ˆ Dr 10 20000ˆ 1- Dr'), [1, 9 * 20000])
+        self.assertEqual(base.str_to_int('-' + '9' * 20000), 1 - 10 ** 20000)
+        self.assertEqual(base.int_divmod(-7 ** 40000, 3 ** 20000 + 1), divmod(-7 ** 40000, 3 ** 20000 + 1))
+
+    def test_int_kernels(self):
+        self.assertEqual(pd_simple_eval('10 41ˆ 1- Si 10 40ˆ 1- Si 99 3 Ir 0 27- 3 Ir'), [316227766016837933199, 10 ** 20 - 1, 4, -3])
+        self.assertEqual(pd_simple_eval('16 2r 16 3r 7 300ˆ 3r 7 100ˆ ='), [4, 16 ** (1/3), 1])
+        self.assertEqual(pd_simple_eval('3 10 100ˆ 1000000007 Pm 3 7 Im 3 0 1- 7 Pm'), [pow(3, 10 ** 100, 1000000007), 5, 5])
+        self.assertEqual(pd_simple_eval('[2 3 2][3 5 7]Cr [1 3][4 6]Cr'), [23, 9])
+        self.assertRaises(Exception, lambda: pd_simple_eval('2 4 Im'))
+        self.assertRaises(Exception, lambda: pd_simple_eval('[1 2][4 6]Cr'))
+        self.assertRaises(Exception, lambda: pd_simple_eval('[1 2][3]Cr'))
+        self.assertEqual(pd_simple_eval('0 8- 3r'), [(-8) ** (1/3)])
+
     def test_base_string(self):
         self.assertEqual(pd_simple_eval('48762 16 LbqUb'), ['be7a','BE7A'])
         self.assertEqual(pd_simple_eval('233811181 16 LbqUb'), ['defaced', 'DEFACED'])
@@ -695,6 +818,11 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('" x  tra   \nspaces\n  "W'), [["x","tra","spaces"]])
         self.assertEqual(pd_simple_eval('" x  tra   \nspaces\n  " b'), [["","x","","tra","","","\nspaces\n","",""]])
         self.assertEqual(pd_simple_eval('"assdfs"\'ss'), [["a","","df",""]])
+        self.assertEqual(pd_simple_eval('"a,b,,c" [\',] /'), [["a","b","","c"]])
+        self.assertEqual(pd_simple_eval('[1 1 2 1 1 1 2] [1 1 2] /'), [[[],[1],[]]])
+        self.assertEqual(pd_simple_eval('"a,b,,c" []Hr 0 \',Hu H /'), [["a","b","","c"]])
+        self.assertEqual(pd_simple_eval('"abc" []Hr H @ [1 2] []Hr H @'), [0, 0])
+        self.assertEqual(pd_simple_eval('[1 2 1] []Hr H Count_infix'), [4])
 
     def test_random(self):
         self.assertEqual(pd_simple_eval('0 Random_seed RfRfRf'),
@@ -797,6 +925,16 @@ class TestParadoc(unittest.TestCase):
         self.assertEqual(pd_simple_eval('"253""\\d+"Xm'), [["253"]])
         self.assertEqual(pd_simple_eval('"253""\\d"Xa'), [[["2"], ["5"], ["3"]]])
         self.assertEqual(pd_simple_eval('"2x5y3x""(\\d)x"Xa'), [[["2x", "2"], ["3x", "3"]]])
+        self.assertEqual(pd_simple_eval('"a1b22" "\\d+" "<\\g<0>>" Regex_sub "a1b2c" "(1)|2" Regex_split'), ["a<1>b<22>", ["a", "1", "b", "c"]])
+
+    def test_regex_map(self):
+        self.assertEqual(pd_simple_eval('["a1" "bb" "c33"] "\\d+" Regex_search_map'), [[["1"], [], ["33"]]])
+        self.assertEqual(pd_simple_eval('["a1" "b2b3"] "\\d" Regex_array_map'), [[[["1"]], [["2"], ["3"]]]])
+        self.assertEqual(pd_simple_eval('["a1" "b2b3"] "\\d" "#" Regex_sub_map'), [["a#", "b#b#"]])
+        env = initialized_environment(sandboxed=True, debug=True)
+        env.evaluate('"a1" "\\d" Xs ["b2" "c"] "\\d" Regex_match_map "d" "e" Xm', set_quine=False)
+        self.assertEqual(env._stack, [["1"], [[], []], []])
+        self.assertEqual(env.regex_cache_info()[:2], (1, 2))
 
     def test_hoard(self):
         self.assertEqual(pd_simple_eval('[]Hr Hl'), [[]])
@@ -818,6 +956,122 @@ class TestParadoc(unittest.TestCase):
 
         self.assertEqual(pd_simple_eval('[[1 2][3 4][5 6]]Dc 3='), [4])
 
+    def test_hoard_int_keys(self):
+        self.assertEqual(pd_simple_eval('[]Hr 5 7 Hu 2 3 Hu Hl Hk'), [[3,7],[2,5]])
+        self.assertEqual(pd_simple_eval('[4 3 2 1]Hr 1Hd Hl Hk'), [[4,2,1],[0,2,3]])
+        self.assertEqual(pd_simple_eval('[1 2]Hr 10 5 Hu 4 6 Hu 7 7 Hu Hl Hk 10Hh 11Hh'), [[1,2,6,7,5],[0,1,4,7,10],1,0])
+        self.assertEqual(pd_simple_eval('[]Hr 1000000 1 Hu —5 2 Hu 3 4 Hu 0 9 Hu Hl Hk H‹ H›'), [[2,9,4,1],[-5,0,3,1000000],2,1])
+        self.assertEqual(pd_simple_eval('[1 2]Hr 10 5 Hu "a" 3 Hu 10 H= "a" H='), [5,3])
+
+    def test_hoard_set_and_counter(self):
+        self.assertEqual(pd_simple_eval('[]Hr 5 Ho 2 Ho 5 Ho 3 Ho Hk Hl'), [[2,3,5],[1,1,1]])
+        self.assertEqual(pd_simple_eval('[]Hr 5 1 Hm 2 1 Hm 5 2 Hm Hk Hl 5Hz 7Hz'), [[2,5],[1,3],3,0])
+        self.assertEqual(pd_simple_eval('[]Hr 1Ho 2Ho 1 "x"Hu Hl'), [['x',1]])
+        self.assertEqual(pd_simple_eval('[1 2 2 3]Set_hoard Hr [4 5]Hv Hk [2 4 6]He Hk [1 5]Hn Hk 5Hh 2Hh'), [[1,2,3,4,5],[1,3,5],[1,5],1,0])
+        self.assertEqual(pd_simple_eval('[[1 2] [3] [1 2]]Set_hoard Hr Hk'), [[[1,2],[3]]])
+        self.assertEqual(pd_simple_eval('[1 2 2 3 3 3]Counter_hoard Hr Hl [2 3 3 4]Hv Hl [3 4]Hn Hk Hl'), [[1,2,3],[1,2,3,1],[3,4],[1,1]])
+        self.assertEqual(pd_simple_eval('[7 8 9]Hr [0 2]Hn Hl Hk'), [[7,9],[0,2]])
+
+    def test_file_hoards(self):
+        def unsandboxed_eval(code):
+            env = initialized_environment(sandboxed=False, debug=True)
+            env.evaluate(code, set_quine=False)
+            return env._stack
+        with tempfile.TemporaryDirectory() as d:
+            log = os.path.join(d, 'log')
+            arr = os.path.join(d, 'arr')
+            self.assertEqual(unsandboxed_eval('"{}" Record_log_hoard —H 3Ha "foo"Ha 2.5Ha Hl H1= H Close_hoard'.format(log)), [[3,'foo',2.5],'foo'])
+            self.assertEqual(unsandboxed_eval('"{}" Record_log_hoard —H [7 8]Hx Hl H› H Close_hoard'.format(log)), [[3,'foo',2.5,7,8],8])
+            self.assertEqual(unsandboxed_eval('"{}" 4 Mapped_array_hoard —H 2 10Hu —1 99Hu 1 5Hm Hl H Close_hoard'.format(arr)), [[0,5,10,99]])
+            self.assertEqual(unsandboxed_eval('"{}" Mapped_array_hoard —H Hl H2= H Close_hoard'.format(arr)), [[0,5,10,99],10])
+
+    def test_deep_str(self):
+        deep = []
+        for i in range(10000): deep = [deep, i]
+        self.assertTrue(pd_repr(deep).startswith('[' * 10000 + '[] 0] 1]'))
+        self.assertEqual(len(basic_pd_str(deep)), len(''.join(map(str, range(10000)))))
+        self.assertEqual(pd_repr([1, [Char(97)] * 5000 + ['x'], -2.5, range(3)]), '[1 [' + "'a " * 5000 + '"x"] —2.5 [0 1 2]]')
+        env = initialized_environment(sandboxed=True, debug=True, output=CaptureSink())
+        env.put('Ñ', ', ')
+        env.write_pd_str([list(range(5000)), [], 'x'])
+        self.assertEqual(env.output.getvalue(), ', '.join(map(str, range(5000))) + ', , x')
+
+    def test_input_triggers(self):
+        f = io.StringIO('  ab  12\n\n3.5 x\nlast')
+        self.assertEqual(input_triggers.word(f), 'ab')
+        self.assertEqual(input_triggers.value(f), 12)
+        self.assertEqual(input_triggers.line(f), '')
+        self.assertEqual(input_triggers.char(f), '3')
+        self.assertEqual(input_triggers.all_values(f), [0.5, 'x'])
+        self.assertEqual(input_triggers.line(f), None)
+
+        b = input_triggers.InputBuffer(io.StringIO('x' * 10 + ' ' + 'y' * 10 + '\n' + 'z' * 10), chunk_size=3)
+        self.assertEqual(b.word_eof(), ('x' * 10, False))
+        self.assertEqual(b.line_eof(), ('y' * 10, False))
+        self.assertEqual(b.rest(), 'z' * 10)
+        self.assertEqual(b.line_eof(), (None, True))
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'input')
+            with open(path, 'w') as f: f.write('1 -2\n\n3.5 x\n')
+            with open(path) as f:
+                self.assertEqual(input_triggers.all_lines(f), ['1 -2', '', '3.5 x'])
+                self.assertEqual(input_triggers.all_lines(f), None)
+            with open(path) as f:
+                self.assertEqual(input_triggers.word(f), '1')
+                self.assertEqual(input_triggers.all_values(f), [-2, 3.5, 'x'])
+
+        f = io.StringIO('ab 12\n3.5\n' + '7\n' * 100 + 'last')
+        input_triggers.prefetch(f, maxsize=4)
+        self.assertEqual(input_triggers.word(f), 'ab')
+        self.assertEqual(input_triggers.record(f), 12)
+        self.assertEqual(input_triggers.line(f), '3.5')
+        self.assertEqual(input_triggers.all_values(f), [7] * 100)
+        self.assertEqual(input_triggers.line(f), None)
+        self.assertTrue(f.closed)
+
+        self.assertEqual(input_triggers.parse_values([str(i) for i in range(-5000, 5000)]), list(range(-5000, 5000)))
+        self.assertEqual(input_triggers.parse_values(['1'] * 5000 + ['-', '2', '1e3', str(2**64)])[-4:], ['-', 2, 1000.0, 2**64])
+
+    def test_output_sink(self):
+        out = CaptureSink()
+        env = initialized_environment(sandboxed=True, debug=True, output=out)
+        env.evaluate('1O 2P " "o [3 4]{5+}%Ps 7"x%y"o', set_quine=False)
+        self.assertEqual(out.getvalue(), '12\n 89\nx7y')
+        self.assertEqual(env._stack, [])
+
+        f = io.StringIO()
+        sink = OutputSink(f, buffer_size=4)
+        sink.write('ab')
+        self.assertEqual(f.getvalue(), '')
+        sink.write('cd')
+        self.assertEqual(f.getvalue(), 'abcd')
+        sink.write('e')
+        sink.flush()
+        self.assertEqual(f.getvalue(), 'abcde')
+
+        class CountingIO(io.StringIO):
+            flushes = 0
+            def flush(self):
+                self.flushes += 1
+        f = CountingIO()
+        sink = OutputSink(f)
+        sink.write('ab')
+        sink.write('c')
+        self.assertEqual((f.getvalue(), f.flushes), ('abc', 0))
+
+    def test_input_source(self):
+        def eval_with_input(code, source):
+            env = initialized_environment(sandboxed=True, debug=True, input_source=InputSource(source))
+            env.evaluate(code, set_quine=False)
+            return env._stack
+        self.assertEqual(eval_with_input('v+', '3 4 5\n'), [7])
+        self.assertEqual(eval_with_input('l+', ['ab', 'cd']), ['cdab'])
+        self.assertEqual(eval_with_input('y:', iter([1, 2.5, 'x'])), [[1, 2.5, 'x']] * 2)
+        self.assertEqual(eval_with_input('r+', iter(range(3, 6))), [7])
+        self.assertEqual(eval_with_input('a:', io.StringIO('x\ny\n')), [['x', 'y']] * 2)
+        self.assertEqual(eval_with_input('c+', 'hi'), ['ih'])
+
     def test_quine(self):
         self.assertEqual(pd_simple_eval('  1  Qn  2  '), [1,'  1  Qn  2  ',2])
 
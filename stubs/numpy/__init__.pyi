@@ -0,0 +1,13 @@
+from typing import *
+class ndarray:
+    def __len__(self) -> int: ...
+    def min(self) -> Any: ...
+    def max(self) -> Any: ...
+    def tolist(self) -> Any: ...
+class int64: ...
+class iinfo:
+    min: int
+    max: int
+    def __init__(self, int_type: Any) -> None: ...
+def fromstring(string: str, dtype: Any = ..., count: int = ..., sep: str = ...) -> ndarray: ...
+def full(shape: Any, fill_value: Any, dtype: Any = ...) -> ndarray: ...